@@ -0,0 +1,8 @@
+"""Benchmarks for the performance-sensitive parts of `symbolic_pymc`.
+
+Run them with `python -m benchmarks`; see `python -m benchmarks --help` for
+options.
+"""
+from .suite import benchmarks, run_benchmarks, compare_results
+
+__all__ = ['benchmarks', 'run_benchmarks', 'compare_results']
@@ -0,0 +1,105 @@
+"""Command-line interface for the benchmarks.
+
+Examples
+========
+
+Run all the benchmarks and store the results:
+
+    $ python -m benchmarks --output baseline.json
+
+Run the `unify` benchmarks and compare them with a baseline:
+
+    $ python -m benchmarks --filter unify --baseline baseline.json
+
+The exit status is non-zero when a benchmark regressed beyond the given
+tolerances.
+"""
+import sys
+import json
+import argparse
+import platform
+import warnings
+
+with warnings.catch_warnings():
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    import theano
+
+theano.config.compute_test_value = 'ignore'
+theano.config.mode = 'FAST_COMPILE'
+theano.config.cxx = ''
+
+from .suite import run_benchmarks, compare_results  # noqa: E402
+
+
+def _versions():
+    import numpy
+    import pymc3
+    import kanren
+    import unification
+
+    return {'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'theano': theano.__version__,
+            'pymc3': pymc3.__version__,
+            'kanren': getattr(kanren, '__version__', None),
+            'unification': getattr(unification, '__version__', None)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark symbolic_pymc unification, reification and '
+        'graph rewriting.')
+    parser.add_argument('-f', '--filter', default=None,
+                        help='regular expression for the benchmark ids to run')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of timed runs per benchmark')
+    parser.add_argument('-o', '--output', default=None,
+                        help='file in which to store the JSON results')
+    parser.add_argument('-b', '--baseline', default=None,
+                        help='JSON results file to compare against')
+    parser.add_argument('--time-tolerance', type=float, default=0.2,
+                        help='allowed relative increase in time')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2,
+                        help='allowed relative increase in peak memory')
+    args = parser.parse_args(argv)
+
+    def report(bench_id, res):
+        print(f"{bench_id:<50} {res['time_min'] * 1e3:10.2f} ms "
+              f"{res['peak_memory'] / 2**20:10.2f} MiB", file=sys.stderr)
+
+    results = run_benchmarks(pattern=args.filter, repeat=args.repeat,
+                             callback=report)
+
+    output = {'versions': _versions(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+        comparisons = compare_results(results, baseline,
+                                      time_tolerance=args.time_tolerance,
+                                      memory_tolerance=args.memory_tolerance)
+
+        print(f"\n{'benchmark':<50} {'time':>8} {'memory':>8}",
+              file=sys.stderr)
+        for bench_id, time_ratio, memory_ratio, regressed in comparisons:
+            flag = ' REGRESSION' if regressed else ''
+            print(f'{bench_id:<50} {time_ratio:8.2f} {memory_ratio:8.2f}{flag}',
+                  file=sys.stderr)
+
+        if any(c[-1] for c in comparisons):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Synthetic graphs and models used by the benchmarks."""
+import numpy as np
+import theano
+import theano.tensor as tt
+import pymc3 as pm
+
+from functools import partial
+
+from symbolic_pymc import NormalRV, MvNormalRV
+from symbolic_pymc.meta import mt
+from symbolic_pymc.unify import etuple
+
+
+class ExpressionOps(object):
+    """A namespace of functions that create tuple-form expressions of the
+    corresponding `mt` operators (e.g. `ExpressionOps().log(x)` is
+    `etuple(mt.log, x)`)."""
+
+    def __getattr__(self, name):
+        return partial(etuple, getattr(mt, name))
+
+
+expression_ops = ExpressionOps()
+
+
+def deep_chain(depth, x=None, ops=tt):
+    """Create a chain of `depth` alternating `log(exp(y))` and `y + x` terms.
+
+    Parameters
+    ==========
+    depth: int
+        The number of terms in the chain.
+    x: object (optional)
+        The chain's input.  Defaults to a new `tt.vector`.
+    ops: object (optional)
+        The namespace providing `log`, `exp` and `add` (e.g. `tt`, `mt` or
+        `expression_ops`).
+    """
+    if x is None:
+        x = tt.vector('x')
+
+    y = x
+    for i in range(depth):
+        if i % 2:
+            y = ops.add(y, x)
+        else:
+            y = ops.log(ops.exp(y))
+
+    return y
+
+
+def balanced_sum(terms, ops=tt):
+    """Add a sequence of terms pairwise, so that the depth of the resulting
+    graph is logarithmic in the number of terms.
+    """
+    terms = list(terms)
+    while len(terms) > 1:
+        pairs = [ops.add(a, b) for a, b in zip(terms[::2], terms[1::2])]
+        terms = pairs + terms[len(pairs) * 2:]
+    return terms[0]
+
+
+def normal_rv_chain(n_rvs, rng=None, ops=None):
+    """Create a chain of `n_rvs` `NormalRV`s, each with the previous one as
+    its mean.
+
+    When `ops` is given, the chain is constructed from meta objects using
+    `ops.NormalRV` (e.g. `expression_ops`) instead.
+    """
+    if rng is None:
+        rng = theano.shared(np.random.RandomState(123), name='rng')
+
+    sd = tt.scalar('sd')
+
+    if ops is not None:
+        sd, rng = mt(sd), mt(rng)
+        size = mt(tt.constant([], dtype='int64'))
+        y = mt(tt.as_tensor_variable(0.))
+        for i in range(n_rvs):
+            y = ops.NormalRV(y, sd, size, rng)
+        return y
+
+    y = NormalRV(0., sd, rng=rng, name='Y_0')
+    for i in range(1, n_rvs):
+        y = NormalRV(y, sd, rng=rng, name=f'Y_{i}')
+
+    return y
+
+
+def mvnormal_rv_chain(n_rvs, rng=None):
+    """Create a chain of `n_rvs` `MvNormalRV`s, each with the previous one as
+    its mean."""
+    if rng is None:
+        rng = theano.shared(np.random.RandomState(123), name='rng')
+
+    cov = tt.matrix('cov')
+    y = MvNormalRV(tt.zeros(2), cov, rng=rng, name='Y_0')
+    for i in range(1, n_rvs):
+        y = MvNormalRV(y, cov, rng=rng, name=f'Y_{i}')
+
+    return y
+
+
+def wide_hierarchical_model(width):
+    """Create a PyMC3 model with `width` groups sharing a common prior."""
+    rng = np.random.RandomState(123)
+    data = rng.normal(size=width)
+
+    with pm.Model() as model:
+        mu = pm.Normal('mu', 0., 1.)
+        tau = pm.HalfNormal('tau', 1.)
+        for i in range(width):
+            theta = pm.Normal(f'theta_{i}', mu, tau)
+            pm.Normal(f'y_{i}', theta, 1., observed=data[i])
+
+    return model
@@ -0,0 +1,365 @@
+"""Benchmark definitions, measurement and comparison."""
+import gc
+import re
+import statistics
+import tracemalloc
+
+from collections import OrderedDict
+from itertools import product
+from time import perf_counter
+
+import theano.tensor as tt
+
+from theano.gof.opt import EquilibriumOptimizer
+from theano.gof.graph import inputs as tt_inputs
+
+from unification import var, unify, reify
+
+from kanren import eq, conde
+from kanren.facts import Relation, fact
+from kanren.term import term, operator, arguments
+
+from symbolic_pymc.meta import MetaSymbol, mt
+from symbolic_pymc.opt import (FunctionGraph, KanrenRelationSub,
+                               KanrenEquilibriumOptimizer,
+                               KanrenParallelOptimizer, graph_rewrites)
+from symbolic_pymc.unify import (etuple, tuple_expression, reify_all_terms,
+                                 compile_pattern, Substitution)
+from symbolic_pymc.utils import optimize_graph, canonicalize
+from symbolic_pymc.pymc3 import model_graph
+
+from .graphs import (deep_chain, balanced_sum, normal_rv_chain,
+                     mvnormal_rv_chain, wide_hierarchical_model,
+                     expression_ops)
+
+
+benchmarks = OrderedDict()
+"""The registered benchmarks, keyed by name.
+
+Each value is a tuple containing the benchmark function and a dictionary
+mapping parameter names to the sequences of values to benchmark.
+"""
+
+
+def benchmark(**params):
+    """Register a benchmark function.
+
+    The function is called with one value for each parameter and must return a
+    function taking no arguments; only the latter is measured.
+    """
+    def _benchmark(fn):
+        benchmarks[fn.__name__] = (fn, params)
+        return fn
+    return _benchmark
+
+
+_graph_builders = {
+    'chain': deep_chain,
+    'normal': normal_rv_chain,
+    'mvnormal': mvnormal_rv_chain,
+}
+
+
+def _log_exp_relation():
+    log_exp_rel = Relation('log_exp')
+    x_lv = var()
+    fact(log_exp_rel, mt.log(mt.exp(x_lv)), x_lv)
+    return log_exp_rel
+
+
+def _branching_log_exp_goal(n_branches=10):
+    # The log-exp relation behind many failing branches, so that matching each
+    # node costs enough for parallel matching to pay off.
+    log_exp_rel = _log_exp_relation()
+
+    def branching_log_exp(in_, out):
+        return ((conde,) + tuple([(eq, in_, i)] for i in range(n_branches)) +
+                ([(log_exp_rel, in_, out)],))
+
+    return branching_log_exp
+
+
+@benchmark(graph=('chain', 'normal', 'mvnormal'), size=(10, 50))
+def from_obj(graph, size):
+    out = _graph_builders[graph](size)
+    return lambda: MetaSymbol.from_obj(out)
+
+
+@benchmark(graph=('chain', 'normal', 'mvnormal'), size=(10, 50))
+def unify_meta(graph, size):
+    # Two identical, but distinct, graphs must be walked entirely.
+    x_mt = MetaSymbol.from_obj(_graph_builders[graph](size))
+    y_mt = MetaSymbol.from_obj(_graph_builders[graph](size))
+    return lambda: unify(x_mt, y_mt, {})
+
+
+@benchmark(subst=('dict', 'substitution'), size=(100, 1000))
+def unify_lvars(subst, size):
+    # A pattern with a logic variable for each of the graph's inputs.
+    x_mt = MetaSymbol.from_obj(
+        balanced_sum([tt.scalar(f'x_{i}') for i in range(size)]))
+    pattern = balanced_sum([var() for i in range(size)], ops=mt)
+    s_type = Substitution if subst == 'substitution' else dict
+    return lambda: unify(pattern, x_mt, s_type())
+
+
+@benchmark(size=(10, 50))
+def reify_meta(size):
+    x_lv = var()
+    pattern = deep_chain(size, x=x_lv, ops=mt)
+    s = {x_lv: MetaSymbol.from_obj(tt.vector('x'))}
+    return lambda: reify(pattern, s)
+
+
+@benchmark(graph=('chain', 'normal', 'mvnormal'), size=(10, 50))
+def tuple_expr(graph, size):
+    out = _graph_builders[graph](size)
+    return lambda: tuple_expression(out)
+
+
+@benchmark(graph=('chain', 'normal'), size=(10, 50))
+def reify_terms(graph, size):
+    # Tuple-form expressions of meta objects, like the ones produced by
+    # miniKanren relations.
+    if graph == 'chain':
+        out_expr = deep_chain(size, x=mt(tt.vector('x')), ops=expression_ops)
+    else:
+        out_expr = normal_rv_chain(size, ops=expression_ops)
+    return lambda: reify_all_terms(out_expr)
+
+
+@benchmark(size=(10, 1000))
+def etuple_cons(size):
+    # Taking apart and re-creating an expression with a long argument list,
+    # like `kanren` does with `operator`, `arguments` and `term`.
+    x_mt = mt(tt.vector('x'))
+    out_expr = etuple(mt.add, *[etuple(mt.exp, x_mt) for i in range(size)])
+    out_expr.eval_obj
+
+    def run():
+        for i in range(100):
+            term(operator(out_expr), arguments(out_expr))
+            hash(out_expr)
+
+    return run
+
+
+@benchmark(size=(1000, 5000))
+def deep_terms(size):
+    # Graphs deeper than Python's recursion limit.
+    out = deep_chain(size)
+    out_expr = deep_chain(size, x=mt(tt.vector('x')), ops=expression_ops)
+    return lambda: (tuple_expression(out), reify_all_terms(out_expr))
+
+
+@benchmark(matcher=('unify', 'compiled'), size=(10, 50))
+def pattern_match(matcher, size):
+    # Matching a pattern against all the terms in a graph, which mostly don't
+    # match.
+    x_lv = var()
+    pattern = mt.log(mt.exp(x_lv))
+    out = deep_chain(size)
+    terms = [o for n in FunctionGraph(tt_inputs([out]), [out],
+                                      clone=False).toposort()
+             for o in n.outputs]
+    if matcher == 'compiled':
+        match = compile_pattern(pattern).match
+    else:
+        def match(t):
+            return unify(pattern, t, {})
+    return lambda: [match(t) for t in terms]
+
+
+@benchmark(size=(10, 50))
+def kanren_transform(size):
+    out = deep_chain(size)
+    fgraph = FunctionGraph(tt_inputs([out]), [out], clone=False)
+    nodes = fgraph.toposort()
+    log_exp_opt = KanrenRelationSub(_log_exp_relation())
+    return lambda: [log_exp_opt.transform(n) for n in nodes]
+
+
+@benchmark(size=(10, 50))
+def kanren_equilibrium(size):
+    out = deep_chain(size)
+    fgraph = FunctionGraph(tt_inputs([out]), [out], clone=False)
+    opt = EquilibriumOptimizer([KanrenRelationSub(_log_exp_relation())],
+                               max_use_ratio=size)
+    return lambda: optimize_graph(fgraph, opt)
+
+
+@benchmark(size=(10, 50))
+def kanren_worklist(size):
+    out = deep_chain(size)
+    fgraph = FunctionGraph(tt_inputs([out]), [out], clone=False)
+    opt = KanrenEquilibriumOptimizer([KanrenRelationSub(_log_exp_relation())])
+    return lambda: optimize_graph(fgraph, opt)
+
+
+@benchmark(n_jobs=(1, 4), size=(10, 50))
+def kanren_parallel(n_jobs, size):
+    out = deep_chain(size)
+    fgraph = FunctionGraph(tt_inputs([out]), [out], clone=False)
+    opt = KanrenParallelOptimizer([KanrenRelationSub(_log_exp_relation())],
+                                  n_jobs=n_jobs)
+    return lambda: optimize_graph(fgraph, opt)
+
+
+@benchmark(n_jobs=(1, 4), size=(10, 20))
+def kanren_parallel_search(n_jobs, size):
+    out = deep_chain(size)
+    fgraph = FunctionGraph(tt_inputs([out]), [out], clone=False)
+    opt = KanrenParallelOptimizer(
+        [KanrenRelationSub(_branching_log_exp_goal())], n_jobs=n_jobs,
+        min_parallel_nodes=1)
+    return lambda: optimize_graph(fgraph, opt)
+
+
+@benchmark(size=(10, 50))
+def kanren_rewrites(size):
+    # Every graph produced by a single rewrite of a chain.
+    out = deep_chain(size)
+    fgraph = FunctionGraph(tt_inputs([out]), [out], clone=False)
+    log_exp_opt = KanrenRelationSub(_log_exp_relation())
+    return lambda: sum(1 for g in graph_rewrites(fgraph, log_exp_opt))
+
+
+@benchmark(width=(5, 25))
+def pymc3_model_graph(width):
+    model = wide_hierarchical_model(width)
+    return lambda: model_graph(model)
+
+
+@benchmark(width=(5, 25))
+def canonicalize_model(width):
+    fgraph = model_graph(wide_hierarchical_model(width))
+    return lambda: canonicalize(fgraph)
+
+
+def benchmark_id(name, params):
+    return '{}[{}]'.format(name, ','.join(f'{k}={v}'
+                                          for k, v in sorted(params.items())))
+
+
+def measure(make_run, repeat=5):
+    """Time a benchmark and measure its peak memory usage.
+
+    Parameters
+    ==========
+    make_run: callable
+        A function returning the (zero-argument) function to measure.  It's
+        called before each measurement, so that every run starts from the
+        same state.
+    repeat: int (optional)
+        The number of timed runs.
+
+    Results
+    =======
+    out: dict
+        The minimum, median and mean times (in seconds) and the peak traced
+        memory (in bytes).
+    """
+    times = []
+    for _ in range(repeat):
+        run = make_run()
+        gc.collect()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = perf_counter()
+            run()
+            times.append(perf_counter() - start)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    # Memory is measured separately, since tracing slows everything down.
+    run = make_run()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'time_min': min(times),
+            'time_median': statistics.median(times),
+            'time_mean': statistics.mean(times),
+            'peak_memory': peak_memory,
+            'repeat': repeat}
+
+
+def run_benchmarks(pattern=None, repeat=5, callback=None):
+    """Run the registered benchmarks.
+
+    Parameters
+    ==========
+    pattern: str (optional)
+        A regular expression; only benchmarks with matching ids are run.
+    repeat: int (optional)
+        The number of timed runs for each benchmark.
+    callback: callable (optional)
+        A function called with the id and result of each benchmark as it
+        finishes.
+
+    Results
+    =======
+    out: OrderedDict
+        The results keyed by benchmark id.
+    """
+    results = OrderedDict()
+    for name, (fn, params) in benchmarks.items():
+        param_names = sorted(params)
+        for values in product(*(params[k] for k in param_names)):
+            bench_params = dict(zip(param_names, values))
+            bench_id = benchmark_id(name, bench_params)
+
+            if pattern is not None and not re.search(pattern, bench_id):
+                continue
+
+            res = measure(lambda: fn(**bench_params), repeat=repeat)
+            res['params'] = bench_params
+            results[bench_id] = res
+
+            if callback is not None:
+                callback(bench_id, res)
+
+    return results
+
+
+def compare_results(results, baseline, time_tolerance=0.2,
+                    memory_tolerance=0.2):
+    """Compare benchmark results against a baseline.
+
+    Parameters
+    ==========
+    results: dict
+        Benchmark results, as produced by `run_benchmarks`.
+    baseline: dict
+        Baseline benchmark results.
+    time_tolerance: float (optional)
+        The allowed relative increase in minimum time.
+    memory_tolerance: float (optional)
+        The allowed relative increase in peak memory.
+
+    Results
+    =======
+    out: list of tuple
+        A `(id, time ratio, memory ratio, regressed)` tuple for each benchmark
+        in both `results` and `baseline`.
+    """
+    comparisons = []
+    for bench_id, res in results.items():
+        base = baseline.get(bench_id)
+        if base is None:
+            continue
+
+        time_ratio = res['time_min'] / max(base['time_min'], 1e-9)
+        memory_ratio = res['peak_memory'] / max(base['peak_memory'], 1)
+        regressed = (time_ratio > 1 + time_tolerance or
+                     memory_ratio > 1 + memory_tolerance)
+
+        comparisons.append((bench_id, time_ratio, memory_ratio, regressed))
+
+    return comparisons
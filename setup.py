@@ -26,7 +26,7 @@ setup(
         'sympy',
         'toolz',
     ],
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks']),
     tests_require=[
         'pytest'
     ],
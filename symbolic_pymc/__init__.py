@@ -1,15 +1,45 @@
+import numpy as np
 import theano
 import scipy
 import theano.tensor as tt
 
 from functools import partial
 
-from .rv import RandomVariable, param_supp_shape_fn
+from .rv import RandomVariable, param_supp_shape_fn, _Generator
 
 # We need this so that `multipledispatch` initialization occurs
 from .unify import *
 
 
+# Whether or not SciPy's samplers accept `numpy.random.Generator`s; it's
+# determined by the first `_scipy_random_state` call with a `Generator`.
+_scipy_accepts_generators = None
+
+
+def _scipy_random_state(rng):
+    """Return a `random_state` for SciPy's samplers.
+
+    SciPy only accepts `numpy.random.Generator`s as of version 1.4; for older
+    versions, a `RandomState` that draws from (and advances) the generator's
+    bit generator is used.
+    """
+    global _scipy_accepts_generators
+
+    if _Generator is None or not isinstance(rng, _Generator):
+        return rng
+
+    if _scipy_accepts_generators is None:
+        try:
+            scipy.stats.uniform.rvs(random_state=np.random.default_rng(0))
+            _scipy_accepts_generators = True
+        except ValueError:
+            _scipy_accepts_generators = False
+
+    if not _scipy_accepts_generators:
+        return np.random.RandomState(rng.bit_generator)
+    return rng
+
+
 # Continuous Numpy-generated variates
 class UniformRVType(RandomVariable):
     print_name = ('U', '\\operatorname{U}')
@@ -44,8 +74,8 @@ class HalfNormalRVType(RandomVariable):
     def __init__(self):
         super().__init__(
             'halfnormal', theano.config.floatX, 0, [0, 0],
-            lambda rng, *args: scipy.stats.halfnorm.rvs(*args,
-                                                        random_state=rng),
+            lambda rng, *args: scipy.stats.halfnorm.rvs(
+                *args, random_state=_scipy_random_state(rng)),
             inplace=True)
 
     def make_node(self, mu=0., sigma=1., size=None, rng=None, name=None):
@@ -132,8 +162,8 @@ class CauchyRVType(RandomVariable):
     def __init__(self):
         super().__init__(
             'cauchy', theano.config.floatX, 0, [0, 0],
-            lambda rng, *args: scipy.stats.cauchy.rvs(*args,
-                                                      random_state=rng),
+            lambda rng, *args: scipy.stats.cauchy.rvs(
+                *args, random_state=_scipy_random_state(rng)),
             inplace=True)
 
     def make_node(self, loc, scale, size=None, rng=None, name=None):
@@ -149,8 +179,8 @@ class HalfCauchyRVType(RandomVariable):
     def __init__(self):
         super().__init__(
             'halfcauchy', theano.config.floatX, 0, [0, 0],
-            lambda rng, *args: scipy.stats.halfcauchy.rvs(*args,
-                                                          random_state=rng),
+            lambda rng, *args: scipy.stats.halfcauchy.rvs(
+                *args, random_state=_scipy_random_state(rng)),
             inplace=True)
 
     def make_node(self, loc=0., scale=1., size=None, rng=None, name=None):
@@ -166,8 +196,9 @@ class InvGammaRVType(RandomVariable):
     def __init__(self):
         super().__init__(
             'invgamma', theano.config.floatX, 0, [0, 0],
-            lambda rng, *args: scipy.stats.invgamma.rvs(*args,
-                                                        random_state=rng),
+            lambda rng, *args: scipy.stats.invgamma.rvs(
+                *args[:-1], size=args[-1],
+                random_state=_scipy_random_state(rng)),
             inplace=True)
 
     def make_node(self, loc, scale, size=None, rng=None, name=None):
@@ -183,8 +214,8 @@ class TruncExponentialRVType(RandomVariable):
     def __init__(self):
         super().__init__(
             'truncexpon', theano.config.floatX, 0, [0, 0, 0],
-            lambda rng, *args: scipy.stats.truncexpon.rvs(*args,
-                                                          random_state=rng),
+            lambda rng, *args: scipy.stats.truncexpon.rvs(
+                *args, random_state=_scipy_random_state(rng)),
             inplace=True)
 
     def make_node(self, b, loc, scale, size=None, rng=None, name=None):
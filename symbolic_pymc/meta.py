@@ -1,6 +1,8 @@
 import abc
 import types
 import inspect
+import weakref
+import threading
 
 import numpy as np
 
@@ -13,11 +15,400 @@ from collections.abc import Iterator
 
 from unification import var, isvar, Var
 
-from .rv import RandomVariable
+from .rv import RandomVariable, RandomGeneratorType
 
 # TODO: Replace `from_obj` with a dispatched function?
 # from multipledispatch import dispatch
 
+# Caches for `MetaSymbol.base_classes` and the meta class dispatch performed by
+# `MetaSymbol.from_obj`.  Both are cleared whenever a meta class is created.
+_base_classes_cache = {}
+_meta_class_cache = {}
+
+# Meta classes created for base classes that have no meta class of their own.
+_derived_meta_classes = {}
+
+# Base object types whose meta objects can be interned.
+_interned_types = (theano.Variable, theano.Apply, theano.Op)
+
+# Maps the `id`s of base objects to their (weakly referenced) meta objects.
+# Since meta objects hold strong references to their base objects, an `id`
+# can't be reused while its entry is alive.
+_meta_intern_table = None
+
+
+def intern_meta_objects(enable=True):
+    """Enable or disable the interning of meta objects produced by
+    `MetaSymbol.from_obj`.
+
+    When enabled, repeated conversions of the same Theano `Variable`, `Apply`
+    and `Op` objects return the same meta object, so shared subgraphs are
+    only converted once.  Interned meta objects are weakly referenced, and
+    they are evicted once nothing else refers to them.
+
+    NOTE: Interned meta objects are shared, so in-place changes to one (e.g.
+    setting a slot value) are seen by every holder.
+    """
+    global _meta_intern_table
+    if enable:
+        if _meta_intern_table is None:
+            _meta_intern_table = weakref.WeakValueDictionary()
+    else:
+        _meta_intern_table = None
+
+
+# Whether or not meta objects defer the conversion of their sub-objects.
+_lazy_meta = False
+
+
+def lazy_meta_objects(enable=True):
+    """Enable or disable the lazy conversion of meta object sub-objects.
+
+    When enabled, `MetaApply` and `MetaVariable` objects keep their `op`,
+    `inputs`, `type` and `owner` arguments in their base forms and only
+    convert them to meta objects when they're first accessed (e.g. by
+    `MetaSymbol.rands`, unification or reification).  This way, a failed
+    match against a large graph only converts the parts of the graph that
+    were compared.
+
+    The hashes of these meta objects are the same as the hashes of eagerly
+    converted ones, and computing them doesn't convert anything.
+    """
+    global _lazy_meta
+    _lazy_meta = enable
+
+
+class _MetaThreadState(threading.local):
+    # Maps the `id`s of base objects to their meta objects (and the base
+    # objects themselves, to keep the `id`s valid) during a top-level
+    # `MetaSymbol.from_obj` call.
+    convert_memo = None
+
+    # Maps the `id`s of meta objects to their reified results (and the meta
+    # objects themselves) during a top-level `MetaSymbol.reify` call.
+    reify_memo = None
+
+    # Whether or not conversions in this thread are lazy, regardless of
+    # `lazy_meta_objects` (see `_from_obj_lazily`).
+    lazy = False
+
+
+# The memos are per-thread, so that conversions and reifications in different
+# threads don't share (or reset) them.
+_meta_thread_state = _MetaThreadState()
+
+
+def _from_obj_lazily(obj):
+    """Convert a base object to a meta object that defers the conversion of
+    its sub-objects, as if `lazy_meta_objects` were enabled.
+
+    This only costs the conversion of the top level of a graph, e.g. when a
+    matched sub-graph is bound to a logic variable.
+    """
+    state = _meta_thread_state
+    prev_lazy = state.lazy
+    state.lazy = True
+    try:
+        return MetaSymbol.from_obj(obj)
+    finally:
+        state.lazy = prev_lazy
+
+
+# Incremented whenever a meta object that cached values could depend on is
+# changed, which discards all the cached structural hashes and ground statuses
+# (see `_get_cached`).
+_meta_cache_epoch = 0
+
+
+def _get_cached(x, key):
+    """Get a value cached on a meta object during the current cache epoch."""
+    x_dict = x.__dict__
+    if x_dict.get('_cache_epoch') == _meta_cache_epoch:
+        return x_dict.get(key)
+    return None
+
+
+def _set_cached(x, key, value):
+    x_dict = x.__dict__
+    if x_dict.get('_cache_epoch') != _meta_cache_epoch:
+        x_dict.pop('_hash', None)
+        x_dict.pop('_ground', None)
+        x_dict['_cache_epoch'] = _meta_cache_epoch
+    x_dict[key] = value
+
+
+def _meta_changed(obj, attr, value):
+    """Start a new cache epoch when a change to a meta object could affect
+    the values cached for other meta objects.
+
+    Those values could depend on `obj` when it has cached values of its own or
+    a base object; initial slot assignments and the reification of a meta
+    object (i.e. setting its base object) don't change anything.
+    """
+    global _meta_cache_epoch
+
+    obj_dict = obj.__dict__
+    if attr == 'obj':
+        old_value = getattr(obj, 'obj', None)
+        if old_value is value or (old_value is None and
+                                  not isinstance(value, Var)):
+            return
+    elif attr not in (obj_dict.get('_deferred_slots') or ()):
+        try:
+            old_value = object.__getattribute__(obj, attr)
+        except AttributeError:
+            return
+        if old_value is value:
+            return
+
+    if (obj_dict.get('_cache_epoch') == _meta_cache_epoch or
+            _is_concrete(getattr(obj, 'obj', None))):
+        _meta_cache_epoch += 1
+
+
+def _base_postorder(obj, memo):
+    """Get the Theano `Variable`s and `Apply` nodes in the graph of `obj` in
+    an order where every object follows the objects it depends on.
+
+    The graph isn't traversed beyond the objects in `memo`.
+    """
+    res = []
+    seen = set(memo)
+    stack = [(obj, False)]
+    while stack:
+        x, expanded = stack.pop()
+        if expanded:
+            res.append(x)
+            continue
+        if id(x) in seen:
+            continue
+        seen.add(id(x))
+        stack.append((x, True))
+        if isinstance(x, theano.Apply):
+            stack.extend((i, False) for i in reversed(x.inputs))
+        elif getattr(x, 'owner', None) is not None:
+            stack.append((x.owner, False))
+    return res
+
+
+def _meta_children(obj):
+    """Get the meta objects among the rands of `obj` (including those in
+    `list`s and `tuple`s).
+    """
+    stack = list(obj.rands())
+    while stack:
+        x = stack.pop()
+        if isinstance(x, MetaSymbol):
+            yield x
+        elif isinstance(x, (list, tuple)):
+            stack.extend(x)
+
+
+def _meta_postorder(obj, children=_meta_children):
+    """Get the meta objects in the graph of `obj`--in an order where every
+    object follows its sub-objects (as given by `children`)--using an explicit
+    stack.
+    """
+    res = []
+    seen = set()
+    stack = [(obj, False)]
+    while stack:
+        x, expanded = stack.pop()
+        if expanded:
+            res.append(x)
+            continue
+        if id(x) in seen:
+            continue
+        seen.add(id(x))
+        stack.append((x, True))
+        stack.extend((c, False) for c in children(x))
+    return res
+
+
+def _unreified_children(obj):
+    for x in _meta_children(obj):
+        x_obj = x.obj
+        if x_obj is None or isinstance(x_obj, Var):
+            yield x
+
+
+def _slot_values(obj):
+    """Get the slot values of a meta object without converting the deferred
+    ones (see `MetaSymbol._set_slot_lazily`).
+    """
+    deferred = obj.__dict__.get('_deferred_slots') or {}
+    for slot in getattr(obj, '__slots__', []):
+        if slot in deferred:
+            yield deferred[slot][1]
+        else:
+            yield getattr(obj, slot)
+
+
+def _iter_meta_values(values):
+    """Flatten the `list`s and `tuple`s in `values`."""
+    stack = list(values)
+    while stack:
+        x = stack.pop()
+        if isinstance(x, (list, tuple)):
+            stack.extend(x)
+        else:
+            yield x
+
+
+def _is_concrete(x):
+    return x is not None and not isinstance(x, Var)
+
+
+def _has_structural_hash(x):
+    # This avoids the (slow) `abc` instance checks.
+    return type(x).__hash__ is MetaSymbol.__hash__
+
+
+def _hash_node_values(x):
+    """Get the values of a meta object's slots--or of the slots of the meta
+    object that a deferred base object would be converted to--and the `base`
+    that's hashed with them, without converting anything.
+    """
+    if isinstance(x, MetaSymbol):
+        deferred = x.__dict__.get('_deferred_slots') or {}
+        return ([deferred[slot][1] if slot in deferred else getattr(x, slot)
+                 for slot in getattr(x, '__slots__', [])], x.base)
+
+    meta_cls = MetaSymbol._meta_class_for(type(x))
+    if 'from_obj' in meta_cls.__dict__:
+        # These have their own conversions, but they're only used for graph
+        # leaves (e.g. shared variables), so converting them is cheap.
+        return _hash_node_values(meta_cls.from_obj(x))
+    return ([getattr(x, slot, None)
+             for slot in getattr(meta_cls, '__slots__', [])], meta_cls.base)
+
+
+def _is_hash_node(x):
+    """Determine whether or not `x` is hashed by `_meta_hash`, which includes
+    the base objects in deferred slots.
+    """
+    return (_has_structural_hash(x) or
+            isinstance(x, (theano.Variable, theano.Apply, theano.Type)))
+
+
+def _meta_hash(obj):
+    """Compute the structural hash of a meta object (see `MetaSymbol.__hash__`)
+    without recursion.
+    """
+    res = _get_cached(obj, '_hash')
+    if res is not None:
+        return res
+
+    memo = {}
+    values = {}
+
+    def children(x):
+        x_values = values[id(x)] = _hash_node_values(x)
+        for y in _iter_meta_values(x_values[0]):
+            if (_is_hash_node(y) and id(y) not in memo and
+                    not (isinstance(y, MetaSymbol) and
+                         _get_cached(y, '_hash') is not None)):
+                yield y
+
+    def _hash_value(y):
+        if _is_hash_node(y):
+            y_res = memo.get(id(y))
+            if y_res is None:
+                y_res = _get_cached(y, '_hash')
+            return y_res
+        elif isinstance(y, MetaSymbol):
+            # E.g. `MetaOp`s, which have their own hashes.
+            return hash(y)
+        elif isinstance(y, theano.Op):
+            # The hash of the `MetaOp` it would be converted to.
+            return hash((MetaSymbol._meta_class_for(type(y)).base, y))
+        elif isinstance(y, (list, tuple)):
+            return tuple(_hash_value(i) for i in y)
+        elif isinstance(y, np.ndarray):
+            return y.data.tobytes()
+        return y
+
+    for x in _meta_postorder(obj, children):
+        x_values, x_base = values[id(x)]
+        key = tuple(_hash_value(y) for y in x_values)
+        res = memo[id(x)] = hash(key + (x_base,))
+        if isinstance(x, MetaSymbol):
+            _set_cached(x, '_hash', res)
+
+    return memo[id(obj)]
+
+
+def _meta_ground(obj):
+    """Determine whether or not a meta object is ground (see
+    `MetaSymbol.ground`) without recursion.
+    """
+    res = _get_cached(obj, '_ground')
+    if res is not None:
+        return res
+
+    memo = {}
+    values = {}
+
+    def children(x):
+        x_values = values[id(x)] = list(_iter_meta_values(_slot_values(x)))
+        for y in x_values:
+            if (isinstance(y, MetaSymbol) and id(y) not in memo and
+                    _get_cached(y, '_ground') is None):
+                yield y
+
+    for x in _meta_postorder(obj, children):
+        x_obj = x.obj
+        res = not isinstance(x_obj, Var)
+        if res:
+            for y in values[id(x)]:
+                if isinstance(y, MetaSymbol):
+                    y_res = memo.get(id(y))
+                    if y_res is None:
+                        y_res = _get_cached(y, '_ground')
+                else:
+                    y_res = not isinstance(y, Var)
+                if not y_res:
+                    res = False
+                    break
+
+        memo[id(x)] = res
+        _set_cached(x, '_ground', res)
+
+    return memo[id(obj)]
+
+
+def _memoized_reify(reify):
+    """Make a `reify` method reify the sub-objects of a meta object first,
+    without recursion, and reify every (shared) sub-object only once.
+    """
+    @wraps(reify)
+    def _reify(self):
+        self_obj = self.obj
+        if self_obj is not None and not isinstance(self_obj, Var):
+            return self_obj
+
+        state = _meta_thread_state
+        memo = state.reify_memo
+        if memo is not None:
+            res = memo.get(id(self))
+            if res is not None:
+                return res[1]
+            res = reify(self)
+            memo[id(self)] = (self, res)
+            return res
+
+        state.reify_memo = {}
+        try:
+            # With the sub-objects reified (bottom-up), each call to `reify`
+            # only goes one level deep.
+            for x in _meta_postorder(self, _unreified_children)[:-1]:
+                x.reify()
+            return reify(self)
+        finally:
+            state.reify_memo = None
+
+    return _reify
+
 
 def _meta_reify_iter(rands):
     # We want as many of the rands reified as possible,
@@ -42,6 +433,10 @@ def _meta_reify_iter(rands):
     return reified_rands, any_unreified
 
 
+def _meta_tuple(x):
+    return tuple(MetaSymbol.from_obj(i) for i in x)
+
+
 def _check_eq(a, b):
     if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
         return np.array_equal(a, b)
@@ -64,6 +459,14 @@ class MetaSymbolType(abc.ABCMeta):
             """If a slot value is changed, discard any associated non-meta/base
             objects.
             """
+            if attr == 'obj' or attr in all_slots:
+                # The cached structural hash and ground status are no longer
+                # valid, nor are the values cached for the meta objects above
+                # this one.
+                _meta_changed(self, attr, obj)
+                self.__dict__.pop('_hash', None)
+                self.__dict__.pop('_ground', None)
+
             if (getattr(self, 'obj', None) is not None and
                     not isinstance(self.obj, Var) and
                     attr in getattr(self, '__all_slots__', {}) and
@@ -77,8 +480,15 @@ class MetaSymbolType(abc.ABCMeta):
 
         clsdict['__setattr__'] = __setattr__
 
+        if 'reify' in clsdict:
+            clsdict['reify'] = _memoized_reify(clsdict['reify'])
+
         res = super().__new__(cls, name, bases, clsdict)
 
+        # The class hierarchy changed, so the dispatch caches are stale.
+        _base_classes_cache.clear()
+        _meta_class_cache.clear()
+
         # TODO: Could register base classes.
         # E.g. cls.register(bases)
         return res
@@ -96,10 +506,41 @@ class MetaSymbol(metaclass=MetaSymbolType):
 
     @classmethod
     def base_classes(cls, mro_order=True):
+        try:
+            return _base_classes_cache[(cls, mro_order)]
+        except KeyError:
+            pass
+
         res = tuple(c.base for c in cls.__subclasses__())
         if cls is not MetaSymbol:
             res = (cls.base,) + res
         sorted(res, key=lambda c: len(c.mro()), reverse=mro_order)
+
+        _base_classes_cache[(cls, mro_order)] = res
+        return res
+
+    @classmethod
+    def _meta_class_for(cls, obj_type):
+        """Find the most specific meta class under this one that covers a
+        base type.
+
+        The search descends through the first matching subclass at each level
+        and stops at classes that override `from_obj`.
+        """
+        try:
+            return _meta_class_cache[(cls, obj_type)]
+        except KeyError:
+            pass
+
+        res = cls
+        while res is cls or 'from_obj' not in res.__dict__:
+            sub_cls = next((t for t in res.__subclasses__()
+                            if issubclass(obj_type, t.base)), None)
+            if sub_cls is None:
+                break
+            res = sub_cls
+
+        _meta_class_cache[(cls, obj_type)] = res
         return res
 
     @classmethod
@@ -121,20 +562,39 @@ class MetaSymbol(metaclass=MetaSymbolType):
             # Convert elements of the iterable
             return type(obj)([cls.from_obj(o) for o in obj])
 
+        intern_table = _meta_intern_table
+        if intern_table is not None and isinstance(obj, _interned_types):
+            res = intern_table.get(id(obj))
+            if (res is not None and isinstance(res, cls) and
+                    getattr(res, 'obj', None) is obj):
+                return res
+
+        state = _meta_thread_state
+        convert_memo = state.convert_memo
+        if convert_memo is not None and isinstance(obj, _interned_types):
+            res = convert_memo.get(id(obj), (None, None))[1]
+            if res is not None and isinstance(res, cls):
+                return res
+        elif (convert_memo is None and not (_lazy_meta or state.lazy) and
+              isinstance(obj, (theano.Variable, theano.Apply))):
+            return cls._from_obj_postorder(obj)
+
         if inspect.isclass(obj) and issubclass(obj, cls.base_classes()):
             # This is a class/type covered by a meta class/type.
-            try:
-                obj_cls = next(filter(lambda t: issubclass(obj, t.base),
-                                      cls.__subclasses__()))
-            except StopIteration:
-                # The current class is the best fit.
-                if cls.base == obj:
-                    return cls
-                # This object is a subclass of the base type.
-                new_type = type(f'Meta{obj.__name__}', (cls,), {})
+            new_type = _derived_meta_classes.get((cls, obj))
+            if new_type is not None:
                 return new_type(obj)
-            else:
+
+            obj_cls = cls._meta_class_for(obj)
+            if obj_cls is not cls and 'from_obj' in obj_cls.__dict__:
                 return obj_cls.from_obj(obj)
+            # `obj_cls` is the best fit.
+            if obj_cls.base == obj:
+                return obj_cls
+            # This object is a subclass of the base type.
+            new_type = type(f'Meta{obj.__name__}', (obj_cls,), {})
+            _derived_meta_classes[(cls, obj)] = new_type
+            return new_type(obj)
 
         if not isinstance(obj, cls.base_classes()):
             # We might've been given something convertible to a type with a
@@ -149,22 +609,84 @@ class MetaSymbol(metaclass=MetaSymbolType):
                 raise ValueError(
                     'Could not find a MetaSymbol class for {}'.format(obj))
 
-        try:
-            obj_cls = next(filter(lambda t: isinstance(obj, t.base),
-                                  cls.__subclasses__()))
-        except StopIteration:
-            res = cls(*[getattr(obj, s)
-                        for s in getattr(cls, '__slots__', [])],
-                      obj=obj)
-        else:
-            # Descend into this class to find a more suitable one, if any.
+        obj_cls = cls._meta_class_for(type(obj))
+        if obj_cls is not cls and 'from_obj' in obj_cls.__dict__:
+            # This class has its own means of conversion.
             res = obj_cls.from_obj(obj)
+        else:
+            res = obj_cls(*[getattr(obj, s)
+                            for s in getattr(obj_cls, '__slots__', [])],
+                          obj=obj)
+
+        if (intern_table is not None and isinstance(obj, _interned_types) and
+                getattr(res, 'obj', None) is obj):
+            intern_table[id(obj)] = res
+
+        if (convert_memo is not None and isinstance(obj, _interned_types) and
+                getattr(res, 'obj', None) is obj):
+            convert_memo[id(obj)] = (obj, res)
 
         return res
 
+    @classmethod
+    def _from_obj_postorder(cls, obj, known=()):
+        """Convert a Theano graph from its inputs to `obj`, so that the
+        conversion of each object only goes one level deep and shared
+        sub-graphs are converted once.
+
+        The meta objects in `known` are used for their base objects, instead
+        of converting them (and their graphs) again.
+        """
+        state = _meta_thread_state
+        prev_memo = state.convert_memo
+        memo = state.convert_memo = {id(m.obj): (m.obj, m) for m in known
+                                     if isinstance(m, MetaSymbol) and
+                                     isinstance(m.obj, _interned_types)}
+        try:
+            for x in _base_postorder(obj, memo)[:-1]:
+                MetaSymbol.from_obj(x)
+            return cls.from_obj(obj)
+        finally:
+            state.convert_memo = prev_memo
+
     def __init__(self, obj=None):
         self.obj = obj
 
+    def _set_slot_lazily(self, attr, convert, value):
+        """Set a slot to `convert(value)`, but defer the conversion until the
+        slot is first accessed when lazy conversion is enabled.
+        """
+        if ((_lazy_meta or _meta_thread_state.lazy) and value is not None and
+                not self.is_meta(value)):
+            self.__dict__.setdefault('_deferred_slots', {})[attr] = (
+                convert, value)
+        else:
+            setattr(self, attr, convert(value))
+
+    def __getattr__(self, attr):
+        # This is only reached for unset attributes, which includes the slots
+        # with deferred conversions.
+        deferred = self.__dict__.get('_deferred_slots')
+        if deferred and attr in deferred:
+            convert, value = deferred.pop(attr)
+            value = convert(value)
+            object.__setattr__(self, attr, value)
+            return value
+        raise AttributeError(
+            f'{type(self).__name__} object has no attribute {attr}')
+
+    @property
+    def ground(self):
+        """Whether or not this meta object is free of logic variables (i.e.
+        `Var`s), including its base object and all the meta objects beneath
+        it.
+
+        Like the structural hash, the result is cached and discarded when a
+        slot or base object of this, or any cached, meta object is changed.
+        Deferred slots are not converted.
+        """
+        return _meta_ground(self)
+
     def rands(self):
         """Create a tuple of the meta object's operator parameters (i.e. "rands").
         """
@@ -199,9 +721,25 @@ class MetaSymbol(metaclass=MetaSymbolType):
         # b_sub_a = isinstance(other, type(self))
         # if not (a_sub_b or b_sub_a):
         #     return False
+        if self is other:
+            return True
+
         if not (type(self) == type(other)):
             return False
 
+        # Differing cached hashes imply inequality.
+        self_hash = _get_cached(self, '_hash')
+        other_hash = _get_cached(other, '_hash')
+        if (self_hash is not None and other_hash is not None and
+                self_hash != other_hash):
+            return False
+
+        # Meta objects for the same (reified) base object are equal.
+        self_obj = self.obj
+        if (self_obj is not None and not isinstance(self_obj, Var) and
+                self_obj is other.obj):
+            return True
+
         # TODO: ?
         # Same for base objects
         # a_sub_b = isinstance(self.base, type(other.base))
@@ -240,15 +778,17 @@ class MetaSymbol(metaclass=MetaSymbolType):
         return not self.__eq__(other)
 
     def __hash__(self):
-        def _make_hashable(x):
-            if isinstance(x, list):
-                return tuple(x)
-            elif isinstance(x, np.ndarray):
-                return x.data.tobytes()
-            else:
-                return x
-        rands = tuple(_make_hashable(p) for p in self.rands())
-        return hash(rands + (self.base,))
+        """Compute a structural hash.
+
+        The hashes of the meta objects beneath this one are combined.
+        Deferred slots (see `lazy_meta_objects`) aren't converted; the base
+        objects in them are hashed like the meta objects they'd be converted
+        to.
+
+        The hash is cached; changing a slot value or base object of this, or
+        any cached, meta object discards it.
+        """
+        return _meta_hash(self)
 
     def __str__(self):
         obj = getattr(self, 'obj', None)
@@ -281,6 +821,10 @@ class MetaRandomStateType(MetaType):
     base = tt.raw_random.RandomStateType
 
 
+class MetaRandomGeneratorType(MetaType):
+    base = RandomGeneratorType
+
+
 class MetaTensorType(MetaType):
     base = tt.TensorType
     __slots__ = ['dtype', 'broadcastable', 'name']
@@ -354,11 +898,27 @@ class MetaOp(MetaSymbol):
         # Use the `Op`'s default `make_node` arguments, if any.
         op_arg_bind = self.op_sig.bind(*args, **kwargs)
         op_arg_bind.apply_defaults()
-        op_args, op_args_unreified = _meta_reify_iter(op_arg_bind.args)
+
+        if any(isinstance(a, MetaSymbol) and
+               (a.obj is None or isinstance(a.obj, Var)) and not a.ground
+               for a in op_arg_bind.args):
+            # Meta objects containing logic variables can't be reified, so
+            # don't bother trying (e.g. when building large patterns).
+            op_args, op_args_unreified = op_arg_bind.args, True
+        else:
+            op_args, op_args_unreified = _meta_reify_iter(op_arg_bind.args)
 
         if not op_args_unreified:
             tt_out = self.obj(*op_args)
-            res_var = MetaVariable.from_obj(tt_out)
+
+            state = _meta_thread_state
+            if (state.convert_memo is None and
+                    not (_lazy_meta or state.lazy)):
+                # Reuse the meta objects we were given for the inputs.
+                res_var = MetaVariable._from_obj_postorder(
+                    tt_out, known=op_arg_bind.args)
+            else:
+                res_var = MetaVariable.from_obj(tt_out)
 
             # If the name is indeterminate, we still want all the reified info,
             # but we need to make sure that certain parts aren't known.
@@ -464,8 +1024,8 @@ class MetaApply(MetaSymbol):
 
     def __init__(self, op, inputs, outputs=None, obj=None):
         super().__init__(obj=obj)
-        self.op = MetaOp.from_obj(op)
-        self.inputs = tuple(MetaSymbol.from_obj(i) for i in inputs)
+        self._set_slot_lazily('op', MetaOp.from_obj, op)
+        self._set_slot_lazily('inputs', _meta_tuple, inputs)
         self.outputs = outputs
 
     def reify(self):
@@ -501,8 +1061,8 @@ class MetaVariable(MetaSymbol):
 
     def __init__(self, type, owner, index, name, obj=None):
         super().__init__(obj=obj)
-        self.type = MetaType.from_obj(type)
-        self.owner = MetaApply.from_obj(owner)
+        self._set_slot_lazily('type', MetaType.from_obj, type)
+        self._set_slot_lazily('owner', MetaApply.from_obj, owner)
         self.index = index
         self.name = name
 
@@ -550,7 +1110,15 @@ class MetaVariable(MetaSymbol):
             self.obj = tt_var
             return tt_var
 
-        return super().reify()
+        # Reuse the reified rands instead of reifying them again with
+        # `MetaSymbol.reify`.
+        rator = self.base if not any_unreified else type(self)
+        res = rator(*reified_rands)
+
+        if not any_unreified:
+            self.obj = res
+
+        return res
 
 
 class MetaTensorVariable(MetaVariable):
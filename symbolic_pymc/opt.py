@@ -1,18 +1,39 @@
+import os
+import time
 import types
+import inspect
+import pickle
+import logging
+import multiprocessing
 
+from collections import ChainMap, Counter, OrderedDict, namedtuple
+from functools import partial
+from itertools import islice
+
+import numpy as np
 import theano
 import theano.tensor as tt
 
 from functools import wraps
-from unification import var, variables
+from unification import var, variables, isvar, reify
+
+from kanren import run, eq, conde
+from kanren.core import evalt, goaleval, lall
+from kanren.util import unique, multihash
+from kanren.facts import Relation
+
+from theano.gof.opt import Optimizer, LocalOptimizer
+from theano.gof.graph import inputs as tt_inputs, io_toposort
+from theano.gof.fg import InconsistencyError
+from theano.gof.toolbox import Feature, AlreadyThere, ReplaceValidate
+from theano.tensor.nlinalg import MatrixInverse
 
-from kanren import run
-from kanren.core import evalt
+from .meta import MetaSymbol, MetaVariable, MetaApply
+from .unify import (reify_all_terms, compile_pattern, ExpressionTuple,
+                    Substitution)
 
-from theano.gof.opt import LocalOptimizer
 
-from .meta import MetaSymbol
-from .unify import reify_all_terms
+logger = logging.getLogger("symbolic_pymc")
 
 
 def reify_meta(x):
@@ -97,26 +118,588 @@ class FunctionGraph(theano.gof.fg.FunctionGraph):
 
             assert r not in self.inputs
 
+    def replace_all(self, pairs, reason=None, verbose=None,
+                    remove_dup_inputs=True):
+        """Replace multiple variables at once.
+
+        Unlike `theano.gof.fg.FunctionGraph.replace_all`, all the replacements
+        are checked before the graph is changed, the graph is only sorted
+        once, and the inputs list is only rebuilt once.  Each replacement
+        still triggers the features' change callbacks.
+
+        When a `Validator` feature (e.g. `ReplaceValidate`) is attached, the
+        graph is validated once, after all the replacements; if that fails,
+        the replacements are reverted--when a `History` feature is attached,
+        too--and the error is raised.
+
+        Replacements are applied in reverse topological order of the replaced
+        variables (i.e. from the outputs toward the inputs), so that
+        clients pruned by one replacement aren't needlessly updated by
+        another.
+
+        Parameters
+        ==========
+        pairs: dict or Iterable of tuples
+            The variables to replace and their replacements (e.g. the
+            dictionaries produced by `conjugate_posteriors`).
+        reason: str (optional)
+            See `theano.gof.fg.FunctionGraph.replace`.
+        verbose: bool (optional)
+            See `theano.gof.fg.FunctionGraph.replace`.
+        remove_dup_inputs: bool (optional)
+            Remove inputs that are duplicated by a replacement.
+        """
+        if isinstance(pairs, dict):
+            pairs = pairs.items()
+
+        checked_pairs = []
+        for r, new_r in pairs:
+            if hasattr(r, 'fgraph') and r.fgraph is not self:
+                raise ValueError(
+                    f'Cannot replace {r} because it does not belong to this '
+                    f'FunctionGraph: {reason}')
+
+            if r is new_r or r not in self.variables:
+                continue
+
+            if r.type != new_r.type:
+                new_r_conv = r.type.convert_variable(new_r)
+                if new_r_conv is None or new_r_conv.type != r.type:
+                    raise TypeError(
+                        'The type of the replacement must be the same as the '
+                        f'type of the original variable: {r}, {new_r}')
+                new_r = new_r_conv
+
+            checked_pairs.append((r, new_r))
+
+        if not checked_pairs:
+            return
+
+        node_order = {n: i for i, n in enumerate(self.toposort())}
+        checked_pairs.sort(key=lambda p: node_order.get(p[0].owner, -1),
+                           reverse=True)
+
+        validate = getattr(self, 'validate', None)
+        chk = None
+        if validate is not None and hasattr(self, 'checkpoint'):
+            chk = self.checkpoint()
+
+        replaced_inputs = {}
+        try:
+            for r, new_r in checked_pairs:
+                # Replacements of earlier pairs could've removed this
+                # variable.
+                if r not in self.variables:
+                    continue
+
+                super().replace(r, new_r, reason=reason, verbose=verbose)
+
+                if r in self.inputs:
+                    replaced_inputs[r] = new_r
+
+            if validate is not None:
+                validate()
+        except Exception:
+            if chk is not None:
+                self.revert(chk)
+            raise
+
+        if replaced_inputs:
+            new_inputs = []
+            for i in self.inputs:
+                i = replaced_inputs.get(i, i)
+                if remove_dup_inputs and i in new_inputs:
+                    continue
+                new_inputs.append(i)
+
+            self.inputs = new_inputs
+
     def clone_get_equiv(self, *args, **kwargs):
         fg, var_map = super().clone_get_equiv(*args, **kwargs)
         fg.__class__ = self.__class__
         return fg, var_map
 
 
+def _term_head(x):
+    """Return the operator and arity of a term that's expected to unify with
+    the output of an `Apply` node.
+
+    Unknown values (e.g. logic variables) are returned as `None`.
+    """
+    if isinstance(x, tt.Variable):
+        x = MetaSymbol.from_obj(x)
+
+    if not isinstance(x, MetaVariable) or not isinstance(x.owner, MetaApply):
+        return None, None
+
+    op = x.owner.op
+    if isvar(op) or isvar(op.obj) or op.obj is None:
+        op = None
+    else:
+        op = op.obj
+
+    inputs = x.owner.inputs
+    nin = len(inputs) if isinstance(inputs, (tuple, list)) else None
+
+    return op, nin
+
+
+def _term_depth(x):
+    """Return the number of `Apply` node levels in a term (e.g. the input
+    term of a fact), counting tuple-form expressions as one level.
+    """
+    depths = {}
+    stack = [(x, False)]
+    while stack:
+        y, expanded = stack.pop()
+        if id(y) in depths:
+            continue
+
+        if isinstance(y, MetaVariable) and isinstance(y.owner, MetaApply):
+            children = y.owner.inputs
+            levels = 1
+        elif isinstance(y, ExpressionTuple):
+            children = y[1:]
+            levels = 1
+        elif isinstance(y, (list, tuple)):
+            children = y
+            levels = 0
+        else:
+            depths[id(y)] = 0
+            continue
+
+        if not isinstance(children, (list, tuple)):
+            children = ()
+
+        if expanded:
+            depths[id(y)] = levels + max((depths[id(c)] for c in children),
+                                         default=0)
+        else:
+            stack.append((y, True))
+            stack.extend((c, False) for c in children)
+
+    return depths[id(x)]
+
+
+class RelationIndex(object):
+    """An index for the facts in a `kanren.facts.Relation`.
+
+    Facts are keyed on the `Op` and number of inputs of their input terms, so
+    that the facts that could possibly match a node can be found without
+    running miniKanren.  Facts with unknown input operators or arities (e.g.
+    logic variables) are considered candidates for every node.
+
+    The input terms are also compiled into matchers (see `compile_pattern`),
+    so that the candidates can be checked against a term without running
+    miniKanren.
+
+    The index is rebuilt when facts are added to the relation.
+    """
+
+    def __init__(self, relation, position=0):
+        """
+        Parameters
+        ==========
+        relation: kanren.facts.Relation
+            The relation to index.
+        position: int (optional)
+            The position of the input term in the relation's facts.
+        """
+        self.relation = relation
+        self.position = position
+        self._n_facts = None
+
+    def _update(self):
+        if self._n_facts == len(self.relation.facts):
+            return
+
+        self._by_head = {}
+        self._by_op = {}
+        self._wildcards = []
+        self._patterns = {}
+        self._depth = 0
+
+        for f in self.relation.facts:
+            self._patterns[id(f)] = compile_pattern(f[self.position])
+            self._depth = max(self._depth, _term_depth(f[self.position]))
+            op, nin = _term_head(f[self.position])
+            if op is None:
+                self._wildcards.append(f)
+            elif nin is None:
+                self._by_op.setdefault(op, []).append(f)
+            else:
+                self._by_head.setdefault((op, nin), []).append(f)
+
+        self._n_facts = len(self.relation.facts)
+
+    @property
+    def depth(self):
+        """The maximum number of `Apply` node levels in the facts' input
+        terms.
+        """
+        self._update()
+        return self._depth
+
+    def candidates(self, node):
+        """Return the facts that could match the output of an `Apply` node.
+        """
+        self._update()
+        return (self._by_head.get((node.op, len(node.inputs)), []) +
+                self._by_op.get(node.op, []) +
+                self._wildcards)
+
+    def matching(self, node, term=None):
+        """Return the candidate facts for an `Apply` node with input terms
+        that unify with `term`.
+
+        `term` defaults to the node's default output.  The facts' logic
+        variables must be `Var`s, since the patterns are compiled outside of
+        any `unification.variables` context.
+        """
+        if term is None:
+            term = node.default_output()
+        return [f for f in self.candidates(node)
+                if self._patterns[id(f)].matches(term)]
+
+
+GraphCost = namedtuple('GraphCost', ['flops', 'inverses', 'nodes'])
+GraphCost.__doc__ = """The estimated cost of computing a graph (see
+`graph_cost`).
+
+Costs compare by their estimated number of floating point operations, then
+their number of matrix inverses and, finally, their number of nodes.
+"""
+
+
+def _estimated_shape(x, dim_size):
+    """Get the shape of a variable's test value or a guess based on its
+    broadcastable dimensions.
+    """
+    test_value = getattr(x.tag, 'test_value', None)
+    if test_value is not None:
+        return np.shape(test_value)
+    return tuple(1 if b else dim_size
+                 for b in getattr(x.type, 'broadcastable', ()))
+
+
+def graph_cost(outputs, dim_size=100, given=None):
+    """Estimate the cost of computing the outputs of a graph.
+
+    The number of floating point operations is estimated from the shapes of
+    each node's inputs and outputs: a matrix inverse costs `n**3`, a dot
+    product costs `m * k * n` and the other nodes (e.g. element-wise
+    operations and random variables) cost the size of their outputs.
+    `DimShuffle`s are free.
+
+    Parameters
+    ==========
+    outputs: Variable or list of Variable
+        The outputs of the graph.
+    dim_size: int (optional)
+        The length of the non-broadcastable dimensions of variables without
+        test values.
+    given: Container of Variable (optional)
+        Variables that are already computed (e.g. the variables of an existing
+        `FunctionGraph`).  They're free, and so are the graphs beneath them.
+
+    Results
+    =======
+    out: GraphCost
+    """
+    if isinstance(outputs, tt.Variable):
+        outputs = [outputs]
+
+    if given is None:
+        given = ()
+
+    flops = 0
+    inverses = 0
+    nodes = set()
+    stack = list(outputs)
+    while stack:
+        v = stack.pop()
+        node = v.owner
+        if node is None or node in nodes or v in given:
+            continue
+        nodes.add(node)
+        stack.extend(node.inputs)
+
+        op = node.op
+        if isinstance(op, MatrixInverse):
+            n = (_estimated_shape(node.inputs[0], dim_size) or (1,))[-1]
+            flops += n**3
+            inverses += 1
+        elif isinstance(op, tt.basic.Dot):
+            x_shape, y_shape = (_estimated_shape(i, dim_size)
+                                for i in node.inputs)
+            flops += (int(np.prod(x_shape)) *
+                      (y_shape[-1] if len(y_shape) > 1 else 1))
+        elif not isinstance(op, tt.DimShuffle):
+            flops += sum(int(np.prod(_estimated_shape(o, dim_size)))
+                         for o in node.outputs)
+
+    return GraphCost(flops, inverses, len(nodes))
+
+
+ReifiedResult = namedtuple('ReifiedResult', ['result', 'replacement'])
+ReifiedResult.__doc__ = """A miniKanren result chosen by a
+`KanrenRelationSub.results_filter`, along with the Theano replacement it
+reifies to (see `reify_result`), so that it isn't reified again.
+"""
+
+
+def reify_result(kanren_res):
+    """Reify the meta objects and tuple-form expressions in a miniKanren
+    result.
+
+    Results of the form `etuple(dict, ...)` give a `dict` mapping the base
+    objects of their keys to the reified values.
+    """
+    if isinstance(kanren_res, tuple) and kanren_res and kanren_res[0] == dict:
+        return {k.obj: reify_meta(v) for k, v in evalt(kanren_res).items()}
+    return reify_meta(kanren_res)
+
+
+def cheapest_result_filter(max_results=10, cost=graph_cost):
+    """Create a `KanrenRelationSub.results_filter` that chooses the miniKanren
+    result with the cheapest graph.
+
+    Parts of a result that are already in the node's `FunctionGraph` (e.g.
+    a reused sub-term) are free.
+
+    Parameters
+    ==========
+    max_results: int (optional)
+        The number of results to compare.  `None` compares all of them.
+    cost: function (optional)
+        A function that estimates the cost of a list of Theano variables and
+        takes the variables that are already computed as a `given` keyword
+        argument (see `graph_cost`).
+
+    Results
+    =======
+    out: function
+        A filter that returns a `ReifiedResult`.
+    """
+    def _cheapest_result(results, node=None):
+        fgraph = getattr(node, 'fgraph', None)
+        given = fgraph.variables if fgraph is not None else None
+
+        best_res, best_cost = None, None
+        for res in islice(results, max_results):
+            try:
+                replacement = reify_result(res)
+            except ValueError:
+                continue
+
+            if isinstance(replacement, dict):
+                terms = replacement.values()
+            else:
+                terms = [replacement]
+
+            res_cost = cost([t for t in terms if isinstance(t, tt.Variable)],
+                            given=given)
+            if best_cost is None or res_cost < best_cost:
+                best_res = ReifiedResult(res, replacement)
+                best_cost = res_cost
+
+        return best_res
+
+    return _cheapest_result
+
+
+class KanrenResultCache(Feature):
+    """A `FunctionGraph` feature that caches the results of
+    `KanrenRelationSub.transform`.
+
+    Results are stored per optimizer and node, along with a key containing
+    the node's `Op` and inputs.  When a node's inputs change, the cached
+    results for it and all of its (transitive) clients are dropped, since
+    the terms they produce--and, thus, the results of unifying them--may
+    have changed.
+    """
+
+    def on_attach(self, fgraph):
+        if hasattr(fgraph, 'kanren_result_cache'):
+            raise AlreadyThere('KanrenResultCache is already attached')
+
+        self.results = {}
+        fgraph.kanren_result_cache = self
+
+    def on_detach(self, fgraph):
+        del fgraph.kanren_result_cache
+        self.results = {}
+
+    @classmethod
+    def get_cache(cls, fgraph):
+        """Get the cache attached to `fgraph`, attaching one if necessary."""
+        if not hasattr(fgraph, 'kanren_result_cache'):
+            fgraph.attach_feature(cls())
+        return fgraph.kanren_result_cache
+
+    def results_for(self, optimizer):
+        return self.results.setdefault(optimizer, {})
+
+    def invalidate(self, fgraph, node):
+        """Remove the cached results for `node` and its transitive clients."""
+        visited = set()
+        to_visit = [node]
+        while to_visit:
+            n = to_visit.pop()
+            if n in visited or n == 'output':
+                continue
+            visited.add(n)
+
+            for opt_results in self.results.values():
+                opt_results.pop(n, None)
+
+            for o in n.outputs:
+                to_visit.extend(c for c, _ in fgraph.clients(o))
+
+    def on_change_input(self, fgraph, node, i, r, new_r, reason=None):
+        self.invalidate(fgraph, node)
+
+    def on_prune(self, fgraph, node, reason):
+        for opt_results in self.results.values():
+            opt_results.pop(node, None)
+
+
+class SearchBudgetExhausted(Exception):
+    """Raised when a miniKanren search exceeds its `SearchBudget`."""
+
+
+# Returned by `KanrenRelationSub._transform` when a node's search was cut
+# short, so that the (incomplete) result isn't cached.
+_budget_exhausted = object()
+
+
+class SearchBudget(object):
+    """Limits on the miniKanren searches performed by a `KanrenRelationSub`.
+
+    The per-node limits apply to each node's search: the number of goal steps
+    (i.e. unifications), the wall time in seconds, and the number of results
+    given to the results filter.  The per-optimizer limits apply to the total
+    steps and time of all the searches.
+
+    A search that exceeds a step or time limit produces no match; the results
+    limit only truncates the stream of results.  The number of times each limit
+    was reached is counted in `exhausted`.
+
+    The per-optimizer limits can't be used with `KanrenParallelOptimizer`'s
+    worker processes, since the searches in each process would only count
+    toward that process's totals.
+    """
+
+    def __init__(self, max_steps=None, max_time=None, max_results=None,
+                 max_total_steps=None, max_total_time=None):
+        self.max_steps = max_steps
+        self.max_time = max_time
+        self.max_results = max_results
+        self.max_total_steps = max_total_steps
+        self.max_total_time = max_total_time
+        self.reset()
+
+    def reset(self):
+        """Reset the totals and counters."""
+        self.total_steps = 0
+        self.total_time = 0.0
+        self.exhausted = Counter()
+
+    def search(self):
+        """Start tracking a search."""
+        return _Search(self)
+
+    def update(self, other):
+        """Add the totals and counters of another budget (e.g. a worker
+        process's copy of this one).
+        """
+        self.total_steps += other.total_steps
+        self.total_time += other.total_time
+        self.exhausted.update(other.exhausted)
+
+
+class _Search(object):
+    """The steps, time and results of a single search within a
+    `SearchBudget`.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.steps = 0
+        self.results = 0
+        self.exhausted = None
+        self.start_time = time.perf_counter()
+
+    def step(self):
+        """Count a goal step and raise `SearchBudgetExhausted` when a limit is
+        exceeded.
+        """
+        budget = self.budget
+        self.steps += 1
+        budget.total_steps += 1
+
+        if budget.max_steps is not None and self.steps > budget.max_steps:
+            self.exhausted = 'steps'
+        elif (budget.max_total_steps is not None and
+              budget.total_steps > budget.max_total_steps):
+            self.exhausted = 'total_steps'
+        elif budget.max_time is not None or budget.max_total_time is not None:
+            elapsed = time.perf_counter() - self.start_time
+            if budget.max_time is not None and elapsed > budget.max_time:
+                self.exhausted = 'time'
+            elif (budget.max_total_time is not None and
+                  budget.total_time + elapsed > budget.max_total_time):
+                self.exhausted = 'total_time'
+
+        if self.exhausted is not None:
+            raise SearchBudgetExhausted(self.exhausted)
+
+    def next_result(self):
+        """Return `False` when no more results should be examined; otherwise,
+        count the next result.
+        """
+        max_results = self.budget.max_results
+        if max_results is not None and self.results >= max_results:
+            self.budget.exhausted['results'] += 1
+            return False
+        self.results += 1
+        return True
+
+    def finish(self):
+        self.budget.total_time += time.perf_counter() - self.start_time
+        if self.exhausted is not None:
+            self.budget.exhausted[self.exhausted] += 1
+
+
+class _BudgetSubstitution(Substitution):
+    """A `Substitution` that counts a search step each time it's extended by
+    `unify`.
+    """
+
+    def copy(self):
+        self.search.step()
+        s = type(self)(self)
+        s.search = self.search
+        return s
+
+
 class KanrenRelationSub(LocalOptimizer):
     """A local optimizer that uses miniKanren goals to match and replace
     terms in a Theano `FunctionGraph`.
 
 
-    TODO: Only uses *one* miniKanren `run` result (chosen by a configurable
-    filter function).  We might want an option to produce multiple graphs, but
-    I imagine that would involve an entirely different optimizer type.
+    Only *one* miniKanren `run` result (chosen by a configurable filter
+    function) is used by `transform`; see `transforms` and `graph_rewrites`
+    for the graphs produced by multiple results.
     """
     reentrant = True
 
     def __init__(self, kanren_relation, relation_lvars=None,
                  results_filter=lambda x: next(iter(x), None),
-                 node_filter=lambda x: False):
+                 node_filter=lambda x: False,
+                 relation_index=None,
+                 cache_results=True,
+                 search_budget=None):
         """
         Parameters
         ==========
@@ -128,15 +711,50 @@ class KanrenRelationSub(LocalOptimizer):
             (i.e. Theano terms used as "unknowns" in `kanren_relation`).
         results_filter: function
             A function that returns a single result from a stream of
-            miniKanren results.  The default function returns the first result.
+            miniKanren results.  The default function returns the first result;
+            see `cheapest_result_filter` for one that uses `graph_cost`.
+            Filters with a `node` parameter are also given the node being
+            transformed, and filters can return a `ReifiedResult` to avoid
+            reifying the chosen result again.
         node_filter: function
             A function taking a single node as an argument that returns `True`
             when the node should be skipped.
+        relation_index: kanren.Relation or RelationIndex (optional)
+            An index used to skip nodes that can't match any of a relation's
+            facts.  When `kanren_relation` is a `Relation`, it's indexed by
+            default.  Custom goals that only succeed when their input matches
+            a fact in a `Relation` (e.g. `conjugate_posteriors`) can use that
+            relation here.
+        cache_results: bool (optional)
+            Cache the results for each node in a `KanrenResultCache` attached
+            to the node's `FunctionGraph`, so that unchanged nodes aren't
+            re-evaluated by miniKanren.  The relation is assumed to be
+            constant; only the addition of new facts to an indexed `Relation`
+            is tracked.
+        search_budget: SearchBudget (optional)
+            Limits on the miniKanren searches, so that relations that explode
+            combinatorially (e.g. ones using associative and commutative
+            facts) can't stall an optimization.
         """
         self.kanren_relation = kanren_relation
         self.relation_lvars = relation_lvars or []
         self.results_filter = results_filter
         self.node_filter = node_filter
+
+        try:
+            filter_params = inspect.signature(results_filter).parameters
+        except (TypeError, ValueError):
+            filter_params = {}
+        self._filter_takes_node = 'node' in filter_params
+
+        if relation_index is None and isinstance(kanren_relation, Relation):
+            relation_index = kanren_relation
+        if isinstance(relation_index, Relation):
+            relation_index = RelationIndex(relation_index)
+        self.relation_index = relation_index
+        self.cache_results = cache_results
+        self.search_budget = search_budget
+
         super().__init__()
 
     def adjust_outputs(self, node, new_node, old_node=None):
@@ -159,34 +777,906 @@ class KanrenRelationSub(LocalOptimizer):
         res[new_node_idx] = new_node
         return res
 
-    def transform(self, node):
+    def transform(self, node, cache_results=None):
+        """See `LocalOptimizer.transform`.
+
+        `cache_results` overrides the optimizer's setting.
+        """
         if not isinstance(node, tt.Apply):
             return False
 
         if self.node_filter(node):
             return False
 
+        fgraph = getattr(node, 'fgraph', None)
+
+        if cache_results is None:
+            cache_results = self.cache_results
+
+        if not cache_results or fgraph is None:
+            new_node = self._transform(node)
+            return False if new_node is _budget_exhausted else new_node
+
+        cache = KanrenResultCache.get_cache(fgraph).results_for(self)
+
+        if self.relation_index is not None:
+            n_facts = len(self.relation_index.relation.facts)
+        else:
+            n_facts = None
+
+        key = (node.op, tuple(node.inputs), n_facts)
+
+        cached = cache.get(node)
+
+        if cached is not None and cached[0] == key:
+            new_node = cached[1]
+        else:
+            new_node = self._transform(node)
+            if new_node is _budget_exhausted:
+                # The search was cut short, so the node could still match
+                # (e.g. after the budget is reset).
+                cache.pop(node, None)
+                return False
+            cache[node] = (key, new_node)
+
+        # Don't let callers modify the cached results.
+        if isinstance(new_node, dict):
+            return dict(new_node)
+        elif isinstance(new_node, list):
+            return list(new_node)
+
+        return new_node
+
+    def _goal(self, node, input_expr, q):
+        """Create the goal relating a node's output to its replacement `q`, or
+        return `None` when none of the relation's facts could match.
+        """
+        if self.relation_index is not None:
+            if self.relation_lvars:
+                facts = self.relation_index.candidates(node)
+            else:
+                facts = self.relation_index.matching(node, input_expr)
+
+            if not facts:
+                return None
+
+            if self.relation_index.relation is self.kanren_relation:
+                # Only consider the candidate facts.
+                return (conde,) + tuple([(eq, f, (input_expr, q))]
+                                        for f in facts)
+
+        return (self.kanren_relation, input_expr, q)
+
+    def _results(self, node, search=None):
+        """Lazily generate the miniKanren results for a node.
+
+        The `relation_lvars` are only considered logic variables while
+        miniKanren produces each result, so that they don't affect the code
+        consuming the results.
+
+        When a `_Search` is given, the results end when its budget is
+        exhausted.
+        """
+        q = var()
         input_expr = node.default_output()
 
         with variables(*self.relation_lvars):
-            q = var()
-            kanren_results = run(1, q, (self.kanren_relation, input_expr, q))
+            goal = self._goal(node, input_expr, q)
+            if goal is None:
+                return
+
+            if search is None:
+                kanren_results = iter(run(None, q, goal))
+            else:
+                # This is `kanren.run` starting with a substitution that
+                # counts the search's steps.
+                s = _BudgetSubstitution()
+                s.search = search
+                kanren_results = unique(
+                    map(partial(reify, q), goaleval(lall(goal))(s)),
+                    key=multihash)
+
+        while True:
+            if search is not None and not search.next_result():
+                return
+
+            with variables(*self.relation_lvars):
+                try:
+                    res = next(kanren_results)
+                except (StopIteration, SearchBudgetExhausted):
+                    return
+            yield res
+
+    def _search(self):
+        if self.search_budget is None:
+            return None
+        return self.search_budget.search()
+
+    def _replacement(self, node, kanren_res):
+        """Turn the meta objects and tuple-form expressions in a miniKanren
+        result (or a `ReifiedResult`) into Theano objects.
+        """
+        if isinstance(kanren_res, ReifiedResult):
+            new_node = kanren_res.replacement
+        else:
+            new_node = reify_result(kanren_res)
+
+        if isinstance(new_node, dict):
+            # We got a dictionary of replacements.
+            fgraph = getattr(node, 'fgraph', None)
+            assert fgraph is None or all(k in fgraph.variables
+                                         for k in new_node)
+        else:
+            new_node = self.adjust_outputs(node, new_node)
+
+        return new_node
+
+    def _filter_results(self, node, results):
+        if self._filter_takes_node:
+            return self.results_filter(results, node=node)
+        return self.results_filter(results)
 
-        chosen_res = self.results_filter(kanren_results)
+    def _transform(self, node):
+        search = self._search()
+        if search is None:
+            chosen_res = self._filter_results(node, self._results(node))
+        else:
+            try:
+                chosen_res = self._filter_results(
+                    node, self._results(node, search))
+            finally:
+                search.finish()
+
+            if search.exhausted is not None:
+                return _budget_exhausted
 
         if chosen_res:
-            # Turn the meta objects and tuple-form expressions into Theano
-            # objects.
-            if isinstance(chosen_res, tuple) and chosen_res[0] == dict:
-                # We got a dictionary of replacements.
-                new_node = {k.obj: reify_meta(v)
-                            for k, v in evalt(chosen_res).items()}
-
-                assert all(k in node.fgraph.variables
-                           for k in new_node)
-            else:
-                new_node = self.adjust_outputs(node, reify_meta(chosen_res))
+            return self._replacement(node, chosen_res)
+        else:
+            return False
+
+    def transforms(self, node):
+        """Lazily generate a replacement for each of a node's miniKanren
+        results.
+
+        The replacements have the same form as the results of `transform`, but
+        they aren't filtered by `results_filter` or cached.
+        """
+        if not isinstance(node, tt.Apply) or self.node_filter(node):
+            return
+
+        search = self._search()
+        try:
+            for res in self._results(node, search):
+                if res:
+                    yield self._replacement(node, res)
+        finally:
+            if search is not None:
+                search.finish()
+
+
+def _match_depth(local_optimizers):
+    """Return the maximum number of `Apply` node levels matched by the given
+    optimizers, or `None` when it's unknown.
+    """
+    depth = 0
+    for lopt in local_optimizers:
+        relation_index = getattr(lopt, 'relation_index', None)
+        if (relation_index is None or
+                relation_index.relation is not lopt.kanren_relation):
+            return None
+        depth = max(depth, relation_index.depth)
+
+    return depth
+
+
+class KanrenWorklist(Feature):
+    """A `FunctionGraph` feature that tracks the nodes that need to be
+    (re)visited by `KanrenEquilibriumOptimizer`.
+
+    Nodes are added when they're imported and when their inputs change, along
+    with their clients up to `client_depth` levels up (or all of them, when
+    `client_depth` is `None`), since the terms those nodes produce have
+    changed.
+    """
+
+    def __init__(self, client_depth=None):
+        self.client_depth = client_depth
+        self.nodes = OrderedDict()
+
+    def on_attach(self, fgraph):
+        if hasattr(fgraph, 'kanren_worklist'):
+            raise AlreadyThere('KanrenWorklist is already attached')
+
+        fgraph.kanren_worklist = self
+        self.nodes = OrderedDict((n, None) for n in fgraph.toposort())
+
+    def on_detach(self, fgraph):
+        del fgraph.kanren_worklist
+        self.nodes = OrderedDict()
+
+    def pop(self):
+        """Remove and return the next node to visit."""
+        return self.nodes.popitem(last=False)[0]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def revert(self, size):
+        """Remove the nodes added since the worklist had `size` nodes (e.g. by
+        a replacement that failed validation and was reverted)."""
+        while len(self.nodes) > size:
+            self.nodes.popitem()
+
+    def on_import(self, fgraph, node, reason):
+        self.nodes[node] = None
+
+    def on_change_input(self, fgraph, node, i, r, new_r, reason=None):
+        if node == 'output':
+            return
+
+        level_nodes = [node]
+        depth = 0
+        visited = set()
+        while level_nodes:
+            next_nodes = []
+            for n in level_nodes:
+                if n == 'output' or n in visited:
+                    continue
+                visited.add(n)
+                self.nodes[n] = None
+                if self.client_depth is None or depth < self.client_depth:
+                    next_nodes.extend(c for o in n.outputs
+                                      for c, _ in fgraph.clients(o))
+            level_nodes = next_nodes
+            depth += 1
+
+    def on_prune(self, fgraph, node, reason):
+        self.nodes.pop(node, None)
+
+
+class KanrenEquilibriumOptimizer(Optimizer):
+    """An equilibrium optimizer for `KanrenRelationSub`s (and other local
+    optimizers) that only revisits the nodes affected by its changes.
+
+    Unlike `theano.gof.opt.EquilibriumOptimizer`, which visits every node in
+    the graph on each pass, this optimizer keeps a worklist (see
+    `KanrenWorklist`) that starts with every node and is extended with the
+    nodes whose terms were changed by a replacement.  The optimization ends
+    when the worklist is empty or the budget is spent.
+
+    Replacements are validated (see `ReplaceValidate`); the ones that fail
+    validation are reverted and the node's next optimizer is tried.
+
+    The statistics for the last optimization--i.e. the number of nodes each
+    local optimizer was applied to, the number of replacements it produced
+    and the time it took--are kept in `stats`.
+    """
+
+    def __init__(self, local_optimizers, max_steps=None, client_depth=None):
+        """
+        Parameters
+        ==========
+        local_optimizers: list of LocalOptimizer
+            The optimizers to apply to each node, in order.  Only the first
+            replacement for a node is used.
+        max_steps: int (optional)
+            The maximum number of times a local optimizer is applied.
+            Defaults to `10` times the number of nodes in the graph.
+        client_depth: int (optional)
+            The number of levels of clients to revisit when a node's inputs
+            change.  By default, it's determined by the input terms of the
+            relations indexed by `KanrenRelationSub`s; when that isn't
+            possible, all the (transitive) clients are revisited.
+        """
+        super().__init__()
+        self.local_optimizers = list(local_optimizers)
+        self.max_steps = max_steps
+        self.client_depth = client_depth
+        self.stats = OrderedDict()
+
+    def add_requirements(self, fgraph):
+        fgraph.attach_feature(ReplaceValidate())
+
+    def _client_depth(self):
+        if self.client_depth is not None:
+            return self.client_depth
+
+        depth = _match_depth(self.local_optimizers)
+        return None if depth is None else max(depth - 1, 0)
+
+    def apply(self, fgraph):
+        worklist = KanrenWorklist(self._client_depth())
+        fgraph.attach_feature(worklist)
+
+        max_steps = self.max_steps
+        if max_steps is None:
+            max_steps = 10 * len(worklist)
+
+        self.stats = OrderedDict((lopt, {'nodes': 0, 'replacements': 0,
+                                         'time': 0.0})
+                                 for lopt in self.local_optimizers)
+        steps = 0
+        try:
+            while worklist:
+                node = worklist.pop()
+                if node not in fgraph.apply_nodes:
+                    continue
+
+                for lopt in self.local_optimizers:
+                    if steps >= max_steps:
+                        logger.warning(
+                            'KanrenEquilibriumOptimizer stopped after '
+                            f'{steps} steps; the graph might not be '
+                            'optimized')
+                        return
+
+                    steps += 1
+                    lopt_stats = self.stats[lopt]
+                    lopt_stats['nodes'] += 1
+
+                    start_time = time.perf_counter()
+                    if isinstance(lopt, KanrenRelationSub):
+                        # The worklist already determines which results can
+                        # have changed.
+                        new_node = lopt.transform(node, cache_results=False)
+                    else:
+                        new_node = lopt.transform(node)
+                    lopt_stats['time'] += time.perf_counter() - start_time
+
+                    if not new_node:
+                        continue
+
+                    if isinstance(new_node, dict):
+                        pairs = new_node.items()
+                    else:
+                        pairs = zip(node.outputs, new_node)
+
+                    pairs = [(r, new_r) for r, new_r in pairs
+                             if r is not new_r]
+                    if not pairs:
+                        continue
+
+                    worklist_size = len(worklist)
+                    try:
+                        fgraph.replace_all(pairs, reason=lopt)
+                    except InconsistencyError:
+                        # The replacements were reverted; don't revisit the
+                        # nodes they touched.
+                        worklist.revert(worklist_size)
+                        continue
+
+                    lopt_stats['replacements'] += 1
+                    break
+        finally:
+            fgraph.remove_feature(worklist)
+
+
+_parallel_state = None
+"""The graph and optimizers used by a `KanrenParallelOptimizer`'s matching
+worker.
+
+It's set by the (forked) worker processes' initializer, so the graph is never
+pickled.  Instead, the workers update their copies of the graph by replaying
+the replacements committed by the parent process, so that only node positions
+and encoded terms need to be sent between processes.
+"""
+
+
+def _graph_positions(fgraph):
+    """Return a graph's nodes and variables in a fixed topological order, and
+    a map from the variables to their positions.
+    """
+    nodes = fgraph.toposort()
+    var_ids = OrderedDict((v, None) for v in fgraph.inputs)
+    for n in nodes:
+        var_ids.update((v, None) for v in n.inputs)
+        var_ids.update((v, None) for v in n.outputs)
+    variables = list(var_ids)
+    var_ids = {v: i for i, v in enumerate(variables)}
+    return nodes, variables, var_ids
 
-            return new_node
+
+def _encode_graph(outputs, var_ids):
+    """Encode the terms in `outputs` that aren't in `var_ids`.
+
+    Existing variables are encoded by their positions in `var_ids`, new
+    `Apply` nodes by their `Op`s and encoded inputs, and new orphan variables
+    are kept as-is.
+    """
+    refs = {}
+    nodes = []
+    stack = list(outputs)
+    while stack:
+        v = stack[-1]
+        if v in refs:
+            stack.pop()
+            continue
+
+        var_id = var_ids.get(v)
+        if var_id is not None:
+            refs[v] = ('var', var_id)
+        elif v.owner is None:
+            refs[v] = ('new', v)
         else:
+            missing = [i for i in v.owner.inputs if i not in refs]
+            if missing:
+                stack.extend(missing)
+                continue
+
+            node = v.owner
+            nodes.append((node.op, tuple(refs[i] for i in node.inputs),
+                          tuple(o.name for o in node.outputs)))
+            for k, o in enumerate(node.outputs):
+                refs[o] = ('out', len(nodes) - 1, k)
+
+        stack.pop()
+
+    return tuple(nodes), tuple(refs[o] for o in outputs)
+
+
+def _decode_graph(encoded, get_var):
+    """Rebuild the terms encoded by `_encode_graph`."""
+    nodes, out_refs = encoded
+    new_outputs = []
+
+    def _get(ref):
+        if ref[0] == 'var':
+            return get_var(ref[1])
+        elif ref[0] == 'new':
+            return ref[1]
+        return new_outputs[ref[1]][ref[2]]
+
+    for op, in_refs, names in nodes:
+        node = op.make_node(*[_get(r) for r in in_refs])
+        for o, name in zip(node.outputs, names):
+            o.name = name
+        new_outputs.append(node.outputs)
+
+    return [_get(r) for r in out_refs]
+
+
+def _commit_encoded(fgraph, variables, replaced, replaced_ids, encoded,
+                    reason):
+    """Replace the variables at `replaced_ids` with the terms encoded by
+    `_encode_graph`.
+
+    `replaced` maps the variables replaced by earlier commits in the same round
+    to their replacements, since the encoded terms may refer to them; it's
+    updated with the new replacements.
+    """
+    new_vars = _decode_graph(
+        encoded, lambda i: replaced.get(variables[i], variables[i]))
+    pairs = [(variables[i], new_v)
+             for i, new_v in zip(replaced_ids, new_vars)
+             if variables[i] is not new_v]
+
+    fgraph.replace_all(pairs, reason=reason)
+    replaced.update(pairs)
+
+
+def _match_nodes(nodes, var_ids, local_optimizers, node_ids):
+    """Apply the optimizers to the given nodes and return their encoded
+    replacements.
+    """
+    matches = []
+    for node_id in node_ids:
+        node = nodes[node_id]
+        for lopt_id, lopt in enumerate(local_optimizers):
+            if isinstance(lopt, KanrenRelationSub):
+                res = lopt.transform(node, cache_results=False)
+            else:
+                res = lopt.transform(node)
+
+            if not res:
+                continue
+
+            if isinstance(res, dict):
+                replaced = tuple(var_ids[r] for r in res.keys())
+                res = list(res.values())
+            else:
+                replaced = tuple(var_ids[o] for o in node.outputs)
+
+            matches.append((node_id, lopt_id, replaced,
+                            _encode_graph(res, var_ids)))
+            break
+
+    return matches
+
+
+def _search_budgets(local_optimizers):
+    """Return the distinct `SearchBudget`s used by the optimizers."""
+    budgets = []
+    for lopt in local_optimizers:
+        budget = getattr(lopt, 'search_budget', None)
+        if budget is not None and all(b is not budget for b in budgets):
+            budgets.append(budget)
+    return budgets
+
+
+def _init_match_worker(fgraph, local_optimizers, n_rounds):
+    global _parallel_state
+    # The parent's worklist isn't needed (and would only grow) in the workers.
+    for feature in list(fgraph._features):
+        if isinstance(feature, KanrenWorklist):
+            fgraph.remove_feature(feature)
+    _parallel_state = (fgraph, local_optimizers, n_rounds,
+                       _graph_positions(fgraph))
+
+
+def _match_chunk(args):
+    """Bring a worker's copy of the graph up to date and match nodes in it.
+
+    The pickled commits of the rounds starting at `first_round` are sent, so
+    that the workers only replay the rounds they're missing.  The worker's
+    process ID is returned with the matches--so that the parent process knows
+    which rounds the worker has--along with the searches' budget totals and
+    counters, so that they can be added to the parent process's budgets.
+    """
+    global _parallel_state
+    n_rounds, first_round, pickled_rounds, node_ids = args
+    fgraph, local_optimizers, worker_rounds, positions = _parallel_state
+
+    if worker_rounds < n_rounds:
+        assert worker_rounds >= first_round
+        for pickled_commits in pickled_rounds[worker_rounds - first_round:]:
+            round_commits = pickle.loads(pickled_commits)
+            replaced = {}
+            for lopt_id, replaced_ids, encoded in round_commits:
+                _commit_encoded(fgraph, positions[1], replaced, replaced_ids,
+                                encoded, local_optimizers[lopt_id])
+            positions = _graph_positions(fgraph)
+        _parallel_state = (fgraph, local_optimizers, n_rounds, positions)
+
+    budgets = _search_budgets(local_optimizers)
+    for budget in budgets:
+        budget.reset()
+
+    nodes, _, var_ids = positions
+    return (os.getpid(),
+            _match_nodes(nodes, var_ids, local_optimizers, node_ids),
+            budgets)
+
+
+class KanrenParallelOptimizer(Optimizer):
+    """An equilibrium optimizer that matches nodes in parallel.
+
+    Each round, the local optimizers (e.g. `KanrenRelationSub`s) are applied
+    to every node that could match--i.e. the candidates of their
+    `RelationIndex`s that are new or depend on changed terms--in a pool of
+    forked processes.  The pool is started by the first round with at least
+    `min_parallel_nodes` candidates and reused by the later ones; the workers
+    keep their own copies of the graph up to date, so only node positions and
+    the encoded replacement terms are sent between them.  Rounds with fewer
+    candidates are matched in the current process, since starting and
+    messaging the workers costs more than matching a few nodes.
+
+    The matches are then committed in topological order, skipping the ones
+    that overlap the terms matched by an earlier commit; those are retried in
+    the next round.  Commits that fail validation (see `ReplaceValidate`) are
+    reverted and dropped.  The result doesn't depend on the number of processes;
+    for that reason, the optimizers' `SearchBudget`s can't limit the total
+    steps or time when more than one process is used.  Their totals and
+    counters include the workers' searches.
+
+    The statistics for the last optimization are kept in `stats`.
+    """
+
+    def __init__(self, local_optimizers, n_jobs=None, max_rounds=None,
+                 min_parallel_nodes=32):
+        """
+        Parameters
+        ==========
+        local_optimizers: list of LocalOptimizer
+            The optimizers to apply to each node, in order.  Only the first
+            replacement for a node is used.
+        n_jobs: int (optional)
+            The number of worker processes.  Defaults to the number of CPUs;
+            with `1`, nodes are matched in the current process.
+        max_rounds: int (optional)
+            The maximum number of match-and-commit rounds.
+        min_parallel_nodes: int (optional)
+            The minimum number of candidate nodes for which a round is matched
+            by the worker processes.  Lower it for optimizers that take long
+            to match each node (e.g. relations with many branches).
+        """
+        super().__init__()
+        self.local_optimizers = list(local_optimizers)
+        self.n_jobs = n_jobs
+        self.max_rounds = max_rounds
+        self.min_parallel_nodes = min_parallel_nodes
+        self.stats = OrderedDict()
+        self._pool = None
+        self._pool_rounds = 0
+        self._worker_rounds = {}
+        self._pickled_rounds = []
+
+    def add_requirements(self, fgraph):
+        fgraph.attach_feature(ReplaceValidate())
+
+    def _is_candidate(self, node):
+        for lopt in self.local_optimizers:
+            relation_index = getattr(lopt, 'relation_index', None)
+            if relation_index is None or relation_index.candidates(node):
+                return True
+        return False
+
+    @property
+    def _n_workers(self):
+        return self.n_jobs or os.cpu_count() or 1
+
+    def _start_pool(self, fgraph, n_rounds):
+        try:
+            mp_context = multiprocessing.get_context('fork')
+        except ValueError:
+            logger.warning('KanrenParallelOptimizer requires forked '
+                           'processes; matching nodes serially')
             return False
+
+        return mp_context.Pool(self._n_workers,
+                               initializer=_init_match_worker,
+                               initargs=(fgraph, self.local_optimizers,
+                                         n_rounds))
+
+    def _match(self, fgraph, commits, positions, node_ids):
+        nodes, _, var_ids = positions
+        parallel = (self._n_workers > 1 and
+                    len(node_ids) >= self.min_parallel_nodes)
+
+        if parallel and self._pool is None:
+            # The workers' graphs start at the current round.
+            self._pool = self._start_pool(fgraph, len(commits))
+            self._pool_rounds = len(commits)
+            self._worker_rounds = {}
+            self._pickled_rounds = [None] * len(commits)
+
+        if not (parallel and self._pool):
+            return _match_nodes(nodes, var_ids, self.local_optimizers,
+                                node_ids)
+
+        # Each round's commits are only pickled once.
+        for round_commits in commits[len(self._pickled_rounds):]:
+            self._pickled_rounds.append(pickle.dumps(round_commits))
+
+        # Only send the rounds missed by the least up-to-date worker; the
+        # workers that haven't matched anything yet start at the pool's first
+        # round.
+        first_round = min(
+            list(self._worker_rounds.values()) +
+            ([self._pool_rounds]
+             if len(self._worker_rounds) < self._n_workers else []))
+        pickled_rounds = self._pickled_rounds[first_round:]
+
+        # Interleave the nodes, so that the chunks cost about the same.
+        n_chunks = min(len(node_ids), 4 * self._n_workers)
+        chunks = [(len(commits), first_round, pickled_rounds,
+                   node_ids[i::n_chunks])
+                  for i in range(n_chunks)]
+
+        matches = []
+        budgets = _search_budgets(self.local_optimizers)
+        for pid, chunk_matches, chunk_budgets in self._pool.map(_match_chunk,
+                                                                chunks):
+            self._worker_rounds[pid] = len(commits)
+            matches.extend(chunk_matches)
+            for budget, chunk_budget in zip(budgets, chunk_budgets):
+                budget.update(chunk_budget)
+
+        return matches
+
+    def _footprint(self, node, depth):
+        """Return the nodes in the terms that could have been matched at
+        `node`.
+        """
+        footprint = set()
+        level_nodes = [node]
+        level = 0
+        while level_nodes and (depth is None or level < depth):
+            next_nodes = []
+            for n in level_nodes:
+                if n in footprint:
+                    continue
+                footprint.add(n)
+                next_nodes.extend(i.owner for i in n.inputs if i.owner)
+            level_nodes = next_nodes
+            level += 1
+        return footprint
+
+    def apply(self, fgraph):
+        if self._n_workers > 1 and any(
+                b.max_total_steps is not None or b.max_total_time is not None
+                for b in _search_budgets(self.local_optimizers)):
+            raise ValueError('The total steps and time of a SearchBudget '
+                             'can only be limited with n_jobs=1')
+
+        depth = _match_depth(self.local_optimizers)
+        worklist = KanrenWorklist(None if depth is None else
+                                  max(depth - 1, 0))
+
+        self.stats = OrderedDict([('rounds', 0), ('nodes', 0),
+                                  ('matches', 0), ('replacements', 0)])
+
+        # The workers replay the commits of each round (i.e. the optimizer and
+        # encoded terms for the replaced variables) to update their graphs.
+        commits = []
+        fgraph.attach_feature(worklist)
+        try:
+            while worklist and (self.max_rounds is None or
+                                self.stats['rounds'] < self.max_rounds):
+                visit = set(worklist.nodes)
+                worklist.nodes.clear()
+
+                positions = _graph_positions(fgraph)
+                nodes, variables, _ = positions
+
+                node_ids = [i for i, n in enumerate(nodes)
+                            if n in visit and self._is_candidate(n)]
+                if not node_ids:
+                    break
+
+                self.stats['rounds'] += 1
+                self.stats['nodes'] += len(node_ids)
+
+                matches = self._match(fgraph, commits, positions, node_ids)
+                self.stats['matches'] += len(matches)
+
+                # Commit the non-overlapping matches in a fixed order.
+                matched = set()
+                replaced = {}
+                round_commits = []
+                for node_id, lopt_id, replaced_ids, encoded in sorted(
+                        matches, key=lambda m: m[0]):
+                    node = nodes[node_id]
+                    if node not in fgraph.apply_nodes:
+                        continue
+
+                    footprint = self._footprint(node, depth)
+                    if footprint & matched:
+                        worklist.nodes[node] = None
+                        continue
+                    matched |= footprint
+
+                    worklist_size = len(worklist)
+                    try:
+                        _commit_encoded(fgraph, variables, replaced,
+                                        replaced_ids, encoded,
+                                        self.local_optimizers[lopt_id])
+                    except InconsistencyError:
+                        worklist.revert(worklist_size)
+                        continue
+
+                    round_commits.append((lopt_id, replaced_ids, encoded))
+                    self.stats['replacements'] += 1
+
+                commits.append(tuple(round_commits))
+        finally:
+            fgraph.remove_feature(worklist)
+            if self._pool:
+                self._pool.terminate()
+            self._pool = None
+            self._worker_rounds = {}
+            self._pickled_rounds = []
+
+
+class GraphRewrite(object):
+    """A graph produced by rewriting another one (see `graph_rewrites`).
+
+    Its outputs share all the terms that weren't changed by the rewrites with
+    the original graph, so creating one doesn't copy the entire graph.  Use
+    `GraphRewrite.fgraph` to get a (new) `FunctionGraph` for it.
+    """
+
+    def __init__(self, outputs, rewrites=(), positions=None):
+        """
+        Parameters
+        ==========
+        outputs: list of Variable
+            The outputs of the graph.
+        rewrites: tuple (optional)
+            The rewritten nodes and their replacements, in the order they were
+            applied.
+        positions: Mapping (optional)
+            The topological positions of the nodes that can be rewritten.
+        """
+        self.outputs = outputs
+        self.rewrites = rewrites
+        self.positions = positions if positions is not None else {}
+
+    def rewrite(self, node, replacement):
+        """Create a new graph in which a node's outputs are replaced.
+
+        Only the terms that depend on the replaced outputs are recreated.  They
+        take the positions of the terms they replace.
+
+        Parameters
+        ==========
+        node: Apply
+            The rewritten node.
+        replacement: list or dict
+            The node's new outputs or a map from the graph's variables to their
+            replacements (i.e. the results of `KanrenRelationSub.transform`).
+        """
+        if isinstance(replacement, dict):
+            pairs = replacement.items()
+        else:
+            pairs = zip(node.outputs, replacement)
+
+        memo = {}
+        for r, new_r in pairs:
+            if r is new_r:
+                continue
+            if r.type != new_r.type:
+                new_r_conv = r.type.convert_variable(new_r)
+                if new_r_conv is None or new_r_conv.type != r.type:
+                    raise TypeError(
+                        'The type of the replacement must be the same as the '
+                        f'type of the original variable: {r}, {new_r}')
+                new_r = new_r_conv
+            memo[r] = new_r
+
+        new_positions = {}
+        for n in io_toposort(tt_inputs(self.outputs), self.outputs):
+            new_inputs = [memo.get(i, i) for i in n.inputs]
+            if all(a is b for a, b in zip(new_inputs, n.inputs)):
+                continue
+            new_n = n.clone_with_new_inputs(new_inputs, strict=False)
+            memo.update(zip(n.outputs, new_n.outputs))
+            pos = self.positions.get(n)
+            if pos is not None:
+                new_positions[new_n] = pos
+
+        return GraphRewrite([memo.get(o, o) for o in self.outputs],
+                            self.rewrites + ((node, replacement),),
+                            ChainMap(new_positions, self.positions))
+
+    def fgraph(self):
+        """Create a `FunctionGraph` with a copy of the graph."""
+        inputs = [i for i in tt_inputs(self.outputs)
+                  if not isinstance(i, tt.Constant)]
+        return FunctionGraph(inputs, self.outputs, clone=True)
+
+
+def graph_rewrites(fgraph, optimizer, lookahead=1):
+    """Lazily generate the graphs produced by every result of an optimizer.
+
+    Each node is rewritten with every replacement produced by
+    `optimizer.transforms` (e.g. all of a `KanrenRelationSub`'s miniKanren
+    results).  The rewritten graphs are rewritten again--up to `lookahead`
+    times--at the nodes that follow the last rewritten node, so that every
+    combination of rewrites is produced only once.
+
+    The graphs are generated depth-first and only share unchanged terms with
+    the original graph, so even large numbers of rewrites can be explored
+    without keeping all of them in memory.
+
+    Parameters
+    ==========
+    fgraph: FunctionGraph
+        The graph to rewrite.  It isn't changed.
+    optimizer: KanrenRelationSub
+        An optimizer with a `transforms` method.
+    lookahead: int (optional)
+        The maximum number of rewrites applied to a single graph.
+
+    Results
+    =======
+    out: Generator of GraphRewrite
+    """
+    root = GraphRewrite(list(fgraph.outputs),
+                        positions={n: i
+                                   for i, n in enumerate(fgraph.toposort())})
+
+    def _rewrites(graph, depth, last_pos):
+        for node in io_toposort(tt_inputs(graph.outputs), graph.outputs):
+            pos = graph.positions.get(node)
+            if pos is None or pos <= last_pos:
+                continue
+
+            for replacement in optimizer.transforms(node):
+                new_graph = graph.rewrite(node, replacement)
+                yield new_graph
+
+                if depth < lookahead:
+                    yield from _rewrites(new_graph, depth + 1, pos)
+
+    yield from _rewrites(root, 1, -1)
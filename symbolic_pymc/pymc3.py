@@ -224,46 +224,177 @@ def pymc3_var_to_rv(pm_var, rand_state=None):
 
 def rec_conv_to_rv(v, replacements, model, rand_state=None):
     """Recursively convert a PyMC3 random variable to a Theano graph.
+
+    The PyMC3 variables are traversed with an explicit stack, so models with
+    long chains of dependent variables don't reach Python's recursion limit.
     """
+    # Each entry is a variable and, once its dependencies have been
+    # scheduled, the "continuation" that finishes its conversion.
+    stack = [(v, None)]
+    while stack:
+        u, finish = stack.pop()
+        if finish is not None:
+            finish()
+            continue
+
+        if u in replacements:
+            continue
+        elif u.name and pm.util.is_transformed_name(u.name):
+            untrans_name = pm.util.get_untransformed_name(u.name)
+            u_untrans = getattr(model, untrans_name)
+
+            def finish(u=u, u_untrans=u_untrans):
+                replacements[u] = walk(u_untrans, replacements)
+
+            stack.append((u, finish))
+            stack.append((u_untrans, None))
+        elif hasattr(u, 'distribution'):
+            rv = pymc3_var_to_rv(u, rand_state=rand_state)
+            rv_inputs = tt_inputs([rv])
+
+            def finish(u=u, rv=rv, rv_inputs=rv_inputs):
+                rv_ins = []
+                for i in rv_inputs:
+                    i_rv = walk(i, replacements)
+
+                    if i_rv is not i:
+                        replacements[i] = i_rv
+
+                    rv_ins.append(i_rv)
+
+                _ = replace_input_nodes(rv_ins, [rv],
+                                        memo=replacements,
+                                        clone_inputs=False)
+
+                replacements[u] = walk(rv, replacements)
+
+            stack.append((u, finish))
+            stack.extend((i, None) for i in reversed(rv_inputs))
+
     if v in replacements:
         return walk(v, replacements)
-    elif v.name and pm.util.is_transformed_name(v.name):
-        untrans_name = pm.util.get_untransformed_name(v.name)
-        v_untrans = getattr(model, untrans_name)
-
-        rv_new = rec_conv_to_rv(v_untrans, replacements,
-                                model, rand_state=rand_state)
-        replacements[v] = rv_new
-        return rv_new
-    elif hasattr(v, 'distribution'):
-        rv = pymc3_var_to_rv(v, rand_state=rand_state)
-
-        rv_ins = []
-        for i in tt_inputs([rv]):
-            i_rv = rec_conv_to_rv(
-                i, replacements, model, rand_state=rand_state)
-
-            if i_rv is not None:
-                replacements[i] = i_rv
-                rv_ins.append(i_rv)
-            else:
-                rv_ins.append(i)
-
-        _ = replace_input_nodes(rv_ins, [rv],
-                                memo=replacements,
-                                clone_inputs=False)
+    else:
+        return None
 
-        rv_new = walk(rv, replacements)
 
-        replacements[v] = rv_new
+def pymc3_var_signature(pm_var, model):
+    """Get the objects that determine the conversion of a PyMC3 variable.
 
-        return rv_new
+    These are the variable's distribution and its Theano (or NumPy array)
+    parameters, the observations for observed variables, or the
+    untransformed variable for transformed ones.  Returns `None` for
+    variables that aren't converted by `rec_conv_to_rv`.
+    """
+    name = getattr(pm_var, 'name', None)
+    if name and pm.util.is_transformed_name(name):
+        untrans_name = pm.util.get_untransformed_name(name)
+        return (('untransformed', getattr(model, untrans_name)),)
+    elif hasattr(pm_var, 'distribution'):
+        dist = pm_var.distribution
+        sig = [('distribution', dist)]
+        sig += [(k, v) for k, v in sorted(vars(dist).items())
+                if isinstance(v, (tt.Variable, np.ndarray))]
+        if isinstance(pm_var, pm.model.ObservedRV):
+            sig.append(('observations', pm_var.observations))
+        return tuple(sig)
     else:
         return None
 
 
+def _signatures_equal(sig_a, sig_b):
+    if sig_a is None or sig_b is None or len(sig_a) != len(sig_b):
+        return False
+    for (k_a, v_a), (k_b, v_b) in zip(sig_a, sig_b):
+        if k_a != k_b:
+            return False
+        if isinstance(v_a, np.ndarray) and isinstance(v_b, np.ndarray):
+            if not np.array_equal(v_a, v_b):
+                return False
+        elif v_a is not v_b:
+            return False
+    return True
+
+
+class ConversionCache(object):
+    """A cache of PyMC3 variable to `RandomVariable` conversions that can be
+    reused between `model_graph` calls.
+
+    Entries are keyed on the PyMC3 variables and validated against their
+    signatures (see `pymc3_var_signature`) and the entries they depend on,
+    so that only new or changed variables are converted again.
+
+    The converted variables are never owned by a `FunctionGraph`; the graphs
+    returned by `model_graph` contain clones of them.
+    """
+
+    def __init__(self, rand_state=None):
+        self.rand_state = rand_state
+        self.conversions = {}
+        self.signatures = {}
+        self.dependencies = {}
+
+    def __len__(self):
+        return len(self.conversions)
+
+    def __contains__(self, pm_var):
+        return pm_var in self.conversions
+
+    def clear(self):
+        self.conversions.clear()
+        self.signatures.clear()
+        self.dependencies.clear()
+
+    def _is_valid(self, pm_var, model, valid):
+        if pm_var in valid:
+            return valid[pm_var]
+
+        # Guard against cyclic dependencies while we check this entry.
+        valid[pm_var] = False
+        res = (pm_var in self.conversions and
+               _signatures_equal(self.signatures[pm_var],
+                                 pymc3_var_signature(pm_var, model)) and
+               all(self._is_valid(d, model, valid)
+                   for d in self.dependencies[pm_var]))
+        valid[pm_var] = res
+        return res
+
+    def prune(self, model):
+        """Remove the stale entries and return the valid conversions as a new
+        `dict`.
+        """
+        valid = {}
+        for pm_var in list(self.conversions):
+            if not self._is_valid(pm_var, model, valid):
+                del self.conversions[pm_var]
+                del self.signatures[pm_var]
+                del self.dependencies[pm_var]
+        return dict(self.conversions)
+
+    def update(self, replacements, model):
+        """Add the converted PyMC3 variables in a `rec_conv_to_rv`
+        replacements map.
+        """
+        for pm_var, new_var in replacements.items():
+            if pm_var in self.conversions:
+                continue
+
+            sig = pymc3_var_signature(pm_var, model)
+
+            if sig is None:
+                continue
+
+            sig_vars = [v for _, v in sig if isinstance(v, tt.Variable)]
+            deps = [i for i in set(sig_vars + tt_inputs(sig_vars))
+                    if i is not pm_var and
+                    pymc3_var_signature(i, model) is not None]
+
+            self.conversions[pm_var] = walk(new_var, replacements)
+            self.signatures[pm_var] = sig
+            self.dependencies[pm_var] = deps
+
+
 def model_graph(pymc_model, output_vars=None, rand_state=None,
-                attach_memo=True):
+                attach_memo=True, conversion_cache=None):
     """Convert a PyMC3 model into a Theano `FunctionGraph`.
 
     Parameters
@@ -278,25 +409,43 @@ def model_graph(pymc_model, output_vars=None, rand_state=None,
     attach_memo: boolean (optional)
         Add a property to the returned `FunctionGraph` name `memo` that
         contains the mappings between PyMC and `RandomVariable` terms.
+    conversion_cache: `ConversionCache` (optional)
+        Reuse--and add to--the conversions in this cache.  Its random state
+        is used when `rand_state` isn't given; otherwise, when the two differ,
+        the cache is cleared.
 
     Results
     =======
     out: `FunctionGraph`
     """
     model = pm.modelcontext(pymc_model)
-    replacements = {}
 
     if output_vars is None:
         output_vars = list(model.observed_RVs)
+
+    if conversion_cache is not None:
+        if rand_state is None:
+            rand_state = conversion_cache.rand_state
+        elif rand_state is not conversion_cache.rand_state:
+            conversion_cache.clear()
+
     if rand_state is None:
         rand_state = theano.shared(np.random.RandomState())
 
-    replacements = {}
+    if conversion_cache is not None:
+        conversion_cache.rand_state = rand_state
+        replacements = conversion_cache.prune(model)
+    else:
+        replacements = {}
+
     # First pass...
     for i, o in enumerate(output_vars):
         _ = rec_conv_to_rv(o, replacements, model, rand_state=rand_state)
         output_vars[i] = walk(o, replacements)
 
+    if conversion_cache is not None:
+        conversion_cache.update(replacements, model)
+
     output_vars = [walk(o, replacements) for o in output_vars]
 
     fg_features = [tt.opt.ShapeFeature()]
@@ -4,11 +4,184 @@ import theano.tensor as tt
 
 from collections.abc import Iterable, ByteString
 from warnings import warn
-from copy import copy
+from copy import copy, deepcopy
 
+from theano.compile.sharedvalue import SharedVariable, shared_constructor
 from theano.tensor.raw_random import RandomStateType
 
 
+_Generator = getattr(np.random, 'Generator', None)
+
+
+def _state_eq(a, b):
+    if isinstance(a, dict):
+        return (isinstance(b, dict) and a.keys() == b.keys() and
+                all(_state_eq(a[k], b[k]) for k in a))
+    elif isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    return a == b
+
+
+def _state_size(state):
+    if isinstance(state, dict):
+        return sum(_state_size(v) for v in state.values())
+    elif isinstance(state, np.ndarray):
+        return state.nbytes
+    elif isinstance(state, str):
+        return len(state)
+    return np.dtype('int').itemsize
+
+
+class RandomGeneratorType(theano.gof.Type):
+    """A Type wrapper for `numpy.random.Generator`.
+
+    This is the `numpy.random.Generator` analog of `RandomStateType`.  The
+    underlying bit generators (e.g. `PCG64` and `Philox`) have small states
+    that can be jumped or spawned into independent streams (see
+    `spawn_generators` and `jump_generators`).
+    """
+
+    def __str__(self):
+        return 'RandomGeneratorType'
+
+    def __eq__(self, other):
+        return type(self) == type(other)
+
+    def __hash__(self):
+        return hash(type(self))
+
+    def filter(self, data, strict=False, allow_downcast=None):
+        if self.is_valid_value(data):
+            return data
+        else:
+            raise TypeError()
+
+    def is_valid_value(self, a):
+        return _Generator is not None and isinstance(a, _Generator)
+
+    def values_eq(self, a, b):
+        return _state_eq(a.bit_generator.state, b.bit_generator.state)
+
+    def get_shape_info(self, obj):
+        return obj.bit_generator.state
+
+    def get_size(self, shape_info):
+        return _state_size(shape_info)
+
+    @staticmethod
+    def may_share_memory(a, b):
+        return a is b
+
+
+theano.compile.register_view_op_c_code(
+    RandomGeneratorType,
+    """
+    Py_XDECREF(%(oname)s);
+    %(oname)s = %(iname)s;
+    Py_XINCREF(%(oname)s);
+    """,
+    1)
+
+random_generator_type = RandomGeneratorType()
+
+
+class RandomGeneratorSharedVariable(SharedVariable):
+    pass
+
+
+@shared_constructor
+def random_generator_constructor(value, name=None, strict=False,
+                                 allow_downcast=None, borrow=False):
+    """SharedVariable constructor for `numpy.random.Generator`."""
+    if _Generator is None or not isinstance(value, _Generator):
+        raise TypeError
+    if not borrow:
+        value = deepcopy(value)
+    return RandomGeneratorSharedVariable(
+        type=random_generator_type,
+        value=value,
+        name=name,
+        strict=strict,
+        allow_downcast=allow_downcast)
+
+
+def spawn_generators(seed, n_streams, bit_generator=None):
+    """Create independent `numpy.random.Generator`s from a seed.
+
+    The streams are derived from `numpy.random.SeedSequence.spawn`, so the
+    same seed always produces the same, non-overlapping streams (e.g. one per
+    worker process).
+
+    Parameters
+    ==========
+    seed: int or numpy.random.SeedSequence
+        The root seed.
+    n_streams: int
+        The number of streams.
+    bit_generator: type (optional)
+        The bit generator class.  Defaults to `numpy.random.PCG64`.
+    """
+    if _Generator is None:
+        raise NotImplementedError(
+            'numpy.random.Generator requires NumPy >= 1.17')
+
+    if bit_generator is None:
+        bit_generator = np.random.PCG64
+
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    return [_Generator(bit_generator(s)) for s in seed.spawn(n_streams)]
+
+
+def jump_generators(rng, n_streams):
+    """Create independent `numpy.random.Generator`s by jumping the bit
+    generator of an existing one.
+
+    The i-th stream is `rng`'s bit generator advanced by `i + 1` jumps, which
+    requires a bit generator that supports `jumped` (e.g. `PCG64` and
+    `Philox`).
+    """
+    if _Generator is None:
+        raise NotImplementedError(
+            'numpy.random.Generator requires NumPy >= 1.17')
+
+    bit_gen = rng.bit_generator
+    return [_Generator(bit_gen.jumped(i + 1)) for i in range(n_streams)]
+
+
+def _static_shape(x):
+    """Return the shape of a variable as a tuple of `int`s, or `None` when
+    it isn't known before evaluation.
+
+    Constants have known shapes, and so do variables with only broadcastable
+    dimensions and allocations with constant dimensions (e.g. `tt.zeros`).
+    """
+    if isinstance(x, tt.Constant):
+        return tuple(int(d) for d in np.shape(x.data))
+    elif all(x.broadcastable):
+        return (1,) * x.ndim
+    elif x.owner and isinstance(x.owner.op, tt.Alloc):
+        try:
+            return tuple(int(tt.get_scalar_constant_value(d))
+                         for d in x.owner.inputs[1:])
+        except tt.NotScalarConstantError:
+            return None
+    return None
+
+
+def _static_bcast_shape(shapes):
+    """Broadcast static shapes like NumPy does."""
+    ndim = max([len(s) for s in shapes] + [0])
+    res = []
+    for dims in zip(*[(1,) * (ndim - len(s)) + tuple(s) for s in shapes]):
+        non_bcast_dims = set(dims) - {1}
+        if len(non_bcast_dims) > 1:
+            raise ValueError(f'Shapes could not be broadcast: {shapes}')
+        res.append(non_bcast_dims.pop() if non_bcast_dims else 1)
+    return tuple(res)
+
+
 def param_supp_shape_fn(ndim_supp, ndims_params, dist_params,
                         rep_param_idx=0, param_shapes=None):
     """A function for deriving a random variable's support shape/dimensions
@@ -55,11 +228,15 @@ def param_supp_shape_fn(ndim_supp, ndims_params, dist_params,
     #     tt.get_scalar_constant_value(test_val.shape[-1]) # works
     #     tt.get_scalar_constant_value(test_val.shape[0]) # doesn't
     #     tt.get_scalar_constant_value(test_val.shape[:-1]) # doesn't
-    if param_shapes is not None:
+    ref_param = dist_params[rep_param_idx]
+    ref_shape = _static_shape(ref_param)
+    if ref_shape is not None and len(ref_shape) >= ndim_supp:
+        # Use the exact, non-symbolic, value when we can.
+        return (ref_shape[-ndim_supp],)
+    elif param_shapes is not None:
         ref_param = param_shapes[rep_param_idx]
         return (ref_param[-ndim_supp],)
     else:
-        ref_param = dist_params[rep_param_idx]
         if ref_param.ndim < ndim_supp:
             raise ValueError(
                 ('Reference parameter does not match the '
@@ -98,7 +275,8 @@ class RandomVariable(tt.gof.Op):
         rng_fn: function or str
             The non-symbolic random variate sampling function.
             Can be the string name of a method provided by
-            `numpy.random.RandomState`.
+            `numpy.random.RandomState` and `numpy.random.Generator`; the
+            method of the rng's type is used.
         supp_shape_fn: callable (optional)
             Function used to determine the exact shape of the distribution's
             support.
@@ -127,8 +305,10 @@ class RandomVariable(tt.gof.Op):
         self.ndims_params = tuple(ndims_params)
 
         if isinstance(rng_fn, (str, ByteString)):
+            self.rng_fn_name = rng_fn
             self.rng_fn = getattr(np.random.RandomState, rng_fn)
         else:
+            self.rng_fn_name = None
             self.rng_fn = rng_fn
 
     def __str__(self):
@@ -142,36 +322,64 @@ class RandomVariable(tt.gof.Op):
 
         size_len = tt.get_vector_length(size)
 
-        dummy_params = tuple(p if n == 0 else tt.ones(tuple(p.shape)[:-n])
-                             for p, n in zip(dist_params, self.ndims_params))
+        # Dimensions are given as `int`s when they're known (e.g. when
+        # parameters and sizes are constants) and as symbolic scalars when
+        # they're not.
+        if isinstance(size, tt.Constant):
+            size = tuple(int(s) for s in size.data)
+
+        param_shapes_static = [_static_shape(p) for p in dist_params]
 
-        _, out_bcasts, bcastd_inputs = tt.add.get_output_info(
-            tt.DimShuffle, *dummy_params)
+        if all(s is not None for s in param_shapes_static):
+            shape_ind = _static_bcast_shape(
+                [s[:len(s) - n]
+                 for s, n in zip(param_shapes_static, self.ndims_params)])
+            ndim_ind = len(shape_ind)
+        else:
+            dummy_params = tuple(p if n == 0 else tt.ones(tuple(p.shape)[:-n])
+                                 for p, n in zip(dist_params,
+                                                 self.ndims_params))
 
-        # _, out_bcasts, bcastd_inputs = tt.add.get_output_info(tt.DimShuffle, *dist_params)
+            _, out_bcasts, bcastd_inputs = tt.add.get_output_info(
+                tt.DimShuffle, *dummy_params)
 
-        bcast_ind, = out_bcasts
-        ndim_ind = len(bcast_ind)
-        shape_ind = bcastd_inputs[0].shape
+            bcast_ind, = out_bcasts
+            ndim_ind = len(bcast_ind)
+            shape_ind = bcastd_inputs[0].shape
 
         if self.ndim_supp == 0:
             shape_supp = tuple()
-
-            # In the scalar case, `size` corresponds to the entire result's
-            # shape. This implies the following:
-            #     shape_ind[-ndim_ind] == size[:ndim_ind]
-            # TODO: How do we add this constraint/check symbolically?
-
-            ndim_reps = max(size_len - ndim_ind, 0)
-            shape_reps = tuple(size)[ndim_ind:]
         else:
             shape_supp = self.supp_shape_fn(self.ndim_supp,
                                             self.ndims_params,
                                             dist_params,
                                             param_shapes=param_shapes)
 
-            ndim_reps = size_len
-            shape_reps = size
+        # `size` corresponds to the entire result's shape, save the support
+        # dimensions. This implies the following:
+        #     shape_ind[-ndim_ind] == size[:ndim_ind]
+        # It's checked here when both are known; otherwise, it's left to the
+        # samplers.
+        if (isinstance(size, tuple) and size_len > 0 and
+                all(s is not None for s in param_shapes_static)):
+            size_ind = size[max(size_len - ndim_ind, 0):]
+            # Only univariate samplers broadcast the parameters' independent
+            # dimensions (see `_draw_batched`).
+            if size_len < ndim_ind or any(
+                    d != s and (d != 1 or self.ndim_supp > 0)
+                    for d, s in zip(shape_ind, size_ind)):
+                raise ValueError(
+                    f'Size {size} is not compatible with the parameters\' '
+                    f'independent shape {tuple(shape_ind)}')
+
+        # The replications are the leading dimensions (e.g. a batch of
+        # samples), just like NumPy.
+        ndim_reps = max(size_len - ndim_ind, 0)
+        shape_reps = tuple(size)[:ndim_reps]
+
+        if isinstance(size, tuple) and size_len >= ndim_ind:
+            # A constant `size` is the exact shape of the result.
+            shape_ind = size[ndim_reps:]
 
         ndim_shape = self.ndim_supp + ndim_ind + ndim_reps
 
@@ -195,12 +403,26 @@ class RandomVariable(tt.gof.Op):
         size: int or Iterable (optional)
             Numpy-like size of the output (i.e. replications).
         """
+        # The result only depends on the types of the parameters (and the
+        # values of constant parameters and sizes) when the parameters don't
+        # have owners, so it can be cached in that case.
+        cache_key = self._bcast_cache_key(dist_params, size)
+        if cache_key is not None:
+            bcast_cache = self.__dict__.setdefault('_bcast_cache', {})
+            bcast = bcast_cache.get(cache_key)
+            if bcast is not None:
+                return list(bcast)
+
         shape = self._infer_shape(size, dist_params)
 
         # Let's try to do a better job than `_infer_ndim_bcast` when
         # dimension sizes are symbolic.
         bcast = []
         for s in shape:
+            if isinstance(s, (int, np.integer)):
+                bcast += [s == 1]
+                continue
+
             try:
                 if isinstance(s.owner.op, tt.Subtensor) and \
                    s.owner.inputs[0].owner is not None:
@@ -221,8 +443,34 @@ class RandomVariable(tt.gof.Op):
                 s_val = False
 
             bcast += [s_val == 1]
+
+        if cache_key is not None:
+            if len(bcast_cache) >= self._bcast_cache_size:
+                bcast_cache.clear()
+            bcast_cache[cache_key] = tuple(bcast)
+
         return bcast
 
+    _bcast_cache_size = 1000
+
+    def _bcast_cache_key(self, dist_params, size):
+        """Create a `compute_bcast` cache key, or `None` when the
+        broadcast pattern could depend on more than the parameters' types.
+        """
+        if not isinstance(size, tt.Constant):
+            return None
+
+        param_key = []
+        for p in dist_params:
+            if isinstance(p, tt.Constant):
+                param_key.append((p.type, np.shape(p.data)))
+            elif p.owner is None:
+                param_key.append((p.type, None))
+            else:
+                return None
+
+        return (tuple(param_key), tuple(np.asarray(size.data).tolist()))
+
     def infer_shape(self, node, input_shapes):
         size = node.inputs[-2]
         dist_params = tuple(node.inputs[:-2])
@@ -244,9 +492,9 @@ class RandomVariable(tt.gof.Op):
             Distribution parameters.
         size: int or Iterable (optional)
             Numpy-like size of the output (i.e. replications).
-        rng: RandomState (optional)
-            Existing Theano `RandomState` object to be used.  Creates a
-            new one, if `None`.
+        rng: RandomState or Generator (optional)
+            Existing Theano `RandomState` or `Generator` object to be used.
+            Creates a new `RandomState`, if `None`.
         name: str (optional)
             Label for the resulting node.
 
@@ -272,8 +520,9 @@ class RandomVariable(tt.gof.Op):
 
         if rng is None:
             rng = theano.shared(np.random.RandomState())
-        elif not isinstance(rng.type, RandomStateType):
-            warn('The type of rng should be an instance of RandomStateType')
+        elif not isinstance(rng.type, (RandomStateType, RandomGeneratorType)):
+            warn('The type of rng should be an instance of RandomStateType '
+                 'or RandomGeneratorType')
 
         bcast = self.compute_bcast(dist_params, size)
 
@@ -296,9 +545,10 @@ class RandomVariable(tt.gof.Op):
         rng = args.pop()
         size = args.pop()
 
-        assert isinstance(rng, np.random.RandomState), (type(rng), rng)
+        is_generator = _Generator is not None and isinstance(rng, _Generator)
 
-        rng_out[0] = rng
+        assert is_generator or isinstance(rng, np.random.RandomState), (
+            type(rng), rng)
 
         # The symbolic output variable corresponding to value produced here.
         out_var = node.outputs[1]
@@ -314,7 +564,15 @@ class RandomVariable(tt.gof.Op):
         if not self.inplace:
             rng = copy(rng)
 
-        smpl_val = self.rng_fn(rng, *(args + [size]))
+        # Like `theano.tensor.raw_random`, the output random state is the one
+        # the samples are drawn from, so it's advanced either way.
+        rng_out[0] = rng
+
+        if self.ndim_supp > 0 and any(np.ndim(a) > n for a, n in
+                                      zip(args, self.ndims_params)):
+            smpl_val = self._draw_batched(rng, is_generator, args, size)
+        else:
+            smpl_val = self._draw(rng, is_generator, args, size)
 
         if (not isinstance(smpl_val, np.ndarray) or
                 str(smpl_val.dtype) != out_var.type.dtype):
@@ -331,6 +589,40 @@ class RandomVariable(tt.gof.Op):
 
         smpl_out[0] = smpl_val
 
+    def _draw(self, rng, is_generator, args, size):
+        if is_generator and self.rng_fn_name is not None:
+            return getattr(rng, self.rng_fn_name)(*(args + [size]))
+        return self.rng_fn(rng, *(args + [size]))
+
+    def _draw_batched(self, rng, is_generator, args, size):
+        """Draw from a multivariate distribution with parameters that have
+        independent (e.g. batch) dimensions.
+
+        NumPy's multivariate samplers only take parameters with the support's
+        dimensions, so there's one draw per independent entry.
+        """
+        shape_ind = _static_bcast_shape(
+            [np.shape(a)[:np.ndim(a) - n]
+             for a, n in zip(args, self.ndims_params)])
+
+        if size is None:
+            size = shape_ind
+
+        ndim_reps = len(size) - len(shape_ind)
+        if ndim_reps < 0 or tuple(size[ndim_reps:]) != shape_ind:
+            raise ValueError(f'Size {size} is not compatible with the '
+                             f'parameters\' independent shape {shape_ind}')
+
+        shape_reps = tuple(size[:ndim_reps]) or None
+        args = [np.broadcast_to(a, shape_ind + np.shape(a)[np.ndim(a) - n:])
+                for a, n in zip(args, self.ndims_params)]
+
+        smpl_vals = [self._draw(rng, is_generator, [a[idx] for a in args],
+                                shape_reps)
+                     for idx in np.ndindex(*shape_ind)]
+        smpl_val = np.stack(smpl_vals, axis=ndim_reps)
+        return smpl_val.reshape(tuple(size) + smpl_val.shape[ndim_reps + 1:])
+
     def grad(self, inputs, outputs):
         return [
             theano.gradient.grad_undefined(
@@ -341,3 +633,58 @@ class RandomVariable(tt.gof.Op):
 
     def R_op(self, inputs, eval_points):
         return [None for i in eval_points]
+
+
+def batched_rv(rv_var, draws, dist_params=None, rng=None):
+    """Create a random variable that draws a batch of samples from the same
+    distribution as another random variable.
+
+    The result has a new leading "sample" dimension of length `draws`, so
+    that all the samples are produced by a single `perform` call (i.e. one
+    vectorized NumPy/SciPy call).
+
+    Parameters
+    ==========
+    rv_var: Variable
+        The output of a `RandomVariable`.
+    draws: int or Variable
+        The number of samples.
+    dist_params: list (optional)
+        Distribution parameters to use instead of `rv_var`'s.  They can have
+        the leading sample dimension, as well (e.g. when they're batched
+        random variables themselves).
+    rng: Variable (optional)
+        The random state to use instead of `rv_var`'s.
+
+    Results
+    =======
+    out: Variable
+        The output of a `RandomVariable` with shape `(draws,) + rv_var.shape`.
+    """
+    node = rv_var.owner
+    op = node.op
+
+    if not isinstance(op, RandomVariable):
+        raise ValueError(f'{rv_var} is not a RandomVariable output')
+
+    orig_params = node.inputs[:-2]
+    size, orig_rng = node.inputs[-2:]
+
+    shape = op._infer_shape(size, orig_params)
+
+    if isinstance(shape, tt.Variable):
+        # A scalar random variable
+        shape_ind = []
+    else:
+        shape_ind = list(shape[:len(shape) - op.ndim_supp])
+
+    if dist_params is None:
+        dist_params = orig_params
+
+    if rng is None:
+        rng = orig_rng
+
+    new_node = op.make_node(*dist_params, size=[draws] + shape_ind, rng=rng,
+                            name=rv_var.name)
+
+    return new_node.outputs[node.outputs.index(rv_var)]
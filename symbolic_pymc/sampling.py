@@ -0,0 +1,212 @@
+import numpy as np
+import theano
+
+import multiprocessing as mp
+
+from theano.compile.sharedvalue import SharedVariable
+from theano.tensor.raw_random import RandomStateType
+
+from . import Observed
+from .rv import RandomVariable, RandomGeneratorType, spawn_generators
+
+
+# The compiled function and rng variables used by the worker processes.  They
+# are inherited by the (forked) workers, so they're never pickled.
+_worker_state = None
+
+
+def predictive_outputs(fgraph):
+    """Get the variables to sample for a `FunctionGraph`'s outputs.
+
+    The outputs of `Observed` nodes (e.g. the outputs of `model_graph`) are
+    replaced by their random variables, since the observed values are
+    constant.
+    """
+    res = []
+    for o in fgraph.outputs:
+        if o.owner and isinstance(o.owner.op, Observed):
+            o = o.owner.inputs[1]
+        res.append(o)
+    return res
+
+
+def graph_rngs(outputs):
+    """Return the shared random states (i.e. `RandomState`s and `Generator`s)
+    that the given outputs depend on.
+    """
+    return [v for v in theano.gof.graph.inputs(outputs)
+            if isinstance(v, SharedVariable) and
+            isinstance(v.type, (RandomStateType, RandomGeneratorType))]
+
+
+def _rng_updates(outputs, rng_vars):
+    """Map the shared random states to the random states output by the
+    `RandomVariable`s that draw from them.
+
+    Without these updates, non-inplace `RandomVariable`s would repeat the same
+    draws every time a compiled function is called.
+    """
+    res = {}
+    for node in theano.gof.graph.io_toposort(rng_vars, outputs):
+        if isinstance(node.op, RandomVariable) and node.inputs[-1] in rng_vars:
+            res[node.inputs[-1]] = node.outputs[0]
+    return res
+
+
+def _chunk_rngs(rng_vars, seed, n_chunks):
+    """Create one independent set of random states for each chunk of draws."""
+    if hasattr(np.random, 'SeedSequence'):
+        seed_seqs = np.random.SeedSequence(seed).spawn(n_chunks)
+    else:
+        seed_seqs = np.random.RandomState(seed).randint(2**31, size=n_chunks)
+
+    res = []
+    for seed_seq in seed_seqs:
+        if hasattr(np.random, 'SeedSequence'):
+            rng_seqs = seed_seq.spawn(len(rng_vars))
+        else:
+            rng_seqs = np.random.RandomState(seed_seq).randint(
+                2**31, size=len(rng_vars))
+
+        chunk_rngs = []
+        for rng_var, rng_seq in zip(rng_vars, rng_seqs):
+            if isinstance(rng_var.type, RandomGeneratorType):
+                rng, = spawn_generators(rng_seq, 1)
+            elif hasattr(np.random, 'SeedSequence'):
+                rng = np.random.RandomState(np.random.MT19937(rng_seq))
+            else:
+                rng = np.random.RandomState(rng_seq)
+            chunk_rngs.append(rng)
+
+        res.append(chunk_rngs)
+
+    return res
+
+
+def _init_worker(fn, rng_vars, input_values):
+    global _worker_state
+    _worker_state = (fn, rng_vars, input_values)
+
+
+def _sample_chunk(args):
+    chunk_idx, n_draws, chunk_rngs = args
+    fn, rng_vars, input_values = _worker_state
+
+    for rng_var, rng in zip(rng_vars, chunk_rngs):
+        rng_var.set_value(rng, borrow=True)
+
+    samples = [fn(*input_values) for _ in range(n_draws)]
+
+    return chunk_idx, [np.stack(s) for s in zip(*samples)]
+
+
+def sample_graph(fgraph, draws, outputs=None, inputs=None, n_jobs=None,
+                 chunks=None, seed=None, **kwargs):
+    """Draw samples from a graph (e.g. a prior or posterior predictive) using
+    a pool of processes.
+
+    The draws are split into chunks that are sampled in parallel.  Each chunk
+    uses its own independent random states for the graph's `RandomVariable`s
+    (see `graph_rngs`), so the results only depend on `seed` and the number
+    of chunks--not the number of processes.
+
+    Parameters
+    ==========
+    fgraph: FunctionGraph
+        The graph to sample (e.g. the result of `model_graph`).
+    draws: int
+        The total number of samples.
+    outputs: list of Variable (optional)
+        The variables to sample.  Defaults to `predictive_outputs(fgraph)`.
+    inputs: dict (optional)
+        Values for the graph's non-shared inputs.
+    n_jobs: int (optional)
+        The number of processes.  Defaults to the number of CPUs.  When it's
+        `1`, or processes can't be forked, the chunks are sampled serially.
+    chunks: int (optional)
+        The number of chunks.  Defaults to `n_jobs`.
+    seed: int (optional)
+        The seed for the chunks' random states.
+    kwargs: dict
+        Keyword arguments passed to `theano.function`.  Any `updates` are
+        added to the ones that advance the graph's random states.
+
+    Results
+    =======
+    out: list of ndarray
+        An array of samples for each output, with the draws along the first
+        dimension.
+    """
+    if draws < 1:
+        raise ValueError('The number of draws must be positive')
+
+    if outputs is None:
+        outputs = predictive_outputs(fgraph)
+
+    inputs = inputs or {}
+    input_vars = list(inputs.keys())
+    input_values = [inputs[i] for i in input_vars]
+
+    rng_vars = graph_rngs(outputs)
+
+    updates = _rng_updates(outputs, rng_vars)
+    updates.update(kwargs.pop('updates', None) or {})
+
+    fn = theano.function(input_vars, outputs, updates=updates, **kwargs)
+
+    if n_jobs is None:
+        n_jobs = mp.cpu_count()
+
+    if chunks is None:
+        chunks = n_jobs
+
+    chunks = max(min(chunks, draws), 1)
+
+    chunk_sizes = [draws // chunks + (1 if i < draws % chunks else 0)
+                   for i in range(chunks)]
+    chunk_starts = np.cumsum([0] + chunk_sizes[:-1])
+
+    if seed is None:
+        seed = np.random.randint(2**31)
+
+    tasks = [(i, n, rngs)
+             for i, (n, rngs) in enumerate(
+                 zip(chunk_sizes, _chunk_rngs(rng_vars, seed, chunks)))]
+
+    results = None
+
+    def _store(chunk_idx, chunk_samples):
+        nonlocal results
+        if results is None:
+            # Preallocate the arrays for all the draws.
+            results = [np.empty((draws,) + s.shape[1:], dtype=s.dtype)
+                       for s in chunk_samples]
+        start = chunk_starts[chunk_idx]
+        for res, s in zip(results, chunk_samples):
+            res[start:start + len(s)] = s
+
+    try:
+        mp_ctx = mp.get_context('fork') if n_jobs > 1 else None
+    except ValueError:
+        mp_ctx = None
+
+    if mp_ctx is not None:
+        with mp_ctx.Pool(n_jobs, initializer=_init_worker,
+                         initargs=(fn, rng_vars, input_values)) as pool:
+            for chunk_idx, chunk_samples in pool.imap_unordered(_sample_chunk,
+                                                                tasks):
+                _store(chunk_idx, chunk_samples)
+    else:
+        global _worker_state
+        orig_rngs = [v.get_value(borrow=True) for v in rng_vars]
+        orig_state = _worker_state
+        try:
+            _init_worker(fn, rng_vars, input_values)
+            for task in tasks:
+                _store(*_sample_chunk(task))
+        finally:
+            _worker_state = orig_state
+            for v, rng in zip(rng_vars, orig_rngs):
+                v.set_value(rng, borrow=True)
+
+    return results
@@ -1,4 +1,5 @@
 import types
+import threading
 from functools import partial, wraps
 
 import theano.tensor as tt
@@ -12,8 +13,17 @@ from kanren.assoccomm import commutative, associative
 
 from unification.more import unify
 from unification.core import reify, _unify, _reify, Var
+from unification.utils import transitive_get as walk
+from unification.variable import _glv
 
-from .meta import MetaSymbol, MetaVariable, MetaOp, mt
+try:
+    from kanren.goals import LCons
+except ImportError:
+    # Older `kanren` versions don't have `LCons`.
+    LCons = None
+
+from .meta import (MetaSymbol, MetaVariable, MetaOp, mt, _meta_postorder,
+                   _check_eq, _from_obj_lazily)
 
 tt_class_abstractions = tuple(c.base for c in MetaSymbol.__subclasses__())
 
@@ -50,9 +60,12 @@ def unify_MetaSymbol(u, v, s):
     if type(u) != type(v):
         return False
     if hasattr(u, '__slots__'):
-        s = unify([getattr(u, slot) for slot in u.__slots__],
-                  [getattr(v, slot) for slot in v.__slots__],
-                  s)
+        # Only access (and, for lazy meta objects, convert) the slots that
+        # are needed.
+        for slot in u.__slots__:
+            s = unify(getattr(u, slot), getattr(v, slot), s)
+            if s is False:
+                return False
     elif u != v:
         return False
     if s:
@@ -78,7 +91,118 @@ _unify.add((tt_class_abstractions, tt_class_abstractions, dict),
                                             MetaSymbol.from_obj(v), s))
 
 
-def _reify_MetaSymbol(o, s):
+class Substitution(dict):
+    """A substitution that unification extends in place.
+
+    `unify` copies a `dict` substitution for every new binding (i.e.
+    `toolz.assoc`), so the cost of unifying terms with many logic variables
+    grows quadratically.  A `Substitution` is copied only once per top-level
+    `unify` call and the new bindings are added to that copy, so the
+    substitutions given to `unify` still aren't changed.  That copy is made
+    before anything is unified, so every top-level call (including one that
+    fails on its first comparison) costs a copy of the entire substitution.
+
+    Chains of bindings between logic variables are shortened as they're
+    walked (i.e. path compression), which doesn't change the terms they're
+    bound to.
+    """
+
+    def walk(self, key):
+        """Get the term bound to a key, following chains of bindings (see
+        `unification.utils.transitive_get`).
+        """
+        if not isinstance(key, Var):
+            # Only logic variables are bound, so other terms (e.g. entire
+            # meta graphs) don't need to be hashed.
+            return key
+
+        path = []
+        while True:
+            try:
+                val = self[key]
+            except (KeyError, TypeError):
+                break
+            path.append(key)
+            key = val
+
+        for k in path[:-1]:
+            dict.__setitem__(self, k, key)
+
+        return key
+
+    def copy(self):
+        return type(self)(self)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict.__repr__(self)})'
+
+
+class _UnifyThreadState(threading.local):
+    # The `Substitution` being extended in place by the current top-level
+    # `unify` call in this thread.
+    substitution = None
+
+
+_unify_thread_state = _UnifyThreadState()
+
+
+def unify_Substitution(u, v, s):
+    state = _unify_thread_state
+
+    if s is not state.substitution:
+        # This is a top-level call, so make the one copy that's extended.
+        prev_s = state.substitution
+        s = state.substitution = s.copy()
+        try:
+            return unify_Substitution(u, v, s)
+        finally:
+            state.substitution = prev_s
+
+    u = s.walk(u)
+    v = s.walk(v)
+    if u == v:
+        return s
+    if isvar(u):
+        s[u] = v
+        return s
+    if isvar(v):
+        s[v] = u
+        return s
+    return _unify(u, v, s)
+
+
+unify.add((object, object, Substitution), unify_Substitution)
+
+# `kanren.goals` registers its own `unify` implementations for `LCons`s.
+if LCons is not None:
+    for _sig in [(LCons, list), (LCons, tuple), (list, LCons),
+                 (tuple, LCons)]:
+        unify.add(_sig + (Substitution,), unify.dispatch(*_sig, dict))
+
+
+def _rands_unchanged(rands, new_rands):
+    """Check whether or not reification changed any rands.
+
+    Unchanged meta objects are returned as-is by `_reify_MetaSymbol`, so they
+    can be compared by identity, instead of (deep) equality.
+    """
+    stack = [(rands, new_rands)]
+    while stack:
+        a, b = stack.pop()
+        if a is b:
+            continue
+        if isinstance(a, MetaSymbol) or isinstance(b, MetaSymbol):
+            return False
+        if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+            if type(a) != type(b) or len(a) != len(b):
+                return False
+            stack.extend(zip(a, b))
+        elif not _check_eq(a, b):
+            return False
+    return True
+
+
+def _reify_meta_rands(o, s):
     if isinstance(o.obj, Var):
         obj = s.get(o.obj, o.obj)
     else:
@@ -87,13 +211,70 @@ def _reify_MetaSymbol(o, s):
     rands = o.rands()
     new_rands = reify(rands, s)
 
-    if rands == new_rands:
+    if _rands_unchanged(rands, new_rands):
         return o
     else:
         newobj = type(o)(*new_rands, obj=obj)
         return newobj
 
 
+class _ReifyThreadState(threading.local):
+    # The substitution and the map from meta object `id`s to their reified
+    # forms (and the meta objects themselves) for the current top-level
+    # reification in this thread.
+    meta = None
+
+
+_reify_thread_state = _ReifyThreadState()
+
+
+def _reify_MetaSymbol(o, s):
+    # Reification doesn't change ground meta objects, unless other objects are
+    # considered logic variables (e.g. via `unification.variables`).
+    check_ground = not _glv
+    if check_ground and o.ground:
+        return o
+
+    thread_state = _reify_thread_state
+    state = thread_state.meta
+    if state is not None and state[0] is s:
+        memo = state[1]
+        res = memo.get(id(o))
+        if res is not None:
+            return res[1]
+    else:
+        memo = {}
+
+    if isinstance(s, Substitution):
+        s_walk = s.walk
+    else:
+        s_walk = partial(walk, d=s)
+
+    def children(x):
+        # The meta objects under `x`, including the ones that logic variables
+        # are mapped to.
+        stack = list(x.rands())
+        while stack:
+            y = stack.pop()
+            if isvar(y) and not isinstance(y, MetaSymbol):
+                y = s_walk(y)
+            if isinstance(y, MetaSymbol):
+                if id(y) not in memo and not (check_ground and y.ground):
+                    yield y
+            elif isinstance(y, (list, tuple)):
+                stack.extend(y)
+
+    thread_state.meta = (s, memo)
+    try:
+        # Reify the sub-objects first (bottom-up), so that the `reify` calls
+        # on rands only go one level deep.
+        for x in _meta_postorder(o, children):
+            memo[id(x)] = (x, _reify_meta_rands(x, s))
+        return memo[id(o)][1]
+    finally:
+        thread_state.meta = state
+
+
 _reify.add((MetaSymbol, dict), _reify_MetaSymbol)
 
 
@@ -176,6 +357,12 @@ class ExpressionTuple(tuple):
 
     This object carries the underlying object, if any, and preserves
     it through limited forms of concatenation/cons-ing.
+
+    Slices (e.g. the `arguments` of an expression) are cached, and
+    concatenating the remaining elements back onto a slice (e.g. `term`) gives
+    the expression tuple it came from, when they're the same (or equal)
+    objects.  Hashes are cached, too, so the (nested) elements should be
+    treated as immutable.
     """
 
     @property
@@ -196,23 +383,77 @@ class ExpressionTuple(tuple):
         raise ValueError('Value of evaluated expression cannot be set!')
 
     def __getitem__(self, key):
-        # if isinstance(key, slice):
-        #     return [self.list[i] for i in xrange(key.start, key.stop, key.step)]
-        # return self.list[key]
-        tuple_res = super().__getitem__(key)
-        if isinstance(key, slice) and isinstance(tuple_res, tuple):
-            tuple_res = type(self)(tuple_res)
+        if not isinstance(key, slice):
+            return super().__getitem__(key)
+
+        bounds = key.indices(len(self))
+        slices = self.__dict__.setdefault('_slices', {})
+        tuple_res = slices.get(bounds)
+        if tuple_res is None:
+            tuple_res = type(self)(super().__getitem__(key))
             tuple_res.orig_expr = self
+            if bounds[2] == 1:
+                tuple_res._orig_bounds = bounds[:2]
+            slices[bounds] = tuple_res
         return tuple_res
 
+    def _orig_expr_for(self, prefix, suffix):
+        """Return the expression tuple this one was sliced from, if adding
+        `prefix` and `suffix` would recreate it.
+        """
+        bounds = self.__dict__.get('_orig_bounds')
+        if bounds is None:
+            return None
+        orig_expr = self.orig_expr
+        start, stop = bounds
+        if len(prefix) != start or len(suffix) != len(orig_expr) - stop:
+            return None
+        if (all(a is orig_expr[i] for i, a in enumerate(prefix)) and
+                all(a is orig_expr[stop + i] for i, a in enumerate(suffix))):
+            return orig_expr
+        # The elements could've been recreated (e.g. converted again), so
+        # fall back to (deep) equality.
+        if (tuple(prefix) == tuple.__getitem__(orig_expr, slice(0, start)) and
+                tuple(suffix) == tuple.__getitem__(orig_expr,
+                                                   slice(stop, None))):
+            return orig_expr
+        return None
+
     def __add__(self, x):
-        res = type(self)(super().__add__(x))
-        if res == getattr(self, 'orig_expr', None):
-            return self.orig_expr
-        return res
+        if isinstance(x, tuple):
+            orig_expr = self._orig_expr_for((), x)
+            if orig_expr is not None:
+                return orig_expr
+        return type(self)(super().__add__(x))
 
     def __radd__(self, x):
-        return type(self)(x) + self
+        if isinstance(x, tuple):
+            orig_expr = self._orig_expr_for(x, ())
+            if orig_expr is not None:
+                return orig_expr
+        return type(self)(tuple(x) + tuple(self))
+
+    def __hash__(self):
+        res = self.__dict__.get('_hash')
+        if res is None:
+            res = super().__hash__()
+            self._hash = res
+        return res
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, ExpressionTuple):
+            self_hash = self.__dict__.get('_hash')
+            other_hash = other.__dict__.get('_hash')
+            if (self_hash is not None and other_hash is not None and
+                    self_hash != other_hash):
+                return False
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        res = self.__eq__(other)
+        return res if res is NotImplemented else not res
 
     def __str__(self):
         return f'e{super().__repr__()}'
@@ -246,47 +487,391 @@ term.add((tt.Op, ExpressionTuple),
          lambda op, args: term(MetaOp.from_obj(op), args))
 
 
+def _term_key(x):
+    """Get the `tuple_expression` memo key for a term.
+
+    Meta objects with the same base object are identical sub-terms, so they
+    share a key.
+    """
+    if isinstance(x, MetaSymbol):
+        x_obj = x.obj
+        if x_obj is not None and not isinstance(x_obj, Var):
+            return id(x_obj)
+    return id(x)
+
+
+def _tuple_expression(x, memo):
+    """Construct the expression tuple for `x` using an explicit stack.
+
+    Shared sub-terms are only converted once, and their expression tuples are
+    shared in the results.
+    """
+    parts = {}
+    stack = [(x, False)]
+    while stack:
+        y, expanded = stack.pop()
+        y_key = _term_key(y)
+
+        if expanded:
+            op, args = parts.pop(y_key)
+            memo[y_key] = (y, etuple(op, *[memo[_term_key(a)][1]
+                                           for a in args],
+                                     eval_obj=y))
+            continue
+
+        if y_key in memo or y_key in parts:
+            continue
+
+        if isinstance(y, tt_class_abstractions):
+            # The sub-terms of meta objects are meta objects, so this only
+            # goes one level deep.
+            memo[y_key] = (y, _tuple_expression(mt(y), memo))
+            continue
+
+        try:
+            # This can throw an `IndexError` if `y` is an empty
+            # `list`/`tuple`.
+            op = operator(y)
+            args = arguments(y)
+        except (IndexError, NotImplementedError):
+            memo[y_key] = (y, y)
+            continue
+
+        assert isinstance(args, (list, tuple))
+
+        parts[y_key] = (op, args)
+        stack.append((y, True))
+        stack.extend((a, False) for a in reversed(args))
+
+    return memo[_term_key(x)][1]
+
+
 @dispatch(object)
-def tuple_expression(x):
+def tuple_expression(x, memo=None):
     """Return a tuple of rand and rators that, when evaluated, would
     construct the object; otherwise, return the object itself.
-    """
-    try:
-        # This can throw an `IndexError` if `x` is an empty
-        # `list`/`tuple`.
-        op = operator(x)
-        args = arguments(x)
-    except (IndexError, NotImplementedError):
-        return x
-
-    assert isinstance(args, (list, tuple))
 
-    res = etuple(op, *tuple(tuple_expression(a) for a in args), eval_obj=x)
-    return res
+    Identical sub-terms (i.e. the same objects, or meta objects for the same
+    base objects) map to the same `ExpressionTuple`, so the results have the
+    same sharing as the graph of `x`--and share their `eval_obj`s, too.
+
+    Parameters
+    ==========
+    x: object
+        The term to convert.
+    memo: dict (optional)
+        The map from sub-terms to their expression tuples used for the
+        conversion.  Pass the same `dict` to multiple calls to reuse the
+        expression tuples between them.
+    """
+    if memo is None:
+        memo = {}
+    return _tuple_expression(x, memo)
 
 
 @dispatch(tt_class_abstractions)
-def tuple_expression(x):
-    return tuple_expression(mt(x))
+def tuple_expression(x, memo=None):
+    if memo is None:
+        memo = {}
+    return _tuple_expression(mt(x), memo)
 
 
 def reify_all_terms(obj, s=None):
-    """Recursively reifies all terms tuples/lists with some awareness
-    for meta objects."""
-    try:
-        if isinstance(obj, MetaSymbol):
-            # Avoid using `operator`/`arguments` and unnecessarily
-            # breaking apart meta objects and the base objects they
-            # hold onto (i.e. their reified forms).
-            res = obj.reify()
-            if not MetaSymbol.is_meta(res):
-                return res
-        op, args = operator(obj), arguments(obj)
-        op = reify_all_terms(op, s)
-        args = reify_all_terms(args, s)
-        return term(op, args)
-    except (IndexError, NotImplementedError):
-        return reify(obj, s or {})
+    """Reify all terms tuples/lists with some awareness for meta objects.
+
+    The terms are traversed with an explicit stack, and shared sub-terms are
+    only reified once.
+    """
+    s = s or {}
+    memo = {}
+    parts = {}
+    stack = [(obj, False)]
+    while stack:
+        x, expanded = stack.pop()
+        if expanded:
+            op, args = parts.pop(id(x))
+            op = memo[id(op)][1]
+            args = tuple(memo[id(a)][1] for a in args)
+            try:
+                res = term(op, args)
+            except (IndexError, NotImplementedError):
+                res = reify(x, s)
+            memo[id(x)] = (x, res)
+            continue
+
+        if id(x) in memo or id(x) in parts:
+            continue
+
+        try:
+            if isinstance(x, MetaSymbol):
+                # Avoid using `operator`/`arguments` and unnecessarily
+                # breaking apart meta objects and the base objects they
+                # hold onto (i.e. their reified forms).
+                res = x.reify()
+                if not MetaSymbol.is_meta(res):
+                    memo[id(x)] = (x, res)
+                    continue
+            op, args = operator(x), arguments(x)
+        except (IndexError, NotImplementedError):
+            memo[id(x)] = (x, reify(x, s))
+            continue
+
+        parts[id(x)] = (op, args)
+        stack.append((x, True))
+        stack.append((op, False))
+        stack.extend((a, False) for a in reversed(args))
+
+    return memo[id(obj)][1]
+
+
+def _same_base_terms(x, y):
+    """Compare the base objects of two terms without converting them.
+
+    Returns `True` when they're the same object, `False` when their top
+    levels already differ in a way that makes the terms unequal, and `None`
+    when it takes a full comparison (i.e. `unify`) to tell.
+    """
+    x_obj = x.obj if isinstance(x, MetaSymbol) else x
+    y_obj = y.obj if isinstance(y, MetaSymbol) else y
+    if x_obj is None or y_obj is None or isvar(x_obj) or isvar(y_obj):
+        return None
+    if x_obj is y_obj:
+        return True
+    if (isinstance(x_obj, tt.Variable) and isinstance(y_obj, tt.Variable) and
+            not isinstance(x_obj, tt.Constant)):
+        x_owner, y_owner = x_obj.owner, y_obj.owner
+        if (MetaSymbol._meta_class_for(type(x_obj)) is not
+                MetaSymbol._meta_class_for(type(y_obj)) or
+                x_obj.type != y_obj.type or x_obj.index != y_obj.index or
+                x_obj.name != y_obj.name or
+                (x_owner is None) != (y_owner is None) or
+                (x_owner is not None and not (x_owner.op == y_owner.op))):
+            return False
+    return None
+
+
+class CompiledPattern(object):
+    """A matcher for a fixed pattern (e.g. a meta object with logic
+    variables).
+
+    The pattern is compiled into a flat sequence of steps--i.e. type checks,
+    slot and element accesses, and logic variable bindings--in the order
+    `unify` would perform them.  Matching a term runs these steps directly on
+    the term (Theano or meta objects) and stops at the first mismatch, instead
+    of dispatching `unify` at every level and converting the entire term to
+    meta objects first.  Sub-terms that aren't simple to match (e.g. logic
+    variables in the term) are unified with `unify`.
+
+    Use it like `unify`, e.g. `pattern_c.match(x, s)`, or as a miniKanren goal,
+    e.g. `(pattern_c.goal, x)`.
+    """
+
+    _VAR, _SEQ, _META, _OP, _OBJ, _LEAF = range(6)
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.steps = []
+        self.n_regs = 1
+        self._compile(pattern, 0)
+
+    def _new_regs(self, n):
+        res = tuple(range(self.n_regs, self.n_regs + n))
+        self.n_regs += n
+        return res
+
+    def _compile(self, u, reg):
+        """Add the steps for a (sub-)pattern to be matched against the value
+        in a register, and return whether or not the sub-pattern contains
+        logic variables.
+
+        Each step is a list containing the step type, the register, the
+        sub-pattern, the index of the step following the sub-pattern's steps
+        (i.e. where to continue when it's matched by `unify`) and the step's
+        data.
+        """
+        idx = len(self.steps)
+        if isvar(u):
+            self.steps.append([self._VAR, reg, u, idx + 1, None])
+            return True
+        elif isinstance(u, MetaOp) and not hasattr(type(u), '__slots__'):
+            # Unification compares these by their base `Op`s.
+            self.steps.append([self._OP, reg, u, idx + 1, None])
+            return False
+        elif isinstance(u, MetaSymbol) and hasattr(type(u), '__slots__'):
+            slots = tuple(u.__slots__)
+            step = [self._META, reg, u, None, None]
+            self.steps.append(step)
+            regs = self._new_regs(len(slots))
+            has_vars = False
+            for slot, r in zip(slots, regs):
+                has_vars |= self._compile(getattr(u, slot), r)
+            u_obj = u.obj
+            if u_obj is not None:
+                self.steps.append([self._OBJ, reg, u, len(self.steps) + 1,
+                                   u_obj])
+            ground = (not has_vars and u_obj is not None and
+                      not isinstance(u_obj, Var))
+            step[3:] = [len(self.steps), (slots, regs, ground)]
+            return has_vars
+        elif isinstance(u, (list, tuple)):
+            step = [self._SEQ, reg, u, None, None]
+            self.steps.append(step)
+            regs = self._new_regs(len(u))
+            has_vars = False
+            for u_i, r in zip(u, regs):
+                has_vars |= self._compile(u_i, r)
+            step[3:] = [len(self.steps), regs]
+            return has_vars
+        else:
+            self.steps.append([self._LEAF, reg, u, idx + 1, None])
+            return False
+
+    def match(self, x, s=None):
+        """Unify a term with the pattern.
+
+        Returns a new substitution `dict` extended with the logic variable
+        bindings, or `False` if the term doesn't match.  Theano terms bound to
+        logic variables are converted to meta objects lazily (see
+        `lazy_meta_objects`); the bindings compare and hash like eager
+        conversions, so the two can be used interchangeably.
+        """
+        return self._match(x, s, True)
+
+    def matches(self, x, s=None):
+        """Check whether or not a term unifies with the pattern.
+
+        Unlike `match`, the Theano objects bound to logic variables aren't
+        converted to meta objects, which makes this much cheaper when
+        the bindings aren't needed.
+        """
+        return self._match(x, s, False) is not False
+
+    def _match(self, x, s, convert_vars):
+        s = {} if s is None else s.copy()
+        regs = [None] * self.n_regs
+        regs[0] = x
+        # Whether or not a register's value is part of a Theano object that
+        # `unify` would've converted to a meta object.
+        convert = [False] * self.n_regs
+        steps = self.steps
+        n_steps = len(steps)
+        pc = 0
+        while pc < n_steps:
+            kind, reg, u, end, data = steps[pc]
+            x = regs[reg]
+
+            if kind == self._VAR and u in s and not isvar(x):
+                # Compare the term with the one already bound before
+                # converting both (and their entire graphs) in `unify`.
+                y = s[u]
+                while isvar(y) and y in s:
+                    y = s[y]
+                same = None if isvar(y) else _same_base_terms(y, x)
+                if same is False:
+                    return False
+                elif same:
+                    pc = end
+                    continue
+
+            if isvar(x) or (kind == self._VAR and u in s):
+                s = unify(u, x, s)
+                if s is False:
+                    return False
+                pc = end
+                continue
+
+            if kind == self._VAR:
+                if convert_vars and convert[reg]:
+                    # Only the top level of the bound term is converted; its
+                    # sub-objects are converted when they're accessed.
+                    x = _from_obj_lazily(x)
+                s[u] = x
+            elif kind == self._OBJ:
+                # See `unify_MetaSymbol`.
+                x_obj = x.obj if isinstance(x, MetaSymbol) else x
+                if s:
+                    if isinstance(data, Var) and x_obj:
+                        s[data] = x_obj
+                    elif isinstance(x_obj, Var) and data:
+                        s[x_obj] = data
+            elif kind in (self._META, self._OP):
+                x_is_meta = isinstance(x, MetaSymbol)
+                if x_is_meta:
+                    x_type = type(x)
+                    x_obj = x.obj
+                elif isinstance(x, tt_class_abstractions):
+                    x_type = MetaSymbol._meta_class_for(type(x))
+                    x_obj = x
+                    if 'from_obj' in x_type.__dict__:
+                        # This type has its own means of conversion, so its
+                        # slots might not correspond to the base object's
+                        # attributes.
+                        x = MetaSymbol.from_obj(x)
+                        x_is_meta = True
+                else:
+                    s = unify(u, x, s)
+                    if s is False:
+                        return False
+                    pc = end
+                    continue
+
+                if x_type is not type(u):
+                    return False
+
+                if kind == self._OP:
+                    if not (u.obj == x_obj):
+                        return False
+                else:
+                    slots, slot_regs, ground = data
+                    if ground and x_obj is u.obj:
+                        pc = end
+                        continue
+                    for slot, r in zip(slots, slot_regs):
+                        regs[r] = getattr(x, slot)
+                        convert[r] = not x_is_meta
+            elif kind == self._SEQ:
+                if not isinstance(x, (list, tuple)):
+                    s = unify(u, x, s)
+                    if s is False:
+                        return False
+                    pc = end
+                    continue
+                if len(x) != len(u):
+                    return False
+                for x_i, r in zip(x, data):
+                    regs[r] = x_i
+                    convert[r] = convert[reg]
+            else:
+                s = unify(u, x, s)
+                if s is False:
+                    return False
+
+            pc += 1
+
+        return s
+
+    def __call__(self, x, s=None):
+        return self.match(x, s)
+
+    def goal(self, x):
+        """Create a miniKanren goal that unifies a term with the pattern."""
+        def _goal(s):
+            res = self.match(x, s)
+            if res is not False:
+                yield res
+        return _goal
+
+    def __repr__(self):
+        return f'CompiledPattern({self.pattern!r})'
+
+
+def compile_pattern(pattern):
+    """Compile a pattern into a `CompiledPattern` matcher.
+
+    The logic variables in the pattern are determined when it's compiled, so
+    any `unification.variables` context must be active then.
+    """
+    return CompiledPattern(pattern)
 
 
 fact(commutative, mt.add)
@@ -294,4 +879,5 @@ fact(commutative, mt.mul)
 fact(associative, mt.add)
 fact(associative, mt.mul)
 
-__all__ = ['debug_unify', 'reify_all_terms', 'etuple', 'tuple_expression']
+__all__ = ['debug_unify', 'reify_all_terms', 'etuple', 'tuple_expression',
+           'compile_pattern', 'CompiledPattern', 'Substitution']
@@ -11,7 +11,7 @@ from theano.gof.graph import (inputs as tt_inputs, clone_get_equiv,
 from theano.compile import optdb
 
 from . import Observed
-from .rv import RandomVariable
+from .rv import RandomVariable, batched_rv
 from .opt import FunctionGraph
 from .meta import MetaSymbol, _check_eq
 
@@ -103,32 +103,31 @@ def meta_parts_unequal(x, y, pdb=False):
     that are not equal.
     """
     res = None
-    if type(x) != type(y):
-        print('unequal types')
-        res = (x, y)
-    elif isinstance(x, MetaSymbol):
-        if x.base != y.base:
-            print('unequal bases')
-            res = (x.base, y.base)
-        else:
-            for a, b in zip(x.rands(), y.rands()):
-                z = meta_parts_unequal(a, b, pdb=pdb)
-                if z is not None:
-                    res = z
-                    break
-    elif isinstance(x, (tuple, list)):
-        for a, b in zip(x, y):
-            z = meta_parts_unequal(a, b, pdb=pdb)
-            if z is not None:
-                res = z
-                break
-    elif not _check_eq(x, y):
-        res = (x, y)
-
-    if res is not None:
-        if pdb:
-            import pdb; pdb.set_trace()
-        return res
+    seen = set()
+    stack = [(x, y)]
+    while stack:
+        x, y = stack.pop()
+        if (id(x), id(y)) in seen:
+            continue
+        seen.add((id(x), id(y)))
+        if type(x) != type(y):
+            print('unequal types')
+            res = (x, y)
+        elif isinstance(x, MetaSymbol):
+            if x.base != y.base:
+                print('unequal bases')
+                res = (x.base, y.base)
+            else:
+                stack.extend(reversed(list(zip(x.rands(), y.rands()))))
+        elif isinstance(x, (tuple, list)):
+            stack.extend(reversed(list(zip(x, y))))
+        elif not _check_eq(x, y):
+            res = (x, y)
+
+        if res is not None:
+            if pdb:
+                import pdb; pdb.set_trace()
+            return res
 
 
 def expand_meta(x, tt_print=tt.pprint):
@@ -207,3 +206,82 @@ def canonicalize(x, **kwargs):
     """Canonicalize a Theano variable and/or graph.
     """
     return optimize_graph(x, canonicalize_opt, **kwargs)
+
+
+def batched_graph(outputs, draws):
+    """Recreate a graph so that every random variable draws a batch of
+    samples.
+
+    Each `RandomVariable` is replaced by one with a leading sample dimension
+    of length `draws` (see `batched_rv`) and the terms depending on them are
+    recreated with the batched terms.
+
+    The deterministic terms between random variables must broadcast along
+    the new leading dimension, so only element-wise operations and dimension
+    shuffles (which are moved past the sample dimension) are supported;
+    a `NotImplementedError` is raised for any other term (e.g. `dot`) that
+    depends on a random variable.
+
+    XXX: NumPy's multivariate samplers don't take batched parameters, so
+    a multivariate random variable that depends on batched terms is drawn
+    once per sample (see `RandomVariable.perform`) and isn't any faster than
+    drawing the samples one at a time.
+
+    Parameters
+    ==========
+    outputs: list of Variable
+        The outputs of the graph.
+    draws: int or Variable
+        The number of samples.
+
+    Results
+    =======
+    out: list of Variable
+        The batched outputs.
+    """
+    memo = {}
+    for node in io_toposort(tt_inputs(outputs), outputs):
+        new_inputs = [memo.get(i, i) for i in node.inputs]
+
+        if isinstance(node.op, RandomVariable):
+            rv_var = node.default_output()
+            new_rv = batched_rv(rv_var, draws,
+                                dist_params=new_inputs[:-2],
+                                rng=new_inputs[-1])
+            new_node = new_rv.owner
+        elif all(n is o for n, o in zip(new_inputs, node.inputs)):
+            continue
+        elif isinstance(node.op, tt.DimShuffle):
+            new_order = (0,) + tuple(d if d == 'x' else d + 1
+                                     for d in node.op.new_order)
+            new_node = new_inputs[0].dimshuffle(new_order).owner
+        elif isinstance(node.op, tt.Elemwise):
+            new_node = node.clone_with_new_inputs(new_inputs, strict=False)
+        else:
+            raise NotImplementedError(
+                f'{node.op} does not broadcast along the sample dimension; '
+                'only element-wise operations and dimension shuffles can '
+                'depend on batched random variables')
+
+        memo.update(zip(node.outputs, new_node.outputs))
+
+    return [memo.get(o, o) for o in outputs]
+
+
+def batched_function(inputs, outputs, draws, **kwargs):
+    """Compile a Theano function that returns `draws` samples of `outputs`
+    per call.
+
+    See `batched_graph`; the remaining keyword arguments are passed to
+    `theano.function`.
+    """
+    single_output = not isinstance(outputs, (list, tuple))
+    if single_output:
+        outputs = [outputs]
+
+    batched_outputs = batched_graph(outputs, draws)
+
+    if single_output:
+        batched_outputs, = batched_outputs
+
+    return theano.function(inputs, batched_outputs, **kwargs)
@@ -0,0 +1,53 @@
+from benchmarks.suite import (benchmarks, run_benchmarks, compare_results,
+                              measure)
+
+
+def test_compare_results():
+    baseline = {'a': {'time_min': 1.0, 'peak_memory': 100},
+                'b': {'time_min': 1.0, 'peak_memory': 100},
+                'c': {'time_min': 1.0, 'peak_memory': 100}}
+    results = {'a': {'time_min': 1.1, 'peak_memory': 110},
+               'b': {'time_min': 1.5, 'peak_memory': 100},
+               'c': {'time_min': 0.5, 'peak_memory': 200},
+               'd': {'time_min': 1.0, 'peak_memory': 100}}
+
+    comparisons = {c[0]: c[1:] for c in compare_results(results, baseline)}
+
+    # Benchmarks without a baseline aren't compared.
+    assert set(comparisons) == {'a', 'b', 'c'}
+
+    assert comparisons['a'][0] == 1.1 and comparisons['a'][1] == 1.1
+    assert not comparisons['a'][2]
+    assert comparisons['b'][2]
+    assert comparisons['c'][2]
+
+    # The tolerances are configurable.
+    comparisons = {c[0]: c[1:]
+                   for c in compare_results(results, baseline,
+                                            time_tolerance=1.0,
+                                            memory_tolerance=1.0)}
+    assert not any(c[2] for c in comparisons.values())
+
+    # Zero baseline values don't cause errors.
+    (_, time_ratio, memory_ratio, _), = compare_results(
+        {'a': {'time_min': 0.0, 'peak_memory': 0}},
+        {'a': {'time_min': 0.0, 'peak_memory': 0}})
+    assert time_ratio == 0.0 and memory_ratio == 0.0
+
+
+def test_run_benchmarks():
+    res = measure(lambda: (lambda: sum(range(10))), repeat=2)
+    assert res['repeat'] == 2
+    assert 0 <= res['time_min'] <= res['time_mean']
+    assert res['peak_memory'] >= 0
+
+    assert 'reify_meta' in benchmarks
+
+    finished = []
+    results = run_benchmarks(r'^reify_meta\[size=10\]$', repeat=1,
+                             callback=lambda i, r: finished.append(i))
+    assert list(results) == finished == ['reify_meta[size=10]']
+    assert results['reify_meta[size=10]']['params'] == {'size': 10}
+
+    comparison, = compare_results(results, results)
+    assert comparison[1] == 1.0 and not comparison[3]
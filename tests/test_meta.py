@@ -1,9 +1,11 @@
+import numpy as np
 import theano
 import theano.tensor as tt
 
-from unification import var
+from unification import var, unify, reify
+from symbolic_pymc import meta
 from symbolic_pymc.meta import (MetaSymbol, MetaTensorVariable, MetaTensorType,
-                                mt)
+                                mt, intern_meta_objects, lazy_meta_objects)
 from symbolic_pymc.utils import graph_equal
 
 
@@ -38,3 +40,263 @@ def test_meta_classes():
     # TODO: Do we really want meta variables to be equal to their
     # reified base objects?
     # assert meta_vars == [tt.as_tensor_variable(x) for x in test_vals]
+
+
+def test_meta_interning():
+    x_tt = tt.vector('x')
+    y_tt = x_tt + 1
+
+    # Without interning, conversions produce distinct meta objects.
+    assert mt(y_tt) is not mt(y_tt)
+
+    intern_meta_objects()
+    try:
+        y_mt = mt(y_tt)
+        assert mt(y_tt) is y_mt
+        assert mt(y_tt.owner) is y_mt.owner
+        assert mt(y_tt.owner.op) is y_mt.owner.op
+        assert mt(x_tt) is y_mt.owner.inputs[0]
+
+        # A changed meta object shouldn't be returned for its old base object.
+        y_mt.name = 'y'
+        assert y_mt.obj is None
+        assert mt(y_tt) is not y_mt
+
+        # Unreferenced meta objects are evicted.
+        z_tt = tt.vector('z')
+        z_id = id(z_tt)
+        z_mt = mt(z_tt)
+        assert meta._meta_intern_table[z_id] is z_mt
+        del z_mt
+        assert z_id not in meta._meta_intern_table
+    finally:
+        intern_meta_objects(False)
+
+    assert meta._meta_intern_table is None
+
+
+def test_meta_hash_eq():
+    c_tt = tt.as_tensor_variable(np.arange(4.0))
+    x_tt = tt.vector('x')
+    y_tt = x_tt + c_tt
+
+    y_mt = mt(y_tt)
+    y_hash = hash(y_mt)
+
+    # The hash is cached for meta objects with base objects.
+    assert y_mt._hash == y_hash
+    assert hash(mt(y_tt)) == y_hash
+    assert mt(y_tt) == y_mt
+
+    # Changing a slot discards the cached hash (and the base object).
+    y_mt.name = 'y'
+    assert '_hash' not in y_mt.__dict__
+    assert hash(y_mt) != y_hash
+    assert mt(y_tt) != y_mt
+
+    # Changing a meta object beneath another discards the latter's cached
+    # hash, too.
+    z_mt = mt(tt.exp(y_tt))
+    z_hash = hash(z_mt)
+    assert hash(mt(tt.exp(y_tt))) == z_hash
+    z_mt.owner.inputs[0].name = 'w'
+    assert hash(z_mt) != z_hash
+    assert z_mt != mt(tt.exp(y_tt))
+    z_mt.owner.inputs[0].name = y_tt.name
+    assert hash(z_mt) == z_hash
+    assert z_mt == mt(tt.exp(y_tt))
+
+    # Structurally different terms don't share hashes.
+    terms_tt = [tt.exp(x_tt), tt.log(x_tt), x_tt + 1, x_tt * 2,
+                tt.sin(x_tt + x_tt), tt.exp(tt.log(x_tt))]
+    assert len({hash(mt(t)) for t in terms_tt}) == len(terms_tt)
+
+    # Meta objects without base objects still compare structurally.
+    a_mt = mt.add(var('a'), c_tt)
+    b_mt = mt.add(var('a'), c_tt)
+    assert a_mt.owner == b_mt.owner
+    assert hash(a_mt.owner) == hash(b_mt.owner)
+    assert a_mt != b_mt
+
+    # Equal meta objects with and without base objects have the same hashes.
+    w_mt = mt(tt.exp(y_tt))
+    v_mt = MetaTensorVariable(w_mt.type,
+                              meta.MetaApply(w_mt.owner.op,
+                                             list(w_mt.owner.inputs)),
+                              w_mt.index, w_mt.name)
+    assert v_mt.obj is None
+    assert v_mt == w_mt and hash(v_mt) == hash(w_mt)
+
+
+def test_meta_dispatch_cache():
+    assert MetaSymbol.base_classes() is MetaSymbol.base_classes()
+
+    x_tt = tt.vector('x')
+    assert type(mt(x_tt)) == MetaTensorVariable
+    assert meta._meta_class_cache[
+        (MetaSymbol, type(x_tt))] is MetaTensorVariable
+
+    x_sh = theano.shared(np.r_[1.0])
+    assert isinstance(mt(x_sh), meta.MetaSharedVariable)
+
+    # New meta classes invalidate the caches.
+    class MetaTestDummy(meta.MetaOp):
+        base = type('TestDummyOp', (theano.Op,), {})
+
+    assert (MetaSymbol, type(x_tt)) not in meta._meta_class_cache
+    assert MetaTestDummy.base in meta.MetaOp.base_classes()
+
+
+def test_meta_lazy():
+    x_tt = tt.vector('x')
+    y_tt = tt.exp(tt.log(x_tt + 1))
+
+    lazy_meta_objects()
+    try:
+        y_mt = mt(y_tt)
+        assert set(y_mt._deferred_slots) == {'type', 'owner'}
+
+        # A mismatch at the root `Op` shouldn't convert anything beneath it.
+        assert unify(mt.add(var(), var()), y_mt) is False
+        log_mt = y_mt.owner.inputs[0]
+        assert isinstance(log_mt, MetaTensorVariable)
+        assert set(log_mt._deferred_slots) == {'type', 'owner'}
+
+        # Accessing the slots converts them.
+        log_owner_mt = log_mt.owner
+        assert 'owner' not in log_mt._deferred_slots
+        assert 'inputs' in log_owner_mt._deferred_slots
+        assert log_mt.obj is y_tt.owner.inputs[0]
+
+        s = unify(mt.exp(var('z')), y_mt)
+        assert s[var('z')] == log_mt
+
+        assert y_mt.reify() is y_tt
+        assert y_mt == MetaSymbol.from_obj(y_tt)
+
+        # Converting the deferred slots doesn't change the hash.
+        w_mt = MetaSymbol.from_obj(y_tt)
+        assert hash(w_mt) == hash(y_mt)
+        assert hash(MetaSymbol.from_obj(tt.log(y_tt))) != hash(y_mt)
+
+        # Lazily and eagerly converted meta objects are equal and have the
+        # same hashes, and hashing doesn't convert anything.
+        w_mt = MetaSymbol.from_obj(y_tt)
+        lazy_meta_objects(False)
+        z_mt = mt(y_tt)
+        assert hash(w_mt) == hash(z_mt)
+        assert set(w_mt._deferred_slots) == {'type', 'owner'}
+        assert w_mt == z_mt and z_mt == w_mt
+        assert w_mt.owner.inputs[0] == z_mt.owner.inputs[0]
+        assert hash(w_mt.owner.inputs[0]) == hash(z_mt.owner.inputs[0])
+        assert len({w_mt, z_mt}) == 1 and {z_mt: 1}.get(w_mt) == 1
+    finally:
+        lazy_meta_objects(False)
+
+    assert '_deferred_slots' not in mt(y_tt).__dict__
+
+
+def test_meta_deep_graphs():
+    x_tt = tt.vector('x')
+    y_tt = x_tt
+    for i in range(1500):
+        y_tt = tt.log(tt.exp(y_tt) + x_tt)
+
+    # Deep graphs are converted without recursion, and shared sub-graphs
+    # are only converted once.
+    y_mt = mt(y_tt)
+    add_mt = y_mt.owner.inputs[0]
+    next_add_mt = add_mt.owner.inputs[0].owner.inputs[0].owner.inputs[0]
+    assert add_mt.owner.inputs[1] is next_add_mt.owner.inputs[1]
+
+    z_mt = mt(y_tt)
+    z_mt.obj = None
+    assert z_mt.reify() is y_tt
+
+    # Meta-level patterns aren't reified exponentially in their depth.
+    x_lv = var()
+    y_mt = x_lv
+    for i in range(1500):
+        y_mt = mt.log(mt.exp(y_mt))
+    assert isinstance(y_mt.reify(), MetaTensorVariable)
+
+
+def test_meta_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    x_tt = tt.vector('x')
+    graphs_tt = []
+    for j in range(4):
+        y_tt = x_tt
+        for i in range(200):
+            y_tt = tt.log(tt.exp(y_tt) + j)
+        graphs_tt.append(y_tt)
+
+    def convert_and_reify(y_tt):
+        y_mt = mt(y_tt)
+        y_mt.obj = None
+        return y_mt.reify()
+
+    with ThreadPoolExecutor(4) as executor:
+        res = list(executor.map(convert_and_reify, graphs_tt))
+
+    assert all(r is y_tt for r, y_tt in zip(res, graphs_tt))
+
+    # The conversion and reification memos aren't shared between threads.
+    state = meta._meta_thread_state
+    state.convert_memo, state.reify_memo = {}, {}
+    try:
+        with ThreadPoolExecutor(1) as executor:
+            assert executor.submit(
+                convert_and_reify, graphs_tt[0]).result() is graphs_tt[0]
+            assert executor.submit(
+                lambda: (meta._meta_thread_state.convert_memo,
+                         meta._meta_thread_state.reify_memo)
+            ).result() == (None, None)
+        assert state.convert_memo == {} and state.reify_memo == {}
+    finally:
+        state.convert_memo, state.reify_memo = None, None
+
+
+def test_meta_ground():
+    x_tt = tt.vector('x')
+    y_mt = mt(tt.log(tt.exp(x_tt) + x_tt))
+    assert y_mt.ground
+    assert y_mt.owner.inputs[0].ground
+
+    x_lv = var()
+    z_mt = mt.log(mt.exp(x_lv))
+    assert not z_mt.ground
+    assert not mt.exp(x_lv).ground
+
+    # Changing a slot value (or the base object) discards the cached value.
+    exp_mt = y_mt.owner.inputs[0].owner.inputs[0]
+    assert exp_mt.owner.ground
+    exp_mt.owner.inputs = [x_lv]
+    assert not exp_mt.owner.ground
+    exp_mt.owner.inputs = [mt(x_tt)]
+    assert exp_mt.owner.ground
+
+    # Changes to the meta objects beneath are also tracked.
+    w_mt = mt(tt.log(tt.exp(x_tt)))
+    assert w_mt.ground
+    w_mt.owner.inputs[0].owner.inputs = [x_lv]
+    assert not w_mt.ground
+    s = unify(x_lv, mt(x_tt), {})
+    assert reify(w_mt, s) == mt(tt.log(tt.exp(x_tt)))
+
+    # Deferred slots aren't converted.
+    lazy_meta_objects(True)
+    try:
+        w_mt = MetaSymbol.from_obj(tt.exp(x_tt))
+        assert w_mt.ground
+        assert '_deferred_slots' in w_mt.owner.__dict__
+    finally:
+        lazy_meta_objects(False)
+
+    # Reification returns ground meta objects as-is.
+    assert unify(z_mt, y_mt, {}) is False
+    s = unify(z_mt, mt(tt.log(tt.exp(x_tt))), {})
+    assert s[x_lv] == mt(x_tt)
+    assert reify(y_mt, s) is y_mt
+
@@ -0,0 +1,473 @@
+import pytest
+
+import numpy as np
+
+import theano.tensor as tt
+
+from theano.tensor.nlinalg import matrix_inverse
+
+from theano.gof.opt import EquilibriumOptimizer
+from theano.gof.graph import inputs as tt_inputs
+from theano.gof.toolbox import Feature, ReplaceValidate
+from theano.gof.fg import InconsistencyError
+
+from unification import var
+
+from kanren import eq, conde
+from kanren.facts import Relation, fact
+
+from symbolic_pymc.meta import mt
+from symbolic_pymc.opt import (FunctionGraph, KanrenRelationSub,
+                               RelationIndex, KanrenResultCache,
+                               KanrenEquilibriumOptimizer,
+                               KanrenParallelOptimizer, SearchBudget,
+                               graph_rewrites, graph_cost,
+                               cheapest_result_filter)
+from symbolic_pymc.utils import optimize_graph, graph_equal
+
+
+class RejectFeature(Feature):
+    """A feature that rejects the graphs for which `pred` is true."""
+
+    def __init__(self, pred):
+        self.pred = pred
+
+    def validate(self, fgraph):
+        if self.pred(fgraph):
+            raise InconsistencyError('rejected')
+
+
+def create_exp_graph():
+    """Create a graph that's only valid while it has an `exp`."""
+    a_tt = tt.vector('a')
+    b_tt = tt.vector('b')
+    out_tt = tt.log(tt.exp(a_tt)) + tt.log(tt.exp(b_tt))
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    fgraph.attach_feature(RejectFeature(
+        lambda fg: not any(n.op == tt.exp for n in fg.apply_nodes)))
+    return fgraph, a_tt, b_tt
+
+
+def create_log_exp_relation():
+    log_exp_rel = Relation('log_exp')
+    x_lv = var()
+    fact(log_exp_rel, mt.log(mt.exp(x_lv)), x_lv)
+    return log_exp_rel
+
+
+def test_relation_index():
+    log_exp_rel = create_log_exp_relation()
+
+    a_tt = tt.vector('a')
+    b_tt = tt.vector('b')
+    out_tt = tt.log(tt.exp(a_tt)) + b_tt
+
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    nodes = {n.op: n for n in fgraph.toposort()}
+
+    rel_index = RelationIndex(log_exp_rel)
+    assert rel_index.candidates(nodes[tt.log]) == list(log_exp_rel.facts)
+    assert rel_index.candidates(nodes[tt.exp]) == []
+    assert rel_index.candidates(nodes[tt.add]) == []
+
+    # New facts are picked up.
+    y_lv = var()
+    fact(log_exp_rel, mt.exp(mt.log(y_lv)), y_lv)
+    assert len(rel_index.candidates(nodes[tt.exp])) == 1
+
+    # Relations are indexed by default.
+    log_exp_opt = KanrenRelationSub(log_exp_rel)
+    assert log_exp_opt.relation_index.relation is log_exp_rel
+    assert log_exp_opt.transform(nodes[tt.add]) is False
+
+    res, = log_exp_opt.transform(nodes[tt.log])
+    assert res is a_tt
+
+    fgraph_opt = optimize_graph(
+        fgraph, EquilibriumOptimizer([log_exp_opt], max_use_ratio=10),
+        return_graph=False)
+    assert graph_equal(fgraph_opt, a_tt + b_tt)
+
+
+def test_kanren_result_cache():
+    log_exp_rel = create_log_exp_relation()
+
+    a_tt = tt.vector('a')
+    b_tt = tt.vector('b')
+    exp_tt = tt.exp(a_tt)
+    out_tt = tt.log(exp_tt) + b_tt
+
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    nodes = {n.op: n for n in fgraph.toposort()}
+
+    n_runs = [0]
+
+    def count_runs(opt):
+        _transform = opt._transform
+
+        def _counted_transform(node):
+            n_runs[0] += 1
+            return _transform(node)
+
+        opt._transform = _counted_transform
+        return opt
+
+    log_exp_opt = count_runs(KanrenRelationSub(log_exp_rel))
+
+    assert log_exp_opt.transform(nodes[tt.add]) is False
+    assert log_exp_opt.transform(nodes[tt.add]) is False
+    assert n_runs[0] == 1
+    assert isinstance(fgraph.kanren_result_cache, KanrenResultCache)
+
+    res_1 = log_exp_opt.transform(nodes[tt.log])
+    res_2 = log_exp_opt.transform(nodes[tt.log])
+    assert res_1 == res_2 == [a_tt]
+    assert res_1 is not res_2
+    assert n_runs[0] == 2
+
+    # Changing an input invalidates the node and its clients.
+    fgraph.replace(exp_tt, tt.exp(b_tt))
+    assert nodes[tt.add] not in fgraph.kanren_result_cache.results_for(
+        log_exp_opt)
+
+    assert log_exp_opt.transform(nodes[tt.log]) == [b_tt]
+    assert log_exp_opt.transform(nodes[tt.add]) is False
+    assert n_runs[0] == 4
+
+    # Pruned nodes are removed.
+    fgraph.replace(nodes[tt.log].outputs[0], b_tt)
+    assert nodes[tt.log] not in fgraph.kanren_result_cache.results_for(
+        log_exp_opt)
+
+    no_cache_opt = count_runs(
+        KanrenRelationSub(log_exp_rel, cache_results=False))
+    no_cache_opt.transform(nodes[tt.add])
+    no_cache_opt.transform(nodes[tt.add])
+    assert n_runs[0] == 6
+
+
+def test_kanren_equilibrium_optimizer():
+    log_exp_rel = create_log_exp_relation()
+    log_exp_opt = KanrenRelationSub(log_exp_rel)
+    assert log_exp_opt.relation_index.depth == 2
+
+    a_tt = tt.vector('a')
+    b_tt = tt.vector('b')
+    out_tt = tt.log(tt.exp(tt.log(tt.exp(a_tt)))) + tt.exp(b_tt)
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+
+    # The outer `log(exp(...))` only matches after the inner one is replaced.
+    eq_opt = KanrenEquilibriumOptimizer([log_exp_opt])
+    fgraph_opt = optimize_graph(fgraph, eq_opt, return_graph=False)
+    assert graph_equal(fgraph_opt, a_tt + tt.exp(b_tt))
+    assert not hasattr(fgraph, 'kanren_worklist')
+
+    stats = eq_opt.stats[log_exp_opt]
+    assert stats['replacements'] == 2
+    # Only the nodes that depend on the replaced terms are revisited.
+    assert stats['nodes'] < 2 * len(fgraph.apply_nodes)
+
+    fgraph_eq = optimize_graph(
+        fgraph, EquilibriumOptimizer([log_exp_opt], max_use_ratio=10),
+        return_graph=False)
+    assert graph_equal(fgraph_opt, fgraph_eq)
+
+    # The optimization stops when the budget is spent.
+    eq_opt = KanrenEquilibriumOptimizer([log_exp_opt], max_steps=3)
+    fgraph_opt = optimize_graph(fgraph, eq_opt, return_graph=False)
+    assert eq_opt.stats[log_exp_opt]['nodes'] == 3
+    assert eq_opt.stats[log_exp_opt]['replacements'] == 1
+    assert graph_equal(fgraph_opt, tt.log(tt.exp(a_tt)) + tt.exp(b_tt))
+
+    # Replacements that fail validation are reverted and skipped.
+    fgraph, a_tt, b_tt = create_exp_graph()
+    eq_opt = KanrenEquilibriumOptimizer([log_exp_opt])
+    fgraph_opt = optimize_graph(fgraph, eq_opt, return_graph=False)
+    assert graph_equal(fgraph_opt, tt.log(tt.exp(a_tt)) + b_tt)
+    assert eq_opt.stats[log_exp_opt]['replacements'] == 1
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_kanren_parallel_optimizer(n_jobs):
+    log_exp_rel = create_log_exp_relation()
+    log_exp_opt = KanrenRelationSub(log_exp_rel)
+
+    a_tt = tt.vector('a')
+    b_tt = tt.vector('b')
+    out_tt = (tt.log(tt.log(tt.exp(tt.exp(a_tt)))) +
+              tt.log(tt.exp(tt.log(tt.exp(b_tt)))))
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+
+    par_opt = KanrenParallelOptimizer([log_exp_opt], n_jobs=n_jobs,
+                                      min_parallel_nodes=1)
+    fgraph_opt = optimize_graph(fgraph, par_opt, return_graph=False)
+    assert graph_equal(fgraph_opt, a_tt + b_tt)
+    assert not hasattr(fgraph, 'kanren_worklist')
+
+    # The outer `log` in the first term only matches after the first round.
+    assert par_opt.stats == {'rounds': 2, 'nodes': 5, 'matches': 4,
+                             'replacements': 4}
+
+    par_opt = KanrenParallelOptimizer([log_exp_opt], n_jobs=n_jobs,
+                                      max_rounds=1, min_parallel_nodes=1)
+    fgraph_opt = optimize_graph(fgraph, par_opt, return_graph=False)
+    assert graph_equal(fgraph_opt, tt.log(tt.exp(a_tt)) + b_tt)
+
+    # The workers replay the earlier rounds' commits, including the ones
+    # matched in the current process, before matching the later rounds.
+    c_tt = tt.vector('c')
+    out_tt = tt.log(tt.log(tt.log(tt.exp(tt.exp(tt.exp(c_tt)))))) * c_tt
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    for min_parallel_nodes in (1, 2):
+        par_opt = KanrenParallelOptimizer(
+            [log_exp_opt], n_jobs=n_jobs,
+            min_parallel_nodes=min_parallel_nodes)
+        fgraph_opt = optimize_graph(fgraph, par_opt, return_graph=False)
+        assert graph_equal(fgraph_opt, c_tt * c_tt)
+        assert par_opt.stats['rounds'] == 3
+
+    # Commits that fail validation are reverted and dropped.
+    exp_fgraph, a_tt, b_tt = create_exp_graph()
+    par_opt = KanrenParallelOptimizer([log_exp_opt], n_jobs=n_jobs,
+                                      min_parallel_nodes=1)
+    fgraph_opt = optimize_graph(exp_fgraph, par_opt, return_graph=False)
+    assert graph_equal(fgraph_opt, tt.log(tt.exp(a_tt)) + b_tt)
+    assert par_opt.stats['replacements'] == 1
+
+    # The workers' searches count toward the parent process's budgets.
+    budget = SearchBudget(max_steps=100)
+    budget_opt = KanrenRelationSub(log_exp_rel, search_budget=budget)
+    optimize_graph(fgraph, KanrenParallelOptimizer([budget_opt], n_jobs=1),
+                   return_graph=False)
+    serial_totals = (budget.total_steps, budget.exhausted)
+    assert serial_totals[0] > 0
+
+    budget.reset()
+    par_opt = KanrenParallelOptimizer([budget_opt], n_jobs=n_jobs,
+                                      min_parallel_nodes=1)
+    fgraph_opt = optimize_graph(fgraph, par_opt, return_graph=False)
+    assert graph_equal(fgraph_opt, c_tt * c_tt)
+    assert (budget.total_steps, budget.exhausted) == serial_totals
+
+    # Total limits can't be shared by the worker processes.
+    budget = SearchBudget(max_total_steps=1)
+    budget_opt = KanrenRelationSub(log_exp_rel, search_budget=budget)
+    par_opt = KanrenParallelOptimizer([budget_opt], n_jobs=n_jobs,
+                                      min_parallel_nodes=1)
+    if n_jobs == 1:
+        fgraph_opt = optimize_graph(fgraph, par_opt, return_graph=False)
+        assert graph_equal(fgraph_opt,
+                           tt.log(tt.log(tt.exp(tt.exp(c_tt)))) * c_tt)
+        assert budget.exhausted == {'total_steps': 1}
+    else:
+        with pytest.raises(ValueError):
+            optimize_graph(fgraph, par_opt, return_graph=False)
+
+
+def test_search_budget():
+    def manyo(in_, out):
+        # A goal with many failing branches.
+        return (conde,) + tuple([(eq, in_, i), (eq, out, i)]
+                                for i in range(2000))
+
+    out_tt = tt.log(tt.vector('a'))
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    node = out_tt.owner
+
+    budget = SearchBudget(max_steps=100, max_total_steps=150)
+    opt = KanrenRelationSub(manyo, search_budget=budget, cache_results=False)
+    assert opt.transform(node) is False
+    assert budget.exhausted == {'steps': 1}
+    assert opt.transform(node) is False
+    assert budget.exhausted == {'steps': 1, 'total_steps': 1}
+    assert budget.total_steps == 151
+
+    budget = SearchBudget(max_time=0.0)
+    opt = KanrenRelationSub(manyo, search_budget=budget, cache_results=False)
+    assert opt.transform(node) is False
+    assert budget.exhausted == {'time': 1}
+
+    # Searches within the budget aren't affected.
+    log_exp_rel = create_log_exp_relation()
+    out_tt = tt.log(tt.exp(tt.vector('b')))
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    budget = SearchBudget(max_steps=100, max_time=10, max_results=1)
+    opt = KanrenRelationSub(log_exp_rel, search_budget=budget,
+                            results_filter=cheapest_result_filter())
+    res, = opt.transform(fgraph.outputs[0].owner)
+    assert res is fgraph.inputs[0]
+    assert 0 < budget.total_steps <= 100
+    assert budget.exhausted == {'results': 1}
+
+    budget.reset()
+    assert budget.total_steps == 0 and not budget.exhausted
+
+    # The results of exhausted searches aren't cached.
+    budget = SearchBudget(max_total_steps=0)
+    opt = KanrenRelationSub(log_exp_rel, search_budget=budget)
+    assert opt.transform(fgraph.outputs[0].owner) is False
+    assert budget.exhausted == {'total_steps': 1}
+    budget.max_total_steps = 100
+    budget.reset()
+    res, = opt.transform(fgraph.outputs[0].owner)
+    assert res is fgraph.inputs[0]
+
+
+def test_replace_all():
+    a_tt = tt.vector('a')
+    b_tt = tt.vector('b')
+    exp_tt = tt.exp(a_tt)
+    log_tt = tt.log(b_tt)
+    out_tt = exp_tt * log_tt + a_tt
+
+    fgraph = FunctionGraph([a_tt, b_tt], [out_tt], clone=False)
+
+    with pytest.raises(TypeError):
+        fgraph.replace_all([(log_tt, tt.sqrt(b_tt)), (a_tt, tt.matrix())])
+
+    # Nothing was changed
+    assert fgraph.outputs == [out_tt]
+    assert fgraph.inputs == [a_tt, b_tt]
+
+    fgraph.replace_all({a_tt: b_tt,
+                        log_tt: tt.sqrt(b_tt),
+                        exp_tt: tt.exp(a_tt * b_tt)})
+
+    assert fgraph.inputs == [b_tt]
+    assert graph_equal(fgraph.outputs[0],
+                       tt.exp(b_tt * b_tt) * tt.sqrt(b_tt) + b_tt)
+    fgraph.check_integrity()
+
+    # The graph is validated after all the replacements, and they're reverted
+    # when that fails.
+    a_tt = tt.vector('a')
+    b_tt = tt.vector('b')
+    exp_tt = tt.exp(a_tt)
+    log_tt = tt.log(b_tt)
+    out_tt = exp_tt * log_tt + a_tt
+
+    fgraph = FunctionGraph([a_tt, b_tt], [out_tt], clone=False)
+    fgraph.attach_feature(ReplaceValidate())
+    fgraph.attach_feature(RejectFeature(
+        lambda fg: any(n.op == tt.sqrt for n in fg.apply_nodes)))
+
+    with pytest.raises(InconsistencyError):
+        fgraph.replace_all({log_tt: tt.sqrt(b_tt), a_tt: b_tt})
+
+    assert fgraph.outputs == [out_tt]
+    assert fgraph.inputs == [a_tt, b_tt]
+    assert exp_tt.owner.inputs == [a_tt]
+    fgraph.check_integrity()
+
+    fgraph.replace_all({log_tt: tt.exp(b_tt), a_tt: b_tt})
+    assert fgraph.inputs == [b_tt]
+    assert graph_equal(fgraph.outputs[0],
+                       tt.exp(b_tt) * tt.exp(b_tt) + b_tt)
+
+
+def test_graph_rewrites():
+    log_exp_rel = create_log_exp_relation()
+    x_lv = var()
+    fact(log_exp_rel, mt.log(mt.exp(x_lv)), mt.sqrt(mt.sqr(x_lv)))
+
+    a_tt = tt.vector('a')
+    b_tt = tt.vector('b')
+    log_a_tt = tt.log(tt.exp(a_tt))
+    log_b_tt = tt.log(tt.exp(b_tt))
+    out_tt = log_a_tt * log_b_tt
+
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    log_exp_opt = KanrenRelationSub(log_exp_rel)
+
+    # Every result is produced for a node.
+    new_nodes = list(log_exp_opt.transforms(log_a_tt.owner))
+    assert len(new_nodes) == 2
+    assert [a_tt] in new_nodes
+    assert any(graph_equal(n, [tt.sqrt(tt.sqr(a_tt))]) for n in new_nodes)
+
+    # The graphs are produced lazily.
+    rewrites = graph_rewrites(fgraph, log_exp_opt)
+    first = next(rewrites)
+    (node, _), = first.rewrites
+    assert node in (log_a_tt.owner, log_b_tt.owner)
+    # Unchanged terms are shared with the original graph.
+    unchanged_tt = log_b_tt if node is log_a_tt.owner else log_a_tt
+    assert unchanged_tt in first.outputs[0].owner.inputs
+    assert len(list(rewrites)) == 3
+
+    # With more lookahead, the rewritten graphs are rewritten, too.
+    rewrites = list(graph_rewrites(fgraph, log_exp_opt, lookahead=2))
+    assert len(rewrites) == 8
+    assert sum(len(g.rewrites) == 2 for g in rewrites) == 4
+    new_graph, = [g for g in rewrites
+                  if graph_equal(g.outputs, [a_tt * b_tt])]
+
+    new_fgraph = new_graph.fgraph()
+    new_fgraph.check_integrity()
+    assert graph_equal(new_fgraph.outputs, [a_tt * b_tt])
+
+    # The original graph isn't changed.
+    assert fgraph.outputs == [out_tt]
+    fgraph.check_integrity()
+
+
+def test_cheapest_result_filter():
+    A_tt = tt.matrix('A')
+    b_tt = tt.vector('b')
+    b_tt.tag.test_value = np.ones(3)
+
+    inv_cost = graph_cost(tt.dot(matrix_inverse(A_tt), b_tt))
+    assert inv_cost.inverses == 1
+    assert inv_cost.nodes == 2
+    assert inv_cost.flops == 100**3 + 100**2
+    assert graph_cost([b_tt * 2]).flops == 3
+    assert graph_cost(A_tt.T).flops == 0
+    assert graph_cost(tt.exp(A_tt)) < inv_cost
+
+    # Variables that are already computed are free.
+    inv_A_tt = matrix_inverse(A_tt)
+    given_cost = graph_cost(tt.dot(inv_A_tt, b_tt), given={inv_A_tt})
+    assert given_cost == (100**2, 0, 1)
+
+    x_lv = var()
+    exp_rel = Relation('exp')
+    fact(exp_rel, mt.exp(x_lv),
+         mt.exp(mt.matrix_inverse(mt.matrix_inverse(x_lv))))
+    fact(exp_rel, mt.exp(x_lv), mt.exp(mt.add(x_lv, 0.)))
+    fact(exp_rel, mt.exp(x_lv), mt.exp(mt.sqrt(mt.sqr(x_lv))))
+
+    out_tt = tt.exp(A_tt)
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    node = fgraph.outputs[0].owner
+
+    exp_opt = KanrenRelationSub(exp_rel,
+                                results_filter=cheapest_result_filter())
+    res, = exp_opt.transform(node)
+    assert graph_equal(res, tt.exp(A_tt + 0.))
+
+    # Only the given number of results are compared.
+    exp_opt = KanrenRelationSub(exp_rel,
+                                results_filter=cheapest_result_filter(1))
+    res_1, = exp_opt.transform(node)
+    res_2, = KanrenRelationSub(exp_rel).transform(node)
+    assert graph_equal(res_1, res_2)
+
+    # Sub-terms reused from the graph aren't charged again, so reusing an
+    # existing inverse is cheaper than three new element-wise operations.
+    y_lv = var()
+    inv_rel = Relation('inv')
+    fact(inv_rel, mt.exp(mt.matrix_inverse(y_lv)),
+         mt.exp(mt.neg(mt.neg(y_lv))))
+    fact(inv_rel, mt.exp(x_lv), mt.exp(mt.add(x_lv, 0.)))
+
+    B_tt = tt.matrix('B')
+    inv_B_tt = matrix_inverse(B_tt)
+    out_tt = tt.exp(inv_B_tt)
+    fgraph = FunctionGraph(tt_inputs([out_tt]), [out_tt], clone=False)
+    node = fgraph.outputs[0].owner
+
+    inv_opt = KanrenRelationSub(inv_rel,
+                                results_filter=cheapest_result_filter())
+    res, = inv_opt.transform(node)
+    assert graph_equal(res, tt.exp(inv_B_tt + 0.))
+    assert res.owner.inputs[0].owner.inputs[0] is inv_B_tt
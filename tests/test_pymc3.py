@@ -1,4 +1,4 @@
-import pytest
+import warnings
 
 import numpy as np
 import theano
@@ -158,7 +158,10 @@ def test_pymc_broadcastable():
                          shape=(1,),
                          observed=[10.])
 
-    with pytest.warns(UserWarning):
+    # The constant sizes determine the broadcastable dimensions, so the
+    # `RandomVariable`s match the PyMC3 variables' types.
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UserWarning)
         fgraph = model_graph(model)
 
     Z_rv_tt = canonicalize(fgraph, return_graph=False)
@@ -172,9 +175,7 @@ def test_pymc_broadcastable():
     sd_Y_ = mt.vector('sd_Y')
     tt.config.compute_test_value = 'ignore'
     X_rv_ = mt.NormalRV(mu_X_, sd_X_, (1,), rng, name='X_rv')
-    X_rv_ = mt.addbroadcast(X_rv_, 0)
     Y_rv_ = mt.NormalRV(mu_Y_, sd_Y_, (1,), rng, name='Y_rv')
-    Y_rv_ = mt.addbroadcast(Y_rv_, 0)
     Z_rv_ = mt.NormalRV(mt.add(X_rv_, Y_rv_),
                         mt.add(sd_X_, sd_Y_),
                         (1,), rng, name='Z_rv')
@@ -183,3 +184,58 @@ def test_pymc_broadcastable():
     Z_rv_meta = canonicalize(Z_rv_obs_.reify(), return_graph=False)
 
     assert mt(Z_rv_tt) == mt(Z_rv_meta)
+
+
+def test_model_graph_conversion_cache():
+    import symbolic_pymc.pymc3 as sp_pm
+
+    converted = []
+    _pymc3_var_to_rv = sp_pm.pymc3_var_to_rv
+
+    def pymc3_var_to_rv(pm_var, rand_state=None):
+        converted.append(pm_var.name)
+        return _pymc3_var_to_rv(pm_var, rand_state=rand_state)
+
+    mu_X = tt.scalar('mu_X')
+    mu_X.tag.test_value = np.array(0., dtype=tt.config.floatX)
+
+    with pm.Model(theano_config={'compute_test_value': 'ignore'}) as model:
+        X_rv = pm.Normal('X_rv', mu_X, sd=1.)
+        S_rv = pm.HalfCauchy('S_rv', beta=0.5)
+        Y_rv = pm.Normal('Y_rv', X_rv, sd=S_rv, observed=1.)
+
+    cache = sp_pm.ConversionCache()
+
+    sp_pm.pymc3_var_to_rv = pymc3_var_to_rv
+    try:
+        fgraph_1 = model_graph(model, conversion_cache=cache)
+        assert sorted(converted) == ['S_rv', 'X_rv', 'Y_rv']
+        assert len(cache) == 4
+
+        # Only the new variable is converted.
+        del converted[:]
+        with model:
+            Z_rv = pm.Normal('Z_rv', X_rv + Y_rv, sd=S_rv, observed=2.)
+
+        fgraph_2 = model_graph(model, conversion_cache=cache)
+        assert converted == ['Z_rv']
+        assert len(fgraph_2.outputs) == 2
+
+        # Both graphs own their own variables.
+        assert not set(fgraph_1.variables) & set(fgraph_2.variables)
+        X_new_rv = walk(X_rv, fgraph_2.memo)
+        assert X_new_rv in fgraph_2.variables
+
+        # A changed parameter invalidates the variable and its dependents.
+        del converted[:]
+        X_rv.distribution.mu = tt.as_tensor_variable(np.array(1.))
+        _ = model_graph(model, conversion_cache=cache)
+        assert sorted(converted) == ['X_rv', 'Y_rv', 'Z_rv']
+
+        # A new random state invalidates everything.
+        del converted[:]
+        _ = model_graph(model, conversion_cache=cache,
+                        rand_state=theano.shared(np.random.RandomState()))
+        assert sorted(converted) == ['S_rv', 'X_rv', 'Y_rv', 'Z_rv']
+    finally:
+        sp_pm.pymc3_var_to_rv = _pymc3_var_to_rv
@@ -1,8 +1,15 @@
+import pytest
 import numpy as np
 
+import theano
 import theano.tensor as tt
 
-from symbolic_pymc import NormalRV, MvNormalRV
+from symbolic_pymc import (NormalRV, MvNormalRV, HalfNormalRV, CauchyRV,
+                           HalfCauchyRV, InvGammaRV, TruncExponentialRV)
+from symbolic_pymc.rv import (RandomVariable, RandomGeneratorType,
+                              batched_rv, spawn_generators, jump_generators)
+from symbolic_pymc.meta import mt, MetaRandomGeneratorType
+from symbolic_pymc.utils import batched_function
 
 
 def rv_numpy_tester(rv, *params, size=None):
@@ -65,3 +72,194 @@ def test_mvnormalrv():
     # Looks like NumPy doesn't support that (and it's probably better off for
     # it).
     # rv_numpy_tester(MvNormalRV, [[0, 1, 2], [4, 5, 6]], np.diag([1, 1, 1]))
+
+
+def test_batched_rv():
+    rv_numpy_tester(NormalRV, [0., 1., 2.], 1., size=[2, 3])
+
+    X_rv = NormalRV(0., 1., size=[3])
+    X_batched = batched_rv(X_rv, 100)
+    assert X_batched.ndim == 2
+    assert X_batched.eval().shape == (100, 3)
+
+    X_rv = NormalRV(tt.as_tensor_variable([0., 10.]), 1.)
+    X_batched_val = batched_rv(X_rv, 100).eval()
+    assert X_batched_val.shape == (100, 2)
+    assert np.all(X_batched_val[:, 1] > X_batched_val[:, 0])
+
+    Y_rv = MvNormalRV([0, 1], np.diag([1, 1]), size=[4])
+    assert batched_rv(Y_rv, 10).eval().shape == (10, 4, 2)
+
+    # Random variables depending on other random variables are batched, too.
+    mu_tt = tt.scalar('mu')
+    X_rv = NormalRV(mu_tt, 1.)
+    Z_rv = NormalRV(X_rv * 100., 0.1)
+    fn = batched_function([mu_tt], [X_rv, Z_rv], 50)
+    X_val, Z_val = fn(1.)
+    assert X_val.shape == Z_val.shape == (50,)
+    np.testing.assert_allclose(X_val * 100., Z_val, atol=1.)
+
+    # Multivariate random variables with batched parameters draw one sample
+    # per batch entry.
+    X_rv = NormalRV(tt.as_tensor_variable([0., 100.]), 1.)
+    Y_rv = MvNormalRV(X_rv, np.diag([0.01, 0.01]))
+    fn = batched_function([], [X_rv, Y_rv], 50)
+    X_val, Y_val = fn()
+    assert X_val.shape == Y_val.shape == (50, 2)
+    np.testing.assert_allclose(X_val, Y_val, atol=1.)
+
+    Y_rv = MvNormalRV(tt.zeros((5, 2)), np.diag([1, 1]), size=[3, 5])
+    assert Y_rv.eval().shape == (3, 5, 2)
+
+    # Sizes that don't match the parameters' known shapes are rejected when
+    # the variables are created.
+    with pytest.raises(ValueError):
+        MvNormalRV(tt.zeros((5, 2)), np.diag([1, 1]), size=[3])
+    with pytest.raises(ValueError):
+        NormalRV(np.zeros(3), 1., size=[4])
+    assert NormalRV(np.zeros((1, 2)), 1., size=[3, 2]).eval().shape == (3, 2)
+
+    # Dimension shuffles are moved past the sample dimension, and terms that
+    # don't broadcast along it are rejected.
+    M_tt = tt.as_tensor_variable(np.zeros((3, 2)))
+    Y_rv = NormalRV(X_rv + M_tt, 0.1)
+    X_val, Y_val = batched_function([], [X_rv, Y_rv], 50)()
+    assert Y_val.shape == (50, 3, 2)
+    assert np.all(np.abs(Y_val - X_val[:, None, :]) < 1.)
+
+    with pytest.raises(NotImplementedError):
+        batched_function([], [tt.dot(X_rv, np.ones(2))], 50)
+
+
+@pytest.mark.skipif(not hasattr(np.random, 'Generator'),
+                    reason='requires numpy.random.Generator')
+def test_generator_rng():
+    rng_tt = theano.shared(np.random.Generator(np.random.PCG64(123)))
+    assert isinstance(rng_tt.type, RandomGeneratorType)
+    assert isinstance(mt(rng_tt).type, MetaRandomGeneratorType)
+
+    X_rv = NormalRV(0., 1., size=[3], rng=rng_tt)
+    fn = theano.function([], X_rv)
+
+    # Test value computations could've advanced the generator.
+    rng_tt.set_value(np.random.Generator(np.random.PCG64(123)))
+    ref_rng = np.random.Generator(np.random.PCG64(123))
+    X_val = fn()
+    np.testing.assert_array_equal(X_val, ref_rng.normal(0., 1., size=(3,)))
+
+    # The in-place `Op`s advance the shared generator.
+    assert not np.array_equal(fn(), X_val)
+
+    Y_rv = MvNormalRV([0, 1], np.diag([1, 1]), size=[4], rng=rng_tt)
+    assert Y_rv.eval().shape == (4, 2)
+
+    # Non-in-place `Op`s use a copy.
+    normal_copy_rv = RandomVariable('normal', theano.config.floatX, 0, [0, 0],
+                                    'normal')
+    Z_rv = normal_copy_rv(0., 1., size=[3], rng=rng_tt)
+    fn = theano.function([], Z_rv)
+    np.testing.assert_array_equal(fn(), fn())
+
+    # Independent, reproducible streams
+    streams = spawn_generators(123, 3)
+    draws = [s.normal(size=5) for s in streams]
+    assert not np.array_equal(draws[0], draws[1])
+    np.testing.assert_array_equal(
+        draws[2], spawn_generators(123, 3)[2].normal(size=5))
+
+    rng = np.random.Generator(np.random.Philox(123))
+    streams = jump_generators(rng, 2)
+    assert not np.array_equal(streams[0].normal(size=5),
+                              streams[1].normal(size=5))
+    np.testing.assert_array_equal(
+        jump_generators(rng, 2)[1].normal(size=5),
+        np.random.Generator(rng.bit_generator.jumped(2)).normal(size=5))
+
+
+@pytest.mark.skipif(not hasattr(np.random, 'Generator'),
+                    reason='requires numpy.random.Generator')
+@pytest.mark.parametrize('rv, params', [
+    (HalfNormalRV, (0., 1.)),
+    (CauchyRV, (0., 1.)),
+    (HalfCauchyRV, (0., 1.)),
+    (InvGammaRV, (2., 1.)),
+    (TruncExponentialRV, (1., 0., 1.)),
+])
+def test_generator_rng_scipy(rv, params):
+    rng_tt = theano.shared(np.random.Generator(np.random.PCG64(123)))
+    X_rv = rv(*params, size=[3], rng=rng_tt)
+    fn = theano.function([], X_rv)
+
+    X_val = fn()
+    assert X_val.shape == (3,)
+    assert np.all(np.isfinite(X_val))
+
+    # The generator is advanced in-place.
+    assert not np.array_equal(fn(), X_val)
+
+
+def test_compute_bcast_cache():
+    normal_rv = RandomVariable('normal', theano.config.floatX, 0, [0, 0],
+                               'normal', inplace=True)
+
+    n_calls = [0]
+    _infer_shape = normal_rv._infer_shape
+
+    def _counted_infer_shape(*args, **kwargs):
+        n_calls[0] += 1
+        return _infer_shape(*args, **kwargs)
+
+    normal_rv._infer_shape = _counted_infer_shape
+
+    X_rv = normal_rv([0., 1.], 1., size=[2, 2])
+    Y_rv = normal_rv([2., 3.], 4., size=[2, 2])
+    assert n_calls[0] == 1
+    assert X_rv.broadcastable == Y_rv.broadcastable == (False, False)
+
+    # Constant shapes are part of the key.
+    Z_rv = normal_rv([2.], 4., size=[2, 1])
+    assert n_calls[0] == 2
+    assert Z_rv.broadcastable == (False, True)
+
+    # So are sizes.
+    Z_rv = normal_rv([2., 3.], 4., size=[1, 2])
+    assert n_calls[0] == 3
+    assert Z_rv.broadcastable == (True, False)
+
+    x_tt = tt.vector('x')
+    normal_rv(x_tt, 1.)
+    normal_rv(tt.vector('y'), 2.)
+    assert n_calls[0] == 4
+
+    # Parameters with owners aren't cached.
+    normal_rv(tt.exp(x_tt), 1.)
+    normal_rv(tt.exp(x_tt), 1.)
+    assert n_calls[0] == 6
+
+
+def rv_shape(rv):
+    size = rv.owner.inputs[-2]
+    dist_params = rv.owner.inputs[:-2]
+    return rv.owner.op._infer_shape(size, dist_params)
+
+
+def test_static_shapes():
+    X_rv = NormalRV([0., 1., 2.], 1., size=[2, 3])
+    assert rv_shape(X_rv) == (2, 3)
+
+    # Static shapes are used even when the parameters are symbolic.
+    X_rv = NormalRV(tt.vector('x'), 1., size=[2, 3])
+    assert rv_shape(X_rv) == (2, 3)
+
+    Y_rv = MvNormalRV([0., 1.], np.diag([1., 1.]), size=[4])
+    assert rv_shape(Y_rv) == (4, 2)
+    assert Y_rv.type.broadcastable == (False, False)
+
+    Y_rv = MvNormalRV([0.], np.diag([1.]), size=[4, 1])
+    assert Y_rv.type.broadcastable == (False, True, True)
+
+    x_tt = tt.vector('x')
+    Y_rv = MvNormalRV(x_tt, tt.matrix(), size=[4])
+    shape = rv_shape(Y_rv)
+    assert shape[0] == 4
+    assert isinstance(shape[1], tt.Variable)
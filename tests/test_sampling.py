@@ -0,0 +1,50 @@
+import numpy as np
+import pymc3 as pm
+
+from symbolic_pymc.pymc3 import model_graph
+from symbolic_pymc.sampling import sample_graph, graph_rngs
+
+
+def test_sample_graph():
+    with pm.Model(theano_config={'compute_test_value': 'ignore'}) as model:
+        mu = pm.Normal('mu', 100., 1.)
+        pm.Normal('y', mu, 1., shape=2, observed=np.r_[1., 2.])
+
+    fgraph = model_graph(model)
+
+    rng_var, = graph_rngs([fgraph.outputs[0].owner.inputs[1]])
+    rng_state = rng_var.get_value(borrow=True).get_state()[1].copy()
+
+    y_samples, = sample_graph(fgraph, 101, n_jobs=2, chunks=4, seed=123)
+
+    assert y_samples.shape == (101, 2)
+    assert np.all(y_samples > 90.)
+    # All the chunks have distinct draws.
+    assert len(np.unique(y_samples[:, 0])) == 101
+
+    # The results don't depend on the number of processes.
+    y_samples_serial, = sample_graph(fgraph, 101, n_jobs=1, chunks=4,
+                                     seed=123)
+    np.testing.assert_array_equal(y_samples, y_samples_serial)
+
+    # The graph's random state isn't changed.
+    np.testing.assert_array_equal(
+        rng_var.get_value(borrow=True).get_state()[1], rng_state)
+
+    y_samples_other, = sample_graph(fgraph, 101, n_jobs=1, chunks=4,
+                                    seed=321)
+    assert not np.array_equal(y_samples, y_samples_other)
+
+
+def test_sample_graph_not_inplace():
+    from symbolic_pymc.rv import RandomVariable
+
+    normal_rv = RandomVariable('normal', 'floatX', 0, [0, 0], 'normal',
+                               inplace=False)
+    x = normal_rv(0., 1.)
+
+    x_samples, = sample_graph(None, 6, outputs=[x], n_jobs=1, chunks=2,
+                              seed=1)
+
+    # The draws within each chunk aren't repeated.
+    assert len(np.unique(x_samples)) == 6
@@ -6,11 +6,14 @@ from operator import add
 
 from unification import unify, reify, var, variables
 
+from kanren import run
 from kanren.term import term, operator, arguments
 
 from symbolic_pymc.meta import mt
 from symbolic_pymc.utils import graph_equal
-from symbolic_pymc.unify import (ExpressionTuple, etuple, tuple_expression)
+from symbolic_pymc.unify import (ExpressionTuple, etuple, tuple_expression,
+                                reify_all_terms, compile_pattern,
+                                Substitution)
 
 
 def test_unification():
@@ -131,6 +134,45 @@ def test_etuple():
     assert e_ladd == (1, 2, 3)
 
 
+def test_etuple_sharing():
+    x_mt = mt.vector('x')
+    e1 = etuple(mt.add, x_mt, etuple(mt.exp, x_mt))
+
+    # Slices are only created once.
+    assert e1[1:] is e1[1:]
+    assert e1[-2:] is e1[1:]
+    assert e1[1:].orig_expr is e1
+
+    # Putting the same elements back together recovers the original.
+    assert (e1[0],) + e1[1:] is e1
+    assert e1[:1] + e1[1:] is e1
+    assert e1[:2] + (e1[2],) is e1
+    assert term(operator(e1), arguments(e1)) is e1.eval_obj
+
+    # Equal, but distinct, elements do, too.
+    e1_obj = e1.eval_obj
+    assert e1[:2] + (etuple(mt.exp, x_mt),) is e1
+    assert (mt(x_mt.obj + x_mt.obj).owner.op,) + e1[1:] is e1
+    e4 = etuple(add, (1,), tuple([2]))
+    e4_obj = e4.eval_obj
+    assert term(operator(e4), arguments(e4)) is e4_obj
+    assert term(operator(e4), arguments(e4)[:1] + (tuple([2]),)) is e4_obj
+    assert e1.eval_obj is e1_obj
+
+    # Different elements don't.
+    e2 = (mt.mul,) + e1[1:]
+    assert e2 is not e1
+    assert not hasattr(e2, '_eval_obj')
+    e3 = (mt.add,) + e1[1:2] + (etuple(mt.exp, x_mt),)
+    assert e3 == e1
+    assert e3 is not e1
+
+    assert hash(e1) == hash(e3)
+    assert e1._hash == hash(e1)
+    assert e1 != e2
+    assert e1 != 1
+
+
 def test_etuple_term():
     """Test `tuple_expression` and `etuple` interaction with `term`
     """
@@ -188,3 +230,171 @@ def test_etuple_term():
     assert e2_et_2 == e3 == e2_et
     assert isinstance(e2_et_2, ExpressionTuple)
     assert e2_et_2.eval_obj.reify() == tt_expr
+
+
+def test_deep_terms():
+    x_tt = tt.vector('x')
+    y_tt = x_tt
+    for i in range(1500):
+        y_tt = tt.log(y_tt + y_tt)
+
+    y_et = tuple_expression(y_tt)
+    assert y_et.eval_obj.obj is y_tt
+    # Shared sub-terms produce the same expression tuple.
+    assert y_et[1][1] is y_et[1][2]
+
+    # Replace the name of the graph's input with a logic variable, so that
+    # everything above it must be reified.
+    y_mt = mt(y_tt)
+    x_mt = y_mt
+    while x_mt.owner:
+        x_mt = x_mt.owner.inputs[0]
+    x_lv = var()
+    x_mt.name = x_lv
+
+    y_rf = reify(y_mt, {x_lv: 'x'})
+    assert y_rf is not y_mt
+    y_rf_tt = y_rf.reify()
+    assert y_rf_tt is not y_tt
+    ops = []
+    while y_rf_tt.owner:
+        ops.append(y_rf_tt.owner.op)
+        y_rf_tt = y_rf_tt.owner.inputs[0]
+    assert ops == [tt.log, tt.add] * 1500
+    assert y_rf_tt.name == 'x'
+
+    x_mt = mt(x_tt)
+    z_et = x_mt
+    for i in range(1500):
+        z_et = etuple(mt.log, z_et)
+    z_mt = reify_all_terms(z_et)
+    assert isinstance(z_mt.obj, tt.TensorVariable)
+    assert z_mt.obj.owner.op == tt.log
+
+
+def test_tuple_expression_memo():
+    x_tt = tt.vector('x')
+    y_tt = tt.exp(x_tt)
+
+    # A "diamond" graph with 2**50 paths from its output to `x_tt`.
+    z_tt = y_tt
+    for i in range(50):
+        z_tt = z_tt + z_tt
+
+    z_et = tuple_expression(z_tt)
+    assert z_et[1] is z_et[2]
+    assert z_et[1][1] is z_et[1][2]
+
+    # The same memo can be used for other graphs with common sub-graphs.
+    memo = {}
+    z_et = tuple_expression(z_tt, memo=memo)
+    w_et = tuple_expression(tt.log(y_tt), memo=memo)
+    y_et = z_et
+    while y_et[0] != mt.exp:
+        y_et = y_et[1]
+    assert w_et[1] is y_et
+    assert w_et[1].eval_obj is y_et.eval_obj
+
+    # Meta objects for the same base objects are also identical sub-terms.
+    assert tuple_expression(mt(y_tt), memo=memo) is y_et
+
+
+def test_compile_pattern():
+    x, y = tt.dvectors('xy')
+    x_lv, y_lv = var('x'), var('y')
+    pattern = mt.add(mt.exp(x_lv), y_lv)
+    pattern_c = compile_pattern(pattern)
+
+    # Compiled patterns unify like `unify`, for Theano and meta terms.
+    for t in (tt.exp(x) + y, tt.exp(x + y) + x,
+              mt(tt.exp(x) + y), tt.log(x) + y, tt.exp(x) * y, x):
+        assert pattern_c.match(t) == unify(pattern, t, {})
+
+    assert pattern_c.match(tt.exp(x) + y)[x_lv] == mt(x)
+    assert pattern_c.match(tt.exp(x) + y, {x_lv: mt(y)}) is False
+    assert pattern_c.matches(tt.exp(x) + y)
+    assert not pattern_c.matches(tt.exp(x) + y, {x_lv: mt(y)})
+    assert pattern_c(tt.exp(x) + y, {y_lv: mt(y)})[x_lv] == mt(x)
+
+    # Logic variables in the term are handled by `unify`.
+    z_lv = var('z')
+    t = mt.add(z_lv, y)
+    assert pattern_c.match(t) == unify(pattern, t, {})
+
+    # Ground sub-patterns are matched, too.
+    pattern_c = compile_pattern(mt.add(mt.exp(x), y_lv))
+    assert pattern_c.match(tt.exp(x) + y)[y_lv] == mt(y)
+    assert pattern_c.match(tt.exp(y) + y) is False
+
+    # They're also miniKanren goals.
+    assert run(0, y_lv, (pattern_c.goal, tt.exp(x) + x)) == (mt(x),)
+    assert run(0, y_lv, (pattern_c.goal, tt.log(x) + x)) == ()
+
+    # Only the top levels of bound terms are converted, and the terms matched
+    # against already bound logic variables are compared without converting
+    # them.
+    pattern = mt.add(x_lv, x_lv)
+    pattern_c = compile_pattern(pattern)
+    exp_x = tt.exp(x)
+    s = pattern_c.match(exp_x + exp_x)
+    assert '_deferred_slots' in s[x_lv].__dict__
+    assert s[x_lv] == mt(exp_x)
+    assert s[x_lv].owner.inputs == (mt(x),)
+
+    # The lazily converted bindings hash like their eager conversions, so
+    # they can be mixed with them in sets and dictionary keys.
+    b, e = s[x_lv], mt(tt.exp(x))
+    assert hash(b) == hash(e)
+    assert len({b, e}) == 1
+    assert {e: 1}.get(b) == 1
+    assert '_deferred_slots' in b.__dict__
+
+    for t in (exp_x + exp_x, tt.exp(x) + tt.exp(x), tt.exp(x) + tt.log(x),
+              tt.exp(x) + tt.exp(y), x + y, x + x):
+        assert pattern_c.match(t) == unify(pattern, t, {})
+        assert pattern_c.matches(t) == (unify(pattern, t, {}) is not False)
+
+
+def test_substitution():
+    x_lv, y_lv, z_lv = var('x'), var('y'), var('z')
+    a, b = tt.dvectors('ab')
+
+    # `unify` returns a new, extended `Substitution`.
+    pattern, t = mt.add(x_lv, y_lv), a + b
+    s = Substitution({z_lv: y_lv})
+    res = unify(pattern, t, s)
+    assert isinstance(res, Substitution)
+    assert res is not s
+    assert s == {z_lv: y_lv}
+    assert res == unify(pattern, t, {z_lv: y_lv})
+    assert unify(mt.add(x_lv, x_lv), t, s) is False
+
+    # Chains of bindings are compressed when they're walked.
+    s = Substitution({x_lv: y_lv, y_lv: z_lv, z_lv: 1})
+    assert s.walk(x_lv) == 1
+    assert s == {x_lv: 1, y_lv: 1, z_lv: 1}
+    assert s.walk(a) is a
+
+    # Reification and kanren goals work with them, too.
+    pattern, t = mt.exp(y_lv), tt.exp(a)
+    res = unify((x_lv, pattern), (1, t), Substitution())
+    assert reify(pattern, res) == mt(t)
+    assert run(0, x_lv, lambda s: iter([res])) == (1,)
+
+    # A `Substitution` being extended in one thread is still copied by
+    # top-level `unify` calls in other threads.
+    from concurrent.futures import ThreadPoolExecutor
+    from symbolic_pymc import unify as unify_mod
+
+    s = Substitution()
+    state = unify_mod._unify_thread_state
+    state.substitution = s
+    try:
+        with ThreadPoolExecutor(1) as executor:
+            res = executor.submit(unify, mt.add(x_lv, y_lv), a + b, s).result()
+    finally:
+        state.substitution = None
+
+    assert res is not s
+    assert s == {}
+    assert res[x_lv] == mt(a) and res[y_lv] == mt(b)